@@ -1,10 +1,8 @@
 import sys
 import pygame
 import config
-import math
 
 from lib import *
-import random
 
 
 
@@ -13,131 +11,114 @@ def initGame():
 
     pygame.init()
     pygame.mixer.init()
-    screen = pygame.display.set_mode(config.SCREENSIZE)
+    target = RenderTarget(config.SCREENSIZE, config.RENDER_SCALE, config.RENDER_SCALE_ADAPTIVE,
+                          config.RENDER_SCALE_HARDWARE, config.RENDER_SMOOTH, config.FPS)
     pygame.display.set_caption('Save The CASTLE')
 
     imagesdict = {}
     for i, j in config.spritepics.items():
         imagesdict[i] = pygame.image.load(j)
-    sounddict = {}
-    for i, j in config.Sounds.items():
-        if i != 'backmusic':
-            sounddict[i] = pygame.mixer.Sound(j)
-    return screen, imagesdict, sounddict
+    audio = SoundManager(config.Sounds, cache_dir=config.AUDIO_CACHE)
+    return target, imagesdict, audio
 
 
 
 def main():
 
-    screen, imagesdict, sounddict = initGame()
+    target, imagesdict, audio = initGame()
+    screen = target.surface
 
     pygame.mixer.music.load(config.Sounds['backmusic'])
     pygame.mixer.music.play(-1, 0.0)#StartBeg
 
     font = pygame.font.Font(None, 40)
+    overlay_font = pygame.font.Font(None, 24)
 
-    player = Man(image=imagesdict.get('man'), position=(50, 50))
-
-    acc_record = [0., 0.]
-    time = 100
-    timeless = 0
-    healthvalue = 200
-
-    group_bullet = pygame.sprite.Group()
-
-    group_monster = pygame.sprite.Group()
-    enemy = Monster(imagesdict.get('monster'), position=(640, 100))
-    group_monster.add(enemy)
+    # Main.py never advanced the spawn ramp (timeless stayed 0) and its arrows went through every monster
+    # they touched, keep both
+    schedule = WaveSchedule(load_waves(config.WAVES_FILE), config.WAVES_SEED) if config.WAVES_FILE else None
+    world = World(imagesdict, config.SCREENSIZE, schedule=schedule, ramp=0, pierce=1)
+    governor = QualityGovernor(config.FPS, world, config.QUALITY_GOVERNOR, audio)
+    server = GameServer(world, config.NET_PORT, rate=config.NET_RATE) if config.NET_PORT else None
 
     
     running, exitcode = True, False
     clock = pygame.time.Clock()
+    profiler = FrameProfiler(config.PROFILE, config.PROFILE_WINDOW)
+    countdown_text = None
     
     while running:
 
-        screen.fill(10)
-
-        for x in range(config.SCREENSIZE[0]//imagesdict['grass'].get_width()+1):
-            for y in range(config.SCREENSIZE[1]//imagesdict['grass'].get_height()+1):
-                screen.blit(imagesdict['grass'], (x*100, y*100))
-        for i in range(10): screen.blit(imagesdict['castle'], (0, 105*i))
-        
-        for j in range(8): screen.blit(imagesdict['tree'], (920, 105*j))
+        profiler.begin_frame()
+        target.begin_frame()
+        world.draw_background(screen)
+        profiler.mark('background')
         
  
-        countdown_text = font.render(str((90000-pygame.time.get_ticks())//60000)+":"+str((90000-pygame.time.get_ticks())//1000%60).zfill(2), True, (0, 0, 0))#credits to realpython.com
+        if countdown_text is None or world.frame % world.hud_interval == 0:
+            countdown_text = font.render(str((90000-pygame.time.get_ticks())//60000)+":"+str((90000-pygame.time.get_ticks())//1000%60).zfill(2), True, (0, 0, 0))#credits to realpython.com
         countdown_rect = countdown_text.get_rect()
         countdown_rect.topright = [700, 5]
         screen.blit(countdown_text, countdown_rect)
+        profiler.mark('hud')
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if config.PROFILE_EXPORT and profiler.history:
+                    profiler.export(config.PROFILE_EXPORT)
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                sounddict['shoot'].play()
-                
-                mouse_pos = pygame.mouse.get_pos()
-                shootangle = math.atan2(mouse_pos[1]-(player.rotated_position[1]+32), mouse_pos[0]-(player.rotated_position[0]+26))
-                shot = Bullet(imagesdict.get('arrow'), (shootangle, player.rotated_position[0]+20, player.rotated_position[1]+26))
-                group_bullet.add(shot)
+                audio.play('shoot')
+                world.shoot(target.mouse_pos())
+        profiler.mark('events')
                 
         key_pressed = pygame.key.get_pressed()
         
         if key_pressed[pygame.K_w]:
-            player.move(config.SCREENSIZE, 'up')
+            world.move('up')
         elif key_pressed[pygame.K_s]:
-            player.move(config.SCREENSIZE, 'down')
+            world.move('down')
         elif key_pressed[pygame.K_a]:
-            player.move(config.SCREENSIZE, 'left')
+            world.move('left')
         elif key_pressed[pygame.K_d]:
-            player.move(config.SCREENSIZE, 'right')
+            world.move('right')
         
-        for shot in group_bullet:
-            if shot.update(config.SCREENSIZE):
-                group_bullet.remove(shot)
+        if server:
+            server.poll()
+        for sound in world.update():
+            audio.play(sound)
+        profiler.mark('entities')
         
-        if time == 0:
-            enemy = Monster(imagesdict.get('monster'), position=(800, random.randint(50, 600)))
-            group_monster.add(enemy)
-            time=100-(timeless*2)
-            if timeless>=20:
-                timeless = 20
-            else:
-                timeless+2
-        time = time - 1
+        for sound in world.collide():
+            audio.play(sound)
+        if server:
+            server.broadcast()
+        profiler.mark('collision')
         
-        for enemy in group_monster:
-            if enemy.update():
-                sounddict['hit'].play()
-                healthvalue -= random.randint(4, 8)
-                group_monster.remove(enemy)
-        
-        for shot in group_bullet:
-            for enemy in group_monster:
-                if pygame.sprite.collide_mask(shot, enemy):
-                    sounddict['enemy'].play()
-                    group_bullet.remove(shot)
-                    group_monster.remove(enemy)
-                    
-        
-        group_bullet.draw(screen)
-        group_monster.draw(screen)
-        
-        player.draw(screen, pygame.mouse.get_pos())
+        world.draw(screen, target.mouse_pos())
+        profiler.mark('sprites')
                 
-        screen.blit(imagesdict.get('healthbar'), (400, 10))
-        
-        for i in range(healthvalue):
-            screen.blit(imagesdict.get('health'), (i+400, 10))
+        world.draw_health(screen)
+        profiler.mark('hud')
+        profiler.draw(screen, overlay_font)
         
         if pygame.time.get_ticks() >= 90000:     #Credits to Realpython.com
             running, exitcode = False, True
-        if healthvalue <= 0:
+        if world.healthvalue <= 0:
             running, exitcode = False, False
         
-        pygame.display.flip()
+        target.present()
+        governor.update(target.frame_ms)
+        profiler.mark('flip')
         clock.tick(config.FPS)
+        profiler.mark('idle')
+        profiler.end_frame()
+
+    if config.PROFILE_EXPORT and profiler.history:
+        profiler.export(config.PROFILE_EXPORT)
         
         
     
@@ -4,12 +4,11 @@ Includes wallet connection, health purchases, and leaderboard submission
 """
 
 import sys
+import random
 import pygame
 import config
-import math
 import os
 from lib import *
-import random
 from blockchain.game_integration import BlockchainGameManager
 
 # Game states
@@ -32,7 +31,9 @@ class SaveTheCastleBlockchain:
         # Initialize pygame
         pygame.init()
         pygame.mixer.init()
-        self.screen = pygame.display.set_mode(config.SCREENSIZE)
+        self.render_target = RenderTarget(config.SCREENSIZE, config.RENDER_SCALE, config.RENDER_SCALE_ADAPTIVE,
+                                          config.RENDER_SCALE_HARDWARE, config.RENDER_SMOOTH, config.FPS)
+        self.screen = self.render_target.surface
         pygame.display.set_caption('Save The CASTLE - Blockchain Edition')
         
         # Load assets
@@ -40,10 +41,7 @@ class SaveTheCastleBlockchain:
         for i, j in config.spritepics.items():
             self.imagesdict[i] = pygame.image.load(j)
         
-        self.sounddict = {}
-        for i, j in config.Sounds.items():
-            if i != 'backmusic':
-                self.sounddict[i] = pygame.mixer.Sound(j)
+        self.audio = SoundManager(config.Sounds, cache_dir=config.AUDIO_CACHE)
         
         # Fonts
         self.font_large = pygame.font.Font(None, 48)
@@ -59,20 +57,28 @@ class SaveTheCastleBlockchain:
         self.YELLOW = (255, 255, 0)
         
         # Game variables
-        self.player = None
-        self.group_bullet = None
-        self.group_monster = None
-        self.time = 100
-        self.timeless = 0
-        self.healthvalue = 200
+        schedule = WaveSchedule(load_waves(config.WAVES_FILE), config.WAVES_SEED) if config.WAVES_FILE else None
+        self.world = World(self.imagesdict, config.SCREENSIZE, schedule=schedule)
+        self.governor = QualityGovernor(config.FPS, self.world, config.QUALITY_GOVERNOR, self.audio)
         self.game_start_time = 0
         self.running = True
         self.clock = pygame.time.Clock()
+        self.profiler = FrameProfiler(config.PROFILE, config.PROFILE_WINDOW)
+        self.archive = ArchiveWriter(config.ARCHIVE_DIR) if config.ARCHIVE_DIR else None
+        self.game_seed = None
         
+    def replace_blockchain_manager(self, manager):
+        """Switch to a new blockchain manager, stopping the event and session threads of the old one"""
+        if self.blockchain_manager:
+            self.blockchain_manager.shutdown()
+        self.blockchain_manager = manager
+
     def init_blockchain(self, private_key):
         """Initialize blockchain manager with private key"""
         try:
-            self.blockchain_manager = BlockchainGameManager(private_key)
+            self.replace_blockchain_manager(BlockchainGameManager(private_key))
+            if config.RPC_METRICS_PORT:
+                self.blockchain_manager.serve_rpc_metrics(config.RPC_METRICS_PORT)
             self.private_key = private_key
             return True
         except Exception as e:
@@ -110,7 +116,20 @@ class SaveTheCastleBlockchain:
         self.screen.blit(quit_text, quit_rect)
         
         # Instructions
-        instructions = [\n            "Blockchain Features:",\n            "• Purchase health with ETH/USDC during game (H/U keys)",\n            "• Automatic leaderboard submission",\n            "• Real-time price updates",\n            "• Compete globally on Base network"\n        ]\n        \n        y_offset = 480\n        for instruction in instructions:\n            text = self.font_small.render(instruction, True, self.YELLOW)\n            text_rect = text.get_rect(center=(config.SCREENSIZE[0]//2, y_offset))\n            self.screen.blit(text, text_rect)\n            y_offset += 25
+        instructions = [
+            "Blockchain Features:",
+            "• Purchase health with ETH/USDC during game (H/U keys)",
+            "• Automatic leaderboard submission",
+            "• Real-time price updates",
+            "• Compete globally on Base network"
+        ]
+        
+        y_offset = 480
+        for instruction in instructions:
+            text = self.font_small.render(instruction, True, self.YELLOW)
+            text_rect = text.get_rect(center=(config.SCREENSIZE[0]//2, y_offset))
+            self.screen.blit(text, text_rect)
+            y_offset += 25
     
     def draw_wallet_connect(self):
         """Draw wallet connection screen"""
@@ -120,16 +139,70 @@ class SaveTheCastleBlockchain:
         title_rect = title.get_rect(center=(config.SCREENSIZE[0]//2, 150))
         self.screen.blit(title, title_rect)
         
-        instructions = [\n            "Enter your private key to enable blockchain features:",\n            "",\n            "• Health purchases with ETH/USDC",\n            "• Automatic score submission",\n            "• Global leaderboard participation",\n            "",\n            "Press ENTER to confirm, ESC to go back",\n            "Leave empty and press ENTER for read-only mode"\n        ]\n        \n        y_offset = 220\n        for instruction in instructions:\n            if instruction:\n                text = self.font_small.render(instruction, True, self.WHITE)\n                text_rect = text.get_rect(center=(config.SCREENSIZE[0]//2, y_offset))\n                self.screen.blit(text, text_rect)\n            y_offset += 25\n        \n        # Private key input (masked)\n        if self.private_key:\n            key_display = "*" * min(len(self.private_key), 20) + "..." if len(self.private_key) > 20 else "*" * len(self.private_key)\n        else:\n            key_display = "_" * 20\n        \n        key_text = self.font_medium.render(f"Private Key: {key_display}", True, self.GREEN)\n        key_rect = key_text.get_rect(center=(config.SCREENSIZE[0]//2, 400))\n        self.screen.blit(key_text, key_rect)
+        instructions = [
+            "Enter your private key to enable blockchain features:",
+            "",
+            "• Health purchases with ETH/USDC",
+            "• Automatic score submission",
+            "• Global leaderboard participation",
+            "",
+            "Press ENTER to confirm, ESC to go back",
+            "Leave empty and press ENTER for read-only mode"
+        ]
+        
+        y_offset = 220
+        for instruction in instructions:
+            if instruction:
+                text = self.font_small.render(instruction, True, self.WHITE)
+                text_rect = text.get_rect(center=(config.SCREENSIZE[0]//2, y_offset))
+                self.screen.blit(text, text_rect)
+            y_offset += 25
+        
+        # Private key input (masked)
+        if self.private_key:
+            key_display = "*" * min(len(self.private_key), 20) + "..." if len(self.private_key) > 20 else "*" * len(self.private_key)
+        else:
+            key_display = "_" * 20
+        
+        key_text = self.font_medium.render(f"Private Key: {key_display}", True, self.GREEN)
+        key_rect = key_text.get_rect(center=(config.SCREENSIZE[0]//2, 400))
+        self.screen.blit(key_text, key_rect)
     
     def draw_game_over(self):
         """Draw game over screen"""
         self.screen.fill(self.BLACK)
         
-        # Calculate final score (simplified scoring system)\n        final_score = max(0, (pygame.time.get_ticks() - self.game_start_time) // 100)\n        self.score = final_score\n        \n        title = self.font_large.render("Game Over!", True, self.RED)\n        title_rect = title.get_rect(center=(config.SCREENSIZE[0]//2, 150))
+        # Calculate final score (simplified scoring system)
+        final_score = max(0, (pygame.time.get_ticks() - self.game_start_time) // 100)
+        self.score = final_score
+        
+        title = self.font_large.render("Game Over!", True, self.RED)
+        title_rect = title.get_rect(center=(config.SCREENSIZE[0]//2, 150))
         self.screen.blit(title, title_rect)
         
-n        score_text = self.font_medium.render(f"Final Score: {final_score}", True, self.WHITE)\n        score_rect = score_text.get_rect(center=(config.SCREENSIZE[0]//2, 220))\n        self.screen.blit(score_text, score_rect)\n        \n        if self.health_purchased_this_game:\n            purchased_text = self.font_small.render("Health purchased this game!", True, self.GREEN)\n            purchased_rect = purchased_text.get_rect(center=(config.SCREENSIZE[0]//2, 260))\n            self.screen.blit(purchased_text, purchased_rect)\n        \n        # Show blockchain submission status\n        if self.blockchain_manager and self.blockchain_manager.blockchain_enabled:\n            status_text = self.font_small.render("Score submitted to blockchain leaderboard!", True, self.GREEN)\n            status_rect = status_text.get_rect(center=(config.SCREENSIZE[0]//2, 300))\n            self.screen.blit(status_text, status_rect)\n        \n        # Options\n        play_again_text = self.font_medium.render("SPACE - Play Again", True, self.WHITE)\n        play_again_rect = play_again_text.get_rect(center=(config.SCREENSIZE[0]//2, 380))\n        self.screen.blit(play_again_text, play_again_rect)\n        \n        menu_text = self.font_medium.render("ESC - Main Menu", True, self.WHITE)\n        menu_rect = menu_text.get_rect(center=(config.SCREENSIZE[0]//2, 420))\n        self.screen.blit(menu_text, menu_rect)
+        score_text = self.font_medium.render(f"Final Score: {final_score}", True, self.WHITE)
+        score_rect = score_text.get_rect(center=(config.SCREENSIZE[0]//2, 220))
+        self.screen.blit(score_text, score_rect)
+        
+        if self.health_purchased_this_game:
+            purchased_text = self.font_small.render("Health purchased this game!", True, self.GREEN)
+            purchased_rect = purchased_text.get_rect(center=(config.SCREENSIZE[0]//2, 260))
+            self.screen.blit(purchased_text, purchased_rect)
+        
+        # Show blockchain submission status
+        if self.blockchain_manager and self.blockchain_manager.blockchain_enabled:
+            status_text = self.font_small.render("Score submitted to blockchain leaderboard!", True, self.GREEN)
+            status_rect = status_text.get_rect(center=(config.SCREENSIZE[0]//2, 300))
+            self.screen.blit(status_text, status_rect)
+        
+        # Options
+        play_again_text = self.font_medium.render("SPACE - Play Again", True, self.WHITE)
+        play_again_rect = play_again_text.get_rect(center=(config.SCREENSIZE[0]//2, 380))
+        self.screen.blit(play_again_text, play_again_rect)
+        
+        menu_text = self.font_medium.render("ESC - Main Menu", True, self.WHITE)
+        menu_rect = menu_text.get_rect(center=(config.SCREENSIZE[0]//2, 420))
+        self.screen.blit(menu_text, menu_rect)
     
     def draw_leaderboard(self):
         """Draw blockchain leaderboard"""
@@ -145,7 +218,7 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
             self.screen.blit(error_text, error_rect)
         else:
             # Get leaderboard data
-            leaderboard = self.blockchain_manager.get_leaderboard("all_time")
+            leaderboard = self.blockchain_manager.get_leaderboard("all_time", limit=15)
             
             if not leaderboard:
                 no_data_text = self.font_medium.render("No leaderboard data available", True, self.YELLOW)
@@ -170,6 +243,16 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
                     entry_surface = self.font_small.render(entry_text, True, color)
                     self.screen.blit(entry_surface, (100, y_offset))
                     y_offset += 25
+                
+                # Where we stand among every indexed player, and who is just ahead
+                context = self.blockchain_manager.player_context(radius=1)
+                if context:
+                    you_text = f"Your rank: #{context['rank']} of {context['players']}  best {context['best_score']}"
+                    ahead = [entry for entry in context["around"] if entry["rank"] < context["rank"]]
+                    if ahead:
+                        you_text += f"  next: {ahead[-1]['last_known_name'][:15]} ({ahead[-1]['best_score']})"
+                    you_surface = self.font_small.render(you_text, True, self.YELLOW)
+                    self.screen.blit(you_surface, you_surface.get_rect(center=(config.SCREENSIZE[0]//2, 560)))
         
         # Back instruction
         back_text = self.font_medium.render("ESC - Back to Menu", True, self.WHITE)
@@ -178,16 +261,10 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
     
     def init_game(self):
         """Initialize game objects"""
-        self.player = Man(image=self.imagesdict.get('man'), position=(50, 50))
-        self.group_bullet = pygame.sprite.Group()
-        self.group_monster = pygame.sprite.Group()
-        
-        enemy = Monster(self.imagesdict.get('monster'), position=(640, 100))
-        self.group_monster.add(enemy)
-        
-        self.time = 100
-        self.timeless = 0
-        self.healthvalue = 200
+        # Each game gets its own seed, so an archived game can be played again exactly
+        self.game_seed = random.getrandbits(32)
+        self.world.rng = random.Random(self.game_seed)
+        self.world.reset()
         self.health_purchased_this_game = False
         self.game_start_time = pygame.time.get_ticks()
         
@@ -198,6 +275,11 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
                 if account_info["address"]:
                     self.player_name = f"Player_{account_info['address'][-6:]}"
             self.blockchain_manager.set_player_name(self.player_name)
+            # Pre-opened in the background, purchases sent now are mined after it anyway
+            self.blockchain_manager.begin_game_session()
+        
+        if self.archive:
+            self.archive.begin_game(self.world, self.player_name, self.game_seed, config.WAVES_FILE)
         
         # Start background music
         pygame.mixer.music.load(config.Sounds['backmusic'])
@@ -206,38 +288,34 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
     def handle_blockchain_purchase(self):
         """Handle health purchase and restore health"""
         if self.blockchain_manager and self.blockchain_manager.blockchain_enabled:
-            if self.healthvalue < 200:  # Only allow if damaged
-                current_health = self.healthvalue
-                self.healthvalue = 200  # Restore to full health
+            if self.world.healthvalue < 200:  # Only allow if damaged
+                current_health = self.world.healthvalue
+                self.world.healthvalue = 200  # Restore to full health
                 self.health_purchased_this_game = True
-                print(f"Health restored from {current_health} to {self.healthvalue}")
+                print(f"Health restored from {current_health} to {self.world.healthvalue}")
                 return True
         return False
     
     def run_game_loop(self):
         """Main game loop"""
         game_running = True
+        countdown_text = None
         
         while game_running:
-            self.screen.fill(10)
-            
+            self.profiler.begin_frame()
+            self.render_target.begin_frame()
             # Draw background
-            for x in range(config.SCREENSIZE[0]//self.imagesdict['grass'].get_width()+1):
-                for y in range(config.SCREENSIZE[1]//self.imagesdict['grass'].get_height()+1):
-                    self.screen.blit(self.imagesdict['grass'], (x*100, y*100))
-            
-            for i in range(10): 
-                self.screen.blit(self.imagesdict['castle'], (0, 105*i))
-            
-            for j in range(8): 
-                self.screen.blit(self.imagesdict['tree'], (920, 105*j))
+            self.world.draw_background(self.screen)
+            self.profiler.mark('background')
             
             # Draw countdown timer
             time_remaining = max(0, 90000 - (pygame.time.get_ticks() - self.game_start_time))
-            countdown_text = self.font_medium.render(f"{time_remaining//60000}:{(time_remaining//1000%60):02d}", True, self.BLACK)
+            if countdown_text is None or self.world.frame % self.world.hud_interval == 0:
+                countdown_text = self.font_medium.render(f"{time_remaining//60000}:{(time_remaining//1000%60):02d}", True, self.BLACK)
             countdown_rect = countdown_text.get_rect()
             countdown_rect.topright = [700, 5]
             self.screen.blit(countdown_text, countdown_rect)
+            self.profiler.mark('hud')
             
             # Handle events
             for event in pygame.event.get():
@@ -263,87 +341,76 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
                         if self.blockchain_manager:
                             print("Approving USDC...")
                             self.blockchain_manager.approve_usdc()
+                    elif event.key == pygame.K_F3:  # Performance overlay
+                        self.profiler.toggle()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
-                    self.sounddict['shoot'].play()
-                    mouse_pos = pygame.mouse.get_pos()
-                    shootangle = math.atan2(mouse_pos[1]-(self.player.rotated_position[1]+32), 
-                                         mouse_pos[0]-(self.player.rotated_position[0]+26))
-                    shot = Bullet(self.imagesdict.get('arrow'), 
-                                (shootangle, self.player.rotated_position[0]+20, self.player.rotated_position[1]+26))
-                    self.group_bullet.add(shot)
+                    self.audio.play('shoot')
+                    target = self.render_target.mouse_pos()
+                    self.world.shoot(target)
+                    if self.archive:
+                        self.archive.shot(self.world, target)
+            self.profiler.mark('events')
             
             # Handle continuous key presses
             key_pressed = pygame.key.get_pressed()
+            move = None
             if key_pressed[pygame.K_w]:
-                self.player.move(config.SCREENSIZE, 'up')
+                move = 'up'
             elif key_pressed[pygame.K_s]:
-                self.player.move(config.SCREENSIZE, 'down')
+                move = 'down'
             elif key_pressed[pygame.K_a]:
-                self.player.move(config.SCREENSIZE, 'left')
+                move = 'left'
             elif key_pressed[pygame.K_d]:
-                self.player.move(config.SCREENSIZE, 'right')
+                move = 'right'
+            if move:
+                self.world.move(move)
             
-            # Update bullets
-            for shot in list(self.group_bullet):
-                if shot.update(config.SCREENSIZE):
-                    self.group_bullet.remove(shot)
-            
-            # Spawn enemies
-            if self.time == 0:
-                enemy = Monster(self.imagesdict.get('monster'), position=(800, random.randint(50, 600)))
-                self.group_monster.add(enemy)
-                self.time = 100 - (self.timeless * 2)
-                if self.timeless >= 20:
-                    self.timeless = 20
-                else:
-                    self.timeless += 2
-            self.time -= 1
-            
-            # Update enemies
-            for enemy in list(self.group_monster):
-                if enemy.update():
-                    self.sounddict['hit'].play()
-                    self.healthvalue -= random.randint(4, 8)
-                    self.group_monster.remove(enemy)
+            # Update bullets and enemies, spawn new enemies
+            for sound in self.world.update():
+                self.audio.play(sound)
+            self.profiler.mark('entities')
             
             # Handle collisions
-            for shot in list(self.group_bullet):
-                for enemy in list(self.group_monster):
-                    if pygame.sprite.collide_mask(shot, enemy):
-                        self.sounddict['enemy'].play()
-                        self.group_bullet.remove(shot)
-                        self.group_monster.remove(enemy)
-                        break
+            for sound in self.world.collide():
+                self.audio.play(sound)
+            self.profiler.mark('collision')
             
             # Draw sprites
-            self.group_bullet.draw(self.screen)
-            self.group_monster.draw(self.screen)
-            self.player.draw(self.screen, pygame.mouse.get_pos())
+            aim = self.render_target.mouse_pos()
+            self.world.draw(self.screen, aim)
+            if self.archive:
+                self.archive.tick(self.world, move, aim)  # Only queues the record, written in the background
+            self.profiler.mark('sprites')
             
             # Draw health bar
-            self.screen.blit(self.imagesdict.get('healthbar'), (400, 10))
-            for i in range(min(self.healthvalue, 200)):
-                self.screen.blit(self.imagesdict.get('health'), (i+400, 10))
+            self.world.draw_health(self.screen)
+            self.profiler.mark('hud')
             
             # Draw blockchain UI if enabled
             if self.blockchain_manager and self.blockchain_manager.blockchain_enabled:
                 self.draw_blockchain_ui()
+            self.profiler.mark('blockchain_ui')
+            self.profiler.draw(self.screen, self.font_small)
             
             # Check win/lose conditions
             if time_remaining <= 0:
                 return "game_over_win"
-            if self.healthvalue <= 0:
+            if self.world.healthvalue <= 0:
                 return "game_over_lose"
             
-            pygame.display.flip()
+            self.render_target.present()
+            self.governor.update(self.render_target.frame_ms)
+            self.profiler.mark('flip')
             self.clock.tick(config.FPS)
+            self.profiler.mark('idle')
+            self.profiler.end_frame()
     
     def draw_blockchain_ui(self):
         """Draw blockchain UI elements during game"""
         y_offset = 50
         
-        # Get current prices
-        prices = self.blockchain_manager.get_health_prices()
+        # Current prices, kept up to date by chain events
+        prices = self.blockchain_manager.chain_state()["prices"]
         if prices["eth_price"] > 0:
             price_text = f"Health: {prices['eth_price']:.6f} ETH / {prices['usdc_price']:.2f} USDC"
             price_surface = self.font_small.render(price_text, True, self.YELLOW)
@@ -351,7 +418,7 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
             y_offset += 20
         
         # Purchase instructions
-        if self.healthvalue < 200:
+        if self.world.healthvalue < 200:
             instructions = ["H - Buy with ETH", "U - Buy with USDC", "A - Approve USDC"]
             for instruction in instructions:
                 text_surface = self.font_small.render(instruction, True, self.GREEN)
@@ -368,11 +435,12 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
         """Submit final score to blockchain"""
         if self.blockchain_manager and self.blockchain_manager.blockchain_enabled:
             print(f"Submitting final score: {self.score}")
-            tx_hash = self.blockchain_manager.submit_game_score(self.score)
-            if tx_hash:
-                print(f"Score submitted! Transaction: {tx_hash}")
-            else:
-                print("Failed to submit score")
+            # Sent in the background together with the next game's session, the game over screen never waits
+            ended = self.blockchain_manager.end_game_session(self.score)
+            if ended:
+                ended.add_done_callback(lambda done: print(
+                    f"Score submitted! Transaction: {done.result()}" if not done.exception() and done.result()
+                    else "Failed to submit score"))
     
     def run(self):
         """Main application loop"""
@@ -394,7 +462,9 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
                         elif event.key == pygame.K_3:  # View leaderboard
                             # Initialize read-only blockchain manager if not already done
                             if not self.blockchain_manager:
-                                self.blockchain_manager = BlockchainGameManager()
+                                self.replace_blockchain_manager(BlockchainGameManager())
+                            # One bulk stats fetch per visit, rank lookups while drawing stay local
+                            self.blockchain_manager.refresh_rank_index()
                             self.state = LEADERBOARD
                         elif event.key == pygame.K_4:  # Quit
                             self.running = False
@@ -418,7 +488,7 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
                                     print("Blockchain initialization failed")
                             else:
                                 # Read-only mode
-                                self.blockchain_manager = BlockchainGameManager()
+                                self.replace_blockchain_manager(BlockchainGameManager())
                             
                             self.init_game()
                             self.state = GAME
@@ -433,6 +503,11 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
             
             elif self.state == GAME:
                 result = self.run_game_loop()
+                if config.PROFILE_EXPORT and self.profiler.history:
+                    self.profiler.export(config.PROFILE_EXPORT)
+                if self.archive:
+                    self.archive.end_game(max(0, (pygame.time.get_ticks() - self.game_start_time) // 100), self.world,
+                                          completed=result.startswith("game_over"), won=result == "game_over_win")
                 if result == "quit":
                     self.running = False
                 elif result == "menu":
@@ -467,9 +542,13 @@ n        score_text = self.font_medium.render(f"Final Score: {final_score}", Tru
                         if event.key == pygame.K_ESCAPE:
                             self.state = MENU
             
-            pygame.display.flip()
+            self.render_target.present()
             self.clock.tick(60)
         
+        if self.blockchain_manager:
+            self.blockchain_manager.shutdown()
+        if self.archive:
+            self.archive.close()
         pygame.quit()
         sys.exit()
 
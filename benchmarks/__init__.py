@@ -0,0 +1,12 @@
+"""
+Headless benchmarks for Save the Castle
+Runs the game rules from lib.World under SDL's dummy drivers with scripted input
+
+Usage (from the repository root): python -m benchmarks [scenario ...]
+"""
+
+import os
+
+# Must happen before pygame opens a display or the mixer
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
@@ -0,0 +1,61 @@
+"""
+Command line entry point: python -m benchmarks [scenario ...]
+Exits with status 1 when any scenario regresses against the baseline
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.runner import compare, load_baseline, run_scenario, save_baseline
+from benchmarks.scenarios import SCENARIOS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Headless Save the Castle benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run, from {', '.join(sorted(SCENARIOS))} (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a result counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--render-scale", type=float, default=1.0, help="Internal resolution as a fraction of the window")
+    parser.add_argument("--governor", action="store_true", help="Let the quality governor shed work when frames run over budget")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--json", help="Also write the raw results to this file")
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+
+    baseline = load_baseline(args.baseline)
+    results = []
+    failed = False
+    for name in args.scenarios or sorted(SCENARIOS):
+        result = run_scenario(SCENARIOS[name], args.seed, not args.no_memory, args.render_scale, args.governor)
+        results.append(result)
+
+        phases = "  ".join(f"{phase} {ms:.2f}" for phase, ms in sorted(result["phases_ms"].items(), key=lambda item: -item[1]))
+        memory = f"  peak {result['peak_kb']}KB" if "peak_kb" in result else ""
+        print(f"{name:<11} {result['fps']:>8.1f} fps  p99 {result['p99_ms']:.2f}ms{memory}")
+        print(f"{'':<11} {phases}")
+
+        regressions = compare(result, baseline.get(name), args.tolerance)
+        for regression in regressions:
+            print(f"{'':<11} REGRESSION: {regression}")
+        failed = failed or bool(regressions)
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(results, handle, indent=2)
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Environment throughput: python -m benchmarks.env [num_envs]
+Steps CastleEnv and VectorCastleEnv with random actions and reports env-steps per second
+"""
+
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from lib.Env import CastleEnv, VectorCastleEnv
+
+
+def random_actions(rng, count):
+    """Random moves, fire one frame in ten, aim anywhere in the right half of the field"""
+    return np.stack([
+        rng.integers(0, 5, size=count),
+        rng.random(count) < 0.1,
+        rng.uniform(500, 1000, size=count),
+        rng.uniform(0, 700, size=count),
+    ], axis=1)
+
+
+def measure(env, steps, num_envs, seed=0):
+    """Env-steps per second over `steps` calls to step()"""
+    rng = np.random.default_rng(seed)
+    env.reset(seed)
+    actions = [random_actions(rng, num_envs) for _ in range(min(steps, 100))]
+    start = time.perf_counter()
+    for i in range(steps):
+        action = actions[i % len(actions)]
+        if num_envs == 1 and isinstance(env, CastleEnv):
+            _, _, done, _ = env.step(action[0])
+            if done:
+                env.reset(seed)
+        else:
+            env.step(action)
+    return steps * num_envs / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    num_envs = int(argv[0]) if argv else 256
+    pygame.init()
+    print(f"CastleEnv                {measure(CastleEnv(), 3000, 1):>12,.0f} steps/s")
+    print(f"VectorCastleEnv x{num_envs:<6} {measure(VectorCastleEnv(num_envs), 1000, num_envs):>12,.0f} steps/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
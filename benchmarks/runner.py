@@ -0,0 +1,151 @@
+"""
+Headless benchmark runner
+Drives lib.World frame by frame without a frame cap and reports throughput,
+per-phase timings and peak memory, and compares them with a stored baseline
+"""
+
+import json
+import random
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import pygame
+
+import config
+from lib import FrameProfiler, QualityGovernor, RenderTarget, SoundManager, World
+
+
+def init_game(render_scale=1.0):
+    """Open the (dummy) display and mixer and load every asset once"""
+    pygame.init()
+    try:
+        pygame.mixer.init()
+    except pygame.error:
+        pass  # No audio device at all, sounds are skipped
+    target = RenderTarget(config.SCREENSIZE, render_scale)
+
+    imagesdict = {}
+    for i, j in config.spritepics.items():
+        imagesdict[i] = pygame.image.load(j)
+    audio = SoundManager(config.Sounds)
+    return target, imagesdict, audio
+
+
+def play(scenario, target, imagesdict, audio, seed=0, profiler=None, governed=False):
+    """Run one scenario to completion, returns the World it ran in and its quality governor"""
+    world = World(imagesdict, config.SCREENSIZE, rng=random.Random(seed))
+    governor = QualityGovernor(config.FPS, world, governed, audio)
+    if scenario.setup:
+        scenario.setup(world)
+    profiler = profiler or FrameProfiler(False)
+    aim = (config.SCREENSIZE[0] // 2, config.SCREENSIZE[1] // 2)
+    screen = target.surface
+
+    for frame in range(scenario.frames):
+        profiler.begin_frame()
+        target.begin_frame()
+        world.draw_background(screen)
+        profiler.mark('background')
+
+        pygame.event.pump()
+        direction, targets = scenario.script(world, frame)
+        if direction:
+            world.move(direction)
+        for aim in targets:
+            audio.play('shoot')
+            world.shoot(aim)
+        profiler.mark('events')
+
+        for sound in world.update():
+            audio.play(sound)
+        profiler.mark('entities')
+
+        for sound in world.collide():
+            audio.play(sound)
+        profiler.mark('collision')
+
+        world.draw(screen, aim)
+        profiler.mark('sprites')
+
+        world.draw_health(screen)
+        profiler.mark('hud')
+
+        target.present()
+        governor.update(target.frame_ms)
+        profiler.mark('flip')
+        profiler.end_frame()
+    return world, governor
+
+
+def run_scenario(scenario, seed=0, measure_memory=True, render_scale=1.0, governed=False) -> Dict:
+    """Benchmark one scenario: a timed pass and, optionally, a second pass under tracemalloc"""
+    target, imagesdict, audio = init_game(render_scale)
+    profiler = FrameProfiler(True, scenario.frames)
+
+    start = time.perf_counter()
+    world, governor = play(scenario, target, imagesdict, audio, seed, profiler, governed)
+    elapsed = time.perf_counter() - start
+
+    summary = profiler.summary()
+    result = {
+        "scenario": scenario.name,
+        "frames": scenario.frames,
+        "render_scale": render_scale,
+        "governed": governed,
+        "seconds": round(elapsed, 3),
+        "fps": round(scenario.frames / elapsed, 1),
+        "p50_ms": round(summary["p50"], 3),
+        "p99_ms": round(summary["p99"], 3),
+        "phases_ms": {name: round(stats["mean"], 4) for name, stats in summary["sections"].items()},
+        "kills": world.kills,
+        "health": world.healthvalue,
+        "quality_level": governor.level,
+        "bullet_pool": world.bullet_pool.stats(),
+        "monster_pool": world.monster_pool.stats(),
+        "audio": dict(audio.stats),
+    }
+
+    if measure_memory:
+        # Separate pass, tracemalloc slows allocations down too much to share with the timings
+        tracemalloc.start()
+        play(scenario, target, imagesdict, audio, seed, governed=governed)
+        result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def compare(result: Dict, baseline: Optional[Dict], tolerance: float = 0.2, floor_ms: float = 0.05) -> List[str]:
+    """List every way result is worse than baseline by more than tolerance"""
+    if not baseline or baseline.get("render_scale", 1.0) != result.get("render_scale", 1.0) \
+            or baseline.get("governed", False) != result.get("governed", False):
+        return []
+    regressions = []
+    if result["fps"] < baseline["fps"] * (1 - tolerance):
+        regressions.append(f"fps {result['fps']} < {baseline['fps']}")
+    for name, mean in result["phases_ms"].items():
+        before = baseline.get("phases_ms", {}).get(name)
+        if before is not None and mean > before * (1 + tolerance) and mean - before > floor_ms:
+            regressions.append(f"{name} {mean:.3f}ms > {before:.3f}ms")
+    if "peak_kb" in result and "peak_kb" in baseline:
+        if result["peak_kb"] > baseline["peak_kb"] * (1 + tolerance):
+            regressions.append(f"peak memory {result['peak_kb']}KB > {baseline['peak_kb']}KB")
+    return regressions
+
+
+def load_baseline(path: str) -> Dict:
+    """Baseline results keyed by scenario name, empty if the file does not exist yet"""
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, results: List[Dict]):
+    """Store results as the new baseline, keeping scenarios that were not re-run"""
+    baseline = load_baseline(path)
+    for result in results:
+        baseline[result["scenario"]] = result
+    with open(path, "w") as handle:
+        json.dump(baseline, handle, indent=2, sort_keys=True)
@@ -0,0 +1,56 @@
+"""
+Scripted load scenarios for the headless benchmarks
+A script is called once per frame and returns (direction or None, list of click targets)
+"""
+
+import config
+
+
+class Scenario:
+    """A fixed number of frames of scripted play"""
+
+    def __init__(self, name, frames, script, setup=None, description=""):
+        self.name = name
+        self.frames = frames
+        self.script = script
+        self.setup = setup
+        self.description = description
+
+
+def no_input(world, frame):
+    """Nobody at the controls, monsters still spawn and walk in"""
+    return None, []
+
+
+def patrol_and_aim(world, frame):
+    """Walk up and down the wall and shoot at the closest monster every 20 frames"""
+    direction = 'down' if (frame // 150) % 2 == 0 else 'up'
+    targets = []
+    if frame % 20 == 0:
+        monsters = world.group_monster.sprites()
+        if monsters:
+            targets.append(min(monsters, key=lambda enemy: enemy.rect.left).rect.center)
+    return direction, targets
+
+
+def click_every_frame(world, frame):
+    """One shot per frame, fanned across the lanes"""
+    return None, [(900, 50 + (frame * 37) % 550)]
+
+
+def spawn_wave(world, count=1000):
+    """Queue a block of monsters off the right edge so they all walk on screen"""
+    for i in range(count):
+        world.spawn((800 + (i % 50) * 20, 50 + (i // 50) * 28))
+
+
+SCENARIOS = {
+    "idle": Scenario("idle", 10 * config.FPS, no_input,
+                     description="10 seconds without input"),
+    "normal": Scenario("normal", 90 * config.FPS, patrol_and_aim,
+                       description="A full 90 second game with a simple scripted player"),
+    "wave_1k": Scenario("wave_1k", 3 * config.FPS, patrol_and_aim, setup=spawn_wave,
+                        description="1000 monsters at once"),
+    "rapid_fire": Scenario("rapid_fire", 10 * config.FPS, click_every_frame,
+                           description="A click on every frame for 10 seconds"),
+}
@@ -0,0 +1,118 @@
+"""
+Sprite micro-benchmark: python -m benchmarks.sprites [count]
+Per-entity update cost and memory per instance of Bullet and Monster from lib/Sprites.py, next to the
+__dict__-based, integer-rect versions they replaced (kept below only for this comparison)
+"""
+
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+import config
+from lib.Sprites import Bullet, Monster
+
+
+class DictBullet(pygame.sprite.Sprite):
+    """Bullet before __slots__: cos/sin every frame, position only in the integer rect"""
+
+    def __init__(self, image, position):
+        pygame.sprite.Sprite.__init__(self)
+        self.speed = 10
+        self.angle = position[0]
+        self.image, self.mask = Bullet.rotated(image, 360 - position[0]*57.29)
+        self.rect = self.image.get_rect()
+        self.rect.left, self.rect.top = position[1:]
+
+    def update(self, screensize):
+        self.rect.left = self.rect.left + math.cos(self.angle)*self.speed
+        self.rect.top = self.rect.top + math.sin(self.angle)*self.speed
+        return self.rect.right < 0 or self.rect.left > screensize[0] or self.rect.top > screensize[1] or self.rect.bottom < 0
+
+
+class DictMonster(pygame.sprite.Sprite):
+    """Monster before __slots__"""
+
+    def __init__(self, image, position):
+        pygame.sprite.Sprite.__init__(self)
+        self.speed = 7
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.mask = Monster(image, position).mask
+        self.rect.left, self.rect.top = position
+
+    def update(self):
+        self.rect.left = self.rect.left - self.speed
+        return self.rect.left < 80
+
+
+def make(cls, image, count, bullet):
+    """`count` sprites set up the way World.shoot/spawn leaves them, in a group of their own"""
+    group = pygame.sprite.Group()
+    sprites = []
+    for i in range(count):
+        if bullet:
+            sprite = cls(image, (-0.6 + 1.2*i/count, 100.0, 300.0))
+            sprite.speed = config.RULES["bullet_speed"]
+        else:
+            sprite = cls(image, (5000, 50 + i % 500))
+            sprite.speed = config.RULES["monster_speed"]
+        sprite.serial = i
+        group.add(sprite)
+        sprites.append(sprite)
+    return sprites
+
+
+def memory_per_instance(cls, image, count, bullet):
+    """Bytes allocated per sprite and its group membership, shared images and masks excluded"""
+    make(cls, image, 1, bullet)  # Fills the rotation and mask caches
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sprites = make(cls, image, count, bullet)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del sprites
+    return size / count
+
+
+def update_cost(cls, image, count, bullet, frames=20):
+    """Nanoseconds per sprite per update() call, best of three runs"""
+    screensize = (10**6, 10**6)  # Nothing leaves the field, every call does the full work
+    best = float("inf")
+    for _ in range(3):
+        sprites = make(cls, image, count, bullet)
+        start = time.perf_counter()
+        for _ in range(frames):
+            if bullet:
+                for sprite in sprites:
+                    sprite.update(screensize)
+            else:
+                for sprite in sprites:
+                    sprite.update()
+        best = min(best, time.perf_counter() - start)
+    return best / (count * frames) * 1e9
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 10000
+    pygame.init()
+    images = {name: pygame.image.load(config.spritepics[name]) for name in ("arrow", "monster")}
+    print(f"{count} sprites each")
+    print(f"{'':<16} {'update ns':>10} {'bytes':>8}")
+    for name, cls, image, bullet in (("Bullet", Bullet, images["arrow"], True),
+                                     ("Bullet (dict)", DictBullet, images["arrow"], True),
+                                     ("Monster", Monster, images["monster"], False),
+                                     ("Monster (dict)", DictMonster, images["monster"], False)):
+        print(f"{name:<16} {update_cost(cls, image, count, bullet):>10.0f} {memory_per_instance(cls, image, count, bullet):>8.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
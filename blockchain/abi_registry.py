@@ -0,0 +1,130 @@
+"""
+ABI registry shared by the Save the Castle clients
+Each contract's ABI is parsed once per process from the Hardhat build artifacts (falling back to the inline
+definitions), with its function selectors and codecs cached, and Web3 connections and contract instances reused
+"""
+
+import json
+import os
+import threading
+from typing import Optional, Dict, List, Tuple
+
+from eth_abi import decode, encode
+from web3 import Web3
+from web3.contract import Contract
+
+ARTIFACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts", "contracts")
+
+
+def abi_type(param: Dict) -> str:
+    """eth_abi type string of an ABI parameter, structs become '(t1,t2)' tuples"""
+    kind = param["type"]
+    if kind.startswith("tuple"):
+        return "(" + ",".join(abi_type(component) for component in param["components"]) + ")" + kind[len("tuple"):]
+    return kind
+
+
+class FunctionCodec:
+    """Selector and argument/result types of one contract function, for building raw calls"""
+
+    def __init__(self, abi: Dict):
+        self.name = abi["name"]
+        self.inputs = [abi_type(param) for param in abi.get("inputs", [])]
+        self.outputs = [abi_type(param) for param in abi.get("outputs", [])]
+        self.signature = f"{self.name}({','.join(self.inputs)})"
+        self.selector = bytes(Web3.keccak(text=self.signature)[:4])
+
+    def encode(self, *args) -> bytes:
+        """Calldata for a call with these arguments"""
+        return self.selector + encode(self.inputs, args)
+
+    def decode(self, data: bytes) -> Tuple:
+        """Return values of a call, as a tuple"""
+        return decode(self.outputs, bytes(data))
+
+
+class AbiRegistry:
+    """Process-wide cache of ABIs, codecs, Web3 connections and contract instances"""
+
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR):
+        self.artifacts_dir = artifacts_dir
+        self.lock = threading.RLock()
+        self.sources: Dict[str, Tuple[Optional[str], List[Dict]]] = {}  # name -> (artifact path, fallback ABI)
+        self.abis: Dict[str, List[Dict]] = {}
+        self.codecs: Dict[str, Dict[str, FunctionCodec]] = {}
+        self.connections: Dict[str, Web3] = {}
+        self.contracts: Dict[Tuple[Web3, str, str], Contract] = {}
+
+    def register(self, name: str, artifact: Optional[str], fallback: List[Dict]):
+        """Declare a contract: its artifact path under artifacts/contracts (None for external contracts), and the ABI to use without one"""
+        with self.lock:
+            self.sources[name] = (artifact, fallback)
+
+    def abi(self, name: str) -> List[Dict]:
+        """The contract's ABI, read from its Hardhat artifact on first use"""
+        abi = self.abis.get(name)
+        if abi is None:
+            with self.lock:
+                abi = self.abis.get(name)
+                if abi is None:
+                    artifact, fallback = self.sources[name]
+                    abi = fallback
+                    try:
+                        if artifact is None:
+                            raise FileNotFoundError(name)
+                        with open(os.path.join(self.artifacts_dir, artifact)) as handle:
+                            abi = json.load(handle)["abi"]
+                    except FileNotFoundError:
+                        pass  # Contracts not compiled here, the inline ABI will do
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Error reading artifact {artifact}, using inline ABI: {e}")
+                    self.abis[name] = abi
+        return abi
+
+    def _codecs(self, name: str) -> Dict[str, FunctionCodec]:
+        codecs = self.codecs.get(name)
+        if codecs is None:
+            codecs = {}
+            for entry in self.abi(name):
+                if entry.get("type") == "function":
+                    codec = FunctionCodec(entry)
+                    codecs.setdefault(codec.name, codec)
+                    codecs[codec.signature] = codec
+            codecs = self.codecs.setdefault(name, codecs)
+        return codecs
+
+    def codec(self, name: str, function: str) -> FunctionCodec:
+        """Cached codec of a contract function, by name or by full signature for overloads"""
+        return self._codecs(name)[function]
+
+    def selectors(self, name: str) -> Dict[bytes, str]:
+        """Selector -> signature of every function of the contract"""
+        return {codec.selector: codec.signature for codec in self._codecs(name).values()}
+
+    def connect(self, rpc_url: str) -> Web3:
+        """One Web3 per RPC URL, checked once, so clients on the same endpoint share its connection pool"""
+        w3 = self.connections.get(rpc_url)
+        if w3 is None:
+            with self.lock:
+                w3 = self.connections.get(rpc_url)
+                if w3 is None:
+                    w3 = Web3(Web3.HTTPProvider(rpc_url))
+                    if not w3.is_connected():
+                        raise ConnectionError(f"Failed to connect to {rpc_url}")
+                    self.connections[rpc_url] = w3
+        return w3
+
+    def contract(self, w3: Web3, name: str, address: str) -> Contract:
+        """Contract instance for a registered contract at an address, built once per connection"""
+        key = (w3, name, address)
+        contract = self.contracts.get(key)
+        if contract is None:
+            with self.lock:
+                contract = self.contracts.get(key)
+                if contract is None:
+                    contract = w3.eth.contract(address=address, abi=self.abi(name))
+                    self.contracts[key] = contract
+        return contract
+
+
+REGISTRY = AbiRegistry()
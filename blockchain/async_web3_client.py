@@ -0,0 +1,279 @@
+"""
+Async Web3 client for Save the Castle blockchain integration
+Same API as SaveTheCastleWeb3Client on an AsyncWeb3 provider, so services can serve
+many players from one event loop and run independent reads together with asyncio.gather
+"""
+
+import asyncio
+from collections.abc import Sequence
+from typing import Optional, Dict, List
+from web3 import AsyncWeb3
+from eth_account import Account
+
+from abi_registry import REGISTRY
+from rpc_metrics import METRICS
+from pricing import HEALTH_PER_PURCHASE, ZERO_ADDRESS, format_health_prices
+from web3_client import SaveTheCastleWeb3Client, LEADERBOARD_VIEWS, LeaderboardPage, format_player_stats
+
+
+class AsyncSaveTheCastleWeb3Client:
+    """Async twin of SaveTheCastleWeb3Client, every method is a coroutine"""
+
+    BASE_SEPOLIA_RPC = SaveTheCastleWeb3Client.BASE_SEPOLIA_RPC
+    CHAIN_ID = SaveTheCastleWeb3Client.CHAIN_ID
+    GAME_ECONOMY_ADDRESS = SaveTheCastleWeb3Client.GAME_ECONOMY_ADDRESS
+    LEADERBOARD_ADDRESS = SaveTheCastleWeb3Client.LEADERBOARD_ADDRESS
+    USDC_ADDRESS = SaveTheCastleWeb3Client.USDC_ADDRESS
+
+    def __init__(self, private_key: Optional[str] = None, rpc_url: Optional[str] = None,
+                 chain_id: Optional[int] = None, addresses: Optional[Dict[str, str]] = None):
+        """
+        Create the client, call `await client.connect()` before use
+
+        Args:
+            private_key: Player's private key (optional for read-only operations)
+            rpc_url: Custom RPC URL (optional, defaults to Base Sepolia)
+            chain_id: Chain ID for signed transactions (optional, defaults to Base Sepolia)
+            addresses: Contract addresses by "game_economy", "leaderboard" and "usdc" (optional)
+        """
+        self.rpc_url = rpc_url or self.BASE_SEPOLIA_RPC
+        self.CHAIN_ID = chain_id or self.CHAIN_ID
+        addresses = addresses or {}
+        self.GAME_ECONOMY_ADDRESS = addresses.get("game_economy", self.GAME_ECONOMY_ADDRESS)
+        self.LEADERBOARD_ADDRESS = addresses.get("leaderboard", self.LEADERBOARD_ADDRESS)
+        self.USDC_ADDRESS = addresses.get("usdc", self.USDC_ADDRESS)
+        self.w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(self.rpc_url))
+        METRICS.instrument(self.w3)
+
+        self.account = None
+        if private_key:
+            self.account = Account.from_key(private_key)
+            self.w3.eth.default_account = self.account.address
+
+        # Transactions sent concurrently from one account take consecutive nonces from here
+        self._nonce = None
+        self._nonce_lock = asyncio.Lock()
+
+        # ABIs come parsed from the shared registry, contracts bind to this client's own AsyncWeb3
+        self.game_economy = self.w3.eth.contract(address=self.GAME_ECONOMY_ADDRESS, abi=REGISTRY.abi("GameEconomy"))
+        self.leaderboard = self.w3.eth.contract(address=self.LEADERBOARD_ADDRESS, abi=REGISTRY.abi("Leaderboard"))
+        self.usdc = self.w3.eth.contract(address=self.USDC_ADDRESS, abi=REGISTRY.abi("USDC"))
+
+    @classmethod
+    async def create(cls, private_key: Optional[str] = None, rpc_url: Optional[str] = None,
+                     chain_id: Optional[int] = None, addresses: Optional[Dict[str, str]] = None) -> "AsyncSaveTheCastleWeb3Client":
+        """Create and connect a client in one step"""
+        client = cls(private_key, rpc_url, chain_id, addresses)
+        await client.connect()
+        return client
+
+    async def connect(self):
+        """Check the RPC endpoint, like the sync client does in its constructor"""
+        if not await self.w3.is_connected():
+            raise ConnectionError(f"Failed to connect to {self.rpc_url}")
+
+    async def _next_nonce(self) -> int:
+        """Reserve the next nonce for this account"""
+        async with self._nonce_lock:
+            if self._nonce is None:
+                self._nonce = await self.w3.eth.get_transaction_count(self.account.address, 'pending')
+            nonce = self._nonce
+            self._nonce += 1
+            return nonce
+
+    async def _release_nonce(self, nonce: int):
+        """A send with this nonce failed, like the sync client: forget it if it was the latest one handed out,
+        otherwise reread the pending count"""
+        async with self._nonce_lock:
+            if self._nonce == nonce + 1:
+                self._nonce = None
+                return
+            try:
+                self._nonce = await self.w3.eth.get_transaction_count(self.account.address, 'pending')
+            except Exception:
+                self._nonce = None
+
+    async def _send(self, function, gas: int, value: int = 0) -> str:
+        """Build, sign and send a contract call, returns the transaction hash"""
+        nonce = None
+        try:
+            gas_price = await self.w3.eth.gas_price  # Before reserving a nonce, a failure here must not leave a gap
+            nonce = await self._next_nonce()
+            transaction = {
+                'from': self.account.address,
+                'gas': gas,
+                'gasPrice': gas_price,
+                'nonce': nonce,
+                'chainId': self.CHAIN_ID
+            }
+            if value:
+                transaction['value'] = value
+            transaction = await function.build_transaction(transaction)
+            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
+            tx_hash = await self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception:
+            if nonce is not None:
+                await self._release_nonce(nonce)
+            raise
+        return tx_hash.hex()
+
+    async def get_health_prices(self) -> Dict[str, float]:
+        """Get the player's current health prices in ETH and USDC with one getCurrentPricing call"""
+        try:
+            player = self.account.address if self.account else ZERO_ADDRESS
+            eth_price_wei, usdc_price_units = await self.game_economy.functions.getCurrentPricing(player).call()
+            return format_health_prices(eth_price_wei, usdc_price_units)
+        except Exception as e:
+            print(f"Error getting health prices: {e}")
+            return {"eth_price": 0, "usdc_price": 0, "eth_price_wei": 0, "usdc_price_units": 0}
+
+    async def purchase_health_with_eth(self) -> Optional[str]:
+        """Purchase health with ETH"""
+        if not self.account:
+            raise ValueError("Account required for transactions")
+
+        try:
+            prices = await self.get_health_prices()
+            eth_price = prices["eth_price_wei"]
+            if eth_price == 0:
+                raise ValueError("Could not get ETH price")
+
+            tx_hash = await self._send(self.game_economy.functions.purchaseHealthWithETH(HEALTH_PER_PURCHASE), 200000, eth_price)
+            print(f"Health purchased with ETH! TX: {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            print(f"Error purchasing health with ETH: {e}")
+            return None
+
+    async def purchase_health_with_usdc(self) -> Optional[str]:
+        """Purchase health with USDC (requires prior approval)"""
+        if not self.account:
+            raise ValueError("Account required for transactions")
+
+        try:
+            prices, balance = await asyncio.gather(
+                self.get_health_prices(),
+                self.usdc.functions.balanceOf(self.account.address).call())
+            usdc_amount = prices["usdc_price_units"]
+            if usdc_amount == 0:
+                raise ValueError("Could not get USDC price")
+            if balance < usdc_amount:
+                raise ValueError(f"Insufficient USDC balance. Need {usdc_amount/1e6}, have {balance/1e6}")
+
+            tx_hash = await self._send(self.game_economy.functions.purchaseHealthWithUSDC(HEALTH_PER_PURCHASE), 250000)
+            print(f"Health purchased with USDC! TX: {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            print(f"Error purchasing health with USDC: {e}")
+            return None
+
+    async def approve_usdc(self, amount: Optional[int] = None) -> Optional[str]:
+        """Approve USDC spending for health purchases"""
+        if not self.account:
+            raise ValueError("Account required for transactions")
+
+        try:
+            if amount is None:
+                amount = 2**256 - 1  # Max uint256
+            tx_hash = await self._send(self.usdc.functions.approve(self.GAME_ECONOMY_ADDRESS, amount), 100000)
+            print(f"USDC approved! TX: {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            print(f"Error approving USDC: {e}")
+            return None
+
+    async def start_game_session(self) -> Optional[str]:
+        """Open an on-chain game session, required before purchases and endGameSession"""
+        if not self.account:
+            raise ValueError("Account required for transactions")
+
+        try:
+            tx_hash = await self._send(self.game_economy.functions.startGameSession(), 150000)
+            print(f"Game session started! TX: {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            print(f"Error starting game session: {e}")
+            return None
+
+    async def end_game_session(self, final_score: int) -> Optional[str]:
+        """Close the open game session, recording the final score in GameSessionEnded"""
+        if not self.account:
+            raise ValueError("Account required for transactions")
+
+        try:
+            tx_hash = await self._send(self.game_economy.functions.endGameSession(final_score), 100000)
+            print(f"Game session ended! TX: {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            print(f"Error ending game session: {e}")
+            return None
+
+    async def submit_game_score(self, player_name: str, score: int, health_purchased: bool) -> Optional[str]:
+        """Submit game score by ending the open game session (see SaveTheCastleWeb3Client.submit_game_score)"""
+        if not self.account:
+            raise ValueError("Account required for transactions")
+
+        tx_hash = await self.end_game_session(score)
+        if tx_hash:
+            print(f"Score submitted! TX: {tx_hash}")
+        return tx_hash
+
+    async def get_leaderboard(self, leaderboard_type: str = "all_time", limit: int = 100, offset: int = 0) -> Sequence[Dict]:
+        """Get a page of leaderboard rows, decoded as they are read"""
+        try:
+            top_scores, _ = LEADERBOARD_VIEWS.get(leaderboard_type, LEADERBOARD_VIEWS["all_time"])
+            data = await self.w3.eth.call({"to": self.LEADERBOARD_ADDRESS,
+                                           "data": REGISTRY.codec("Leaderboard", top_scores).encode(offset + limit)})
+            page = LeaderboardPage.from_top_scores(bytes(data))
+            return LeaderboardPage(page.rows[offset:], offset + 1) if offset else page
+        except Exception as e:
+            print(f"Error getting leaderboard: {e}")
+            return []
+
+    async def get_player_stats(self, player_address: Optional[str] = None) -> Dict:
+        """Get player statistics"""
+        if not player_address and not self.account:
+            raise ValueError("Player address or account required")
+
+        address = player_address or self.account.address
+        try:
+            stats = await self.leaderboard.functions.playerStats(address).call()
+            return format_player_stats(stats)
+        except Exception as e:
+            print(f"Error getting player stats: {e}")
+            return {"best_score": 0, "total_games": 0, "total_spent": 0, "last_known_name": ""}
+
+    async def get_many_player_stats(self, addresses: List[str]) -> List[Dict]:
+        """Player statistics for many addresses, fetched concurrently"""
+        return list(await asyncio.gather(*(self.get_player_stats(address) for address in addresses)))
+
+    async def get_account_info(self) -> Dict:
+        """Get current account information"""
+        if not self.account:
+            return {"address": None, "eth_balance": 0, "usdc_balance": 0}
+
+        try:
+            eth_balance, usdc_balance = await asyncio.gather(
+                self.w3.eth.get_balance(self.account.address),
+                self.usdc.functions.balanceOf(self.account.address).call())
+            return {
+                "address": self.account.address,
+                "eth_balance": self.w3.from_wei(eth_balance, 'ether'),
+                "usdc_balance": usdc_balance / 1e6
+            }
+        except Exception as e:
+            print(f"Error getting account info: {e}")
+            return {"address": self.account.address, "eth_balance": 0, "usdc_balance": 0}
+
+
+# Example usage
+if __name__ == "__main__":
+    async def main():
+        client = await AsyncSaveTheCastleWeb3Client.create()
+        print(f"Connected to: {client.rpc_url}")
+        prices, leaderboard = await asyncio.gather(client.get_health_prices(), client.get_leaderboard("all_time"))
+        print(f"ETH Price: {prices['eth_price']} ETH, USDC Price: {prices['usdc_price']} USDC")
+        for i, entry in enumerate(leaderboard[:5]):
+            print(f"{i+1}. {entry['name']} - {entry['score']} points ({entry['timestamp']})")
+
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+Block-aware read cache for Save the Castle
+Balances and player stats are read once and reused until the chain says otherwise: a cheap eth_blockNumber
+poll notices new blocks, and only a USDC Transfer, HealthPurchased, ScoreSubmitted or name change for a
+cached address (or a transaction of our own being mined) drops that address's entries
+"""
+
+import threading
+import time
+from typing import Optional, Dict, Callable, Set, Tuple
+
+from web3 import Web3
+
+from event_service import TOPICS
+
+PLAYER_NAME_UPDATED_TOPIC = Web3.to_hex(Web3.keccak(text="PlayerNameUpdated(address,string,string)"))
+
+# Entry kinds each event invalidates for the address it names
+ACCOUNT_INFO = "account_info"
+PLAYER_STATS = "player_stats"
+INVALIDATES = {
+    TOPICS["Transfer"]: (ACCOUNT_INFO,),
+    TOPICS["HealthPurchased"]: (ACCOUNT_INFO,),
+    TOPICS["ScoreSubmitted"]: (PLAYER_STATS,),
+    PLAYER_NAME_UPDATED_TOPIC: (PLAYER_STATS,),
+}
+
+
+def _topic(address: str) -> str:
+    return "0x" + "00" * 12 + address[2:].lower()
+
+
+class BlockCache:
+    """Results of per-address reads, kept across blocks until an event for that address invalidates them"""
+
+    def __init__(self, client, poll_interval: float = 1.0, balance_ttl: float = 30.0):
+        """
+        Args:
+            client: SaveTheCastleWeb3Client to query through
+            poll_interval: Least seconds between eth_blockNumber polls (Base mines a block every 2 s)
+            balance_ttl: Seconds an account_info entry is trusted without an event, plain ETH transfers emit no log
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.balance_ttl = balance_ttl
+        self.lock = threading.Lock()
+        self.poll_lock = threading.Lock()  # One thread polls at a time, the others keep the block they have
+        self.entries: Dict[Tuple[str, str], Tuple[object, int, float]] = {}  # (kind, address) -> (value, block, time)
+        self.generations: Dict[str, int] = {}  # Bumped on invalidation, so a read racing it is not stored
+        self.pending: Dict[str, int] = {}  # Address -> nonce its latest own transaction leaves behind, until mined
+        self.block: Optional[int] = None  # Logs up to this block have been applied
+        self.poll_time = 0.0
+        self.stats = {"hits": 0, "misses": 0, "polls": 0, "scans": 0, "invalidations": 0}
+
+    def get(self, kind: str, address: str, fetch: Callable[[], object]):
+        """Cached value of `kind` for an address, fetched on a miss"""
+        self.poll()
+        key = (kind, address.lower())
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (kind != ACCOUNT_INFO or time.monotonic() - entry[2] < self.balance_ttl):
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            generation = self.generations.get(key[1], 0)
+        value = fetch()
+        with self.lock:
+            if self.generations.get(key[1], 0) == generation:
+                self.entries[key] = (value, self.block or 0, time.monotonic())
+        return value
+
+    def invalidate(self, address: str, kinds: Optional[Tuple[str, ...]] = None):
+        """Drop an address's entries, every kind unless `kinds` is given"""
+        address = address.lower()
+        with self.lock:
+            self.generations[address] = self.generations.get(address, 0) + 1
+            for key in [key for key in self.entries if key[1] == address and (kinds is None or key[0] in kinds)]:
+                del self.entries[key]
+                self.stats["invalidations"] += 1
+
+    def transaction_sent(self, address: str, nonce: int):
+        """One of our transactions left: the address's balance changes once it is mined, whether or not it logs"""
+        address = address.lower()
+        with self.lock:
+            self.pending[address] = max(self.pending.get(address, 0), nonce + 1)
+        self.invalidate(address, (ACCOUNT_INFO,))
+
+    def poll(self) -> Optional[int]:
+        """Check the block number at most every poll_interval seconds and apply the logs of any new blocks"""
+        if time.monotonic() - self.poll_time < self.poll_interval or not self.poll_lock.acquire(blocking=False):
+            return self.block
+        try:
+            self.poll_time = time.monotonic()
+            self.stats["polls"] += 1
+            with self.lock:
+                pending = dict(self.pending)
+            # While our own transactions are unmined, their nonces ride along in the same request
+            requests = [("eth_blockNumber", [])] + [("eth_getTransactionCount", [Web3.to_checksum_address(address), "latest"])
+                                                    for address in pending]
+            replies = self.client._batch_rpc(requests)
+            latest = int(replies[0]["result"], 16)
+            new_block = self.block is not None and latest > self.block
+            for (address, expected), reply in zip(pending.items(), replies[1:]):
+                mined = "result" in reply and int(reply["result"], 16) >= expected
+                if mined:
+                    with self.lock:
+                        if self.pending.get(address) == expected:
+                            del self.pending[address]
+                if mined or new_block:
+                    self.invalidate(address, (ACCOUNT_INFO,))  # Gas was paid in this block, maybe
+            if new_block:
+                self._scan(self.block + 1, latest)
+            self.block = max(latest, self.block or 0)
+        except Exception as e:
+            print(f"Error polling block number: {e}")
+        finally:
+            self.poll_lock.release()
+        return self.block
+
+    def _scan(self, from_block: int, to_block: int):
+        """Invalidate the cached addresses named by relevant logs in a block range, one batch request"""
+        with self.lock:
+            addresses: Set[str] = {address for _, address in self.entries}
+        if not addresses:
+            return
+        self.stats["scans"] += 1
+        players = [_topic(address) for address in sorted(addresses)]
+        client = self.client
+        span = {"fromBlock": hex(from_block), "toBlock": hex(to_block)}
+        queries = [
+            dict(span, address=client.USDC_ADDRESS, topics=[TOPICS["Transfer"], players]),
+            dict(span, address=client.USDC_ADDRESS, topics=[TOPICS["Transfer"], None, players]),
+            dict(span, address=[client.GAME_ECONOMY_ADDRESS, client.LEADERBOARD_ADDRESS],
+                 topics=[[TOPICS["HealthPurchased"], TOPICS["ScoreSubmitted"], PLAYER_NAME_UPDATED_TOPIC], players]),
+        ]
+        replies = client._batch_rpc([("eth_getLogs", [query]) for query in queries])
+        if any("result" not in reply for reply in replies):
+            # Cannot tell what changed, so assume everything did
+            for address in addresses:
+                self.invalidate(address)
+            return
+        for log in (log for reply in replies for log in reply["result"]):
+            kinds = INVALIDATES.get(log["topics"][0])
+            for topic in log["topics"][1:3] if kinds else ():  # Player, or Transfer's from and to
+                address = "0x" + topic[-40:].lower()
+                if address in addresses:
+                    self.invalidate(address, kinds)
@@ -19,6 +19,14 @@ contract SaveTheCastleLeaderboard is Ownable, ReentrancyGuard, Pausable {
         bool isPaidPlayer; // Whether player used health purchases
     }
     
+    struct ScoreClaim {
+        address player;
+        string playerName;
+        uint256 score;
+        bool isPaidPlayer;
+        uint256 totalSpent;
+    }
+    
     struct PlayerStats {
         uint256 bestScore;
         uint256 totalGames;
@@ -49,6 +57,9 @@ contract SaveTheCastleLeaderboard is Ownable, ReentrancyGuard, Pausable {
     // Game contract address (for authorization)
     address public gameContract;
     
+    // Score relayers (hot wallets of relayer.py) allowed to submit alongside the game contract
+    mapping(address => bool) public scoreRelayers;
+    
     // Events
     event ScoreSubmitted(
         address indexed player,
@@ -59,9 +70,10 @@ contract SaveTheCastleLeaderboard is Ownable, ReentrancyGuard, Pausable {
     );
     event LeaderboardReset(string leaderboardType, uint256 timestamp);
     event PlayerNameUpdated(address indexed player, string oldName, string newName);
+    event ScoreRelayerUpdated(address indexed relayer, bool allowed);
     
     modifier onlyGameContract() {
-        require(msg.sender == gameContract, "Only game contract can submit scores");
+        require(msg.sender == gameContract || scoreRelayers[msg.sender], "Only game contract can submit scores");
         _;
     }
     
@@ -77,6 +89,14 @@ contract SaveTheCastleLeaderboard is Ownable, ReentrancyGuard, Pausable {
         gameContract = _gameContract;
     }
     
+    /**
+     * @dev Allow or revoke a score relayer wallet
+     */
+    function setScoreRelayer(address relayer, bool allowed) external onlyOwner {
+        scoreRelayers[relayer] = allowed;
+        emit ScoreRelayerUpdated(relayer, allowed);
+    }
+    
     /**
      * @dev Submit a new score (called by game contract)
      */
@@ -95,6 +115,38 @@ contract SaveTheCastleLeaderboard is Ownable, ReentrancyGuard, Pausable {
             revert("Player name already taken");
         }
         
+        _recordScore(player, playerName, score, isPaidPlayer, totalSpent);
+    }
+    
+    /**
+     * @dev Submit many scores in one transaction (called by a relayer). Entries that
+     * submitScore would reject are skipped so one bad claim does not revert the batch
+     */
+    function submitScores(ScoreClaim[] calldata claims) external onlyGameContract whenNotPaused nonReentrant {
+        for (uint256 i = 0; i < claims.length; i++) {
+            ScoreClaim calldata claim = claims[i];
+            uint256 nameLength = bytes(claim.playerName).length;
+            if (claim.score < minScoreThreshold || nameLength == 0 || nameLength > 32) {
+                continue;
+            }
+            address nameOwner = nameToAddress[claim.playerName];
+            if (nameOwner != address(0) && nameOwner != claim.player) {
+                continue;
+            }
+            _recordScore(claim.player, claim.playerName, claim.score, claim.isPaidPlayer, claim.totalSpent);
+        }
+    }
+    
+    /**
+     * @dev Record a validated score in the player stats and leaderboards
+     */
+    function _recordScore(
+        address player,
+        string memory playerName,
+        uint256 score,
+        bool isPaidPlayer,
+        uint256 totalSpent
+    ) internal {
         // Update time periods if needed
         _updateTimePeriods();
         
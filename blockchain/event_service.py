@@ -0,0 +1,264 @@
+"""
+Chain event subscription for Save the Castle
+A background thread follows the player's ScoreSubmitted, HealthPurchased and USDC Transfer logs plus
+PricesUpdated through JSON-RPC log filters (eth_getLogs polling where filters are unavailable) and keeps
+a local ChainState up to date, so the renderer reads balances and prices without touching the chain
+"""
+
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Optional, Dict, List, Tuple
+
+from web3 import Web3
+
+from abi_registry import REGISTRY
+
+TOPICS = {
+    "ScoreSubmitted": Web3.to_hex(Web3.keccak(text="ScoreSubmitted(address,string,uint256,uint256,bool)")),
+    "HealthPurchased": Web3.to_hex(Web3.keccak(text="HealthPurchased(address,uint256,uint256,uint256,string,uint256,uint256)")),
+    "PricesUpdated": Web3.to_hex(Web3.keccak(text="PricesUpdated(uint256,uint256)")),
+    "Transfer": Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)")),
+}
+EVENT_NAMES = {topic: name for name, topic in TOPICS.items()}
+
+
+def _word(data: bytes, index: int) -> int:
+    return int.from_bytes(data[32 * index:32 * (index + 1)], "big")
+
+
+def _string(data: bytes, index: int) -> str:
+    offset = _word(data, index)
+    length = int.from_bytes(data[offset:offset + 32], "big")
+    return data[offset + 32:offset + 32 + length].decode(errors="replace")
+
+
+def _address(topic: str) -> str:
+    return Web3.to_checksum_address("0x" + topic[-40:])
+
+
+class ChainState:
+    """What the HUD shows about the chain, written by ChainEventService and read by the renderer"""
+
+    def __init__(self, address: Optional[str]):
+        self.lock = threading.Lock()
+        self.values = {
+            "address": address,
+            "eth_balance": Decimal(0),
+            "usdc_balance": 0.0,
+            "usdc_balance_units": 0,
+            "prices": {"eth_price": 0, "usdc_price": 0, "eth_price_wei": 0, "usdc_price_units": 0},
+            "best_score": 0,
+            "last_score": None,
+            "block": 0,
+            "synced": False,
+        }
+        self.events = deque(maxlen=20)  # Latest decoded events touching the player, newest last
+
+    def update(self, **values):
+        with self.lock:
+            self.values.update(values)
+
+    def snapshot(self) -> Dict:
+        """Copy of the current values plus recent events, safe to read from the render thread"""
+        with self.lock:
+            return dict(self.values, events=list(self.events))
+
+
+class ChainEventService:
+    """Follows the chain for one player from a background thread and applies each event to a ChainState"""
+
+    def __init__(self, client, poll_interval: float = 0.5, balance_ttl: float = 30.0, use_filters: bool = True):
+        """
+        Args:
+            client: SaveTheCastleWeb3Client of the player (read-only clients only follow PricesUpdated)
+            poll_interval: Seconds between polls, each is one HTTP request while nothing happens
+            balance_ttl: Seconds between balance re-reads when no event touched the player (plain ETH transfers emit no log)
+            use_filters: Use eth_newFilter/eth_getFilterChanges, False polls eth_getLogs by block range
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.balance_ttl = balance_ttl
+        self.use_filters = use_filters
+        self.address = client.account.address if client.account else None
+        self.state = ChainState(self.address)
+        self.filters: Optional[List[str]] = None
+        self.last_block = 0
+        self.balances_time = 0.0
+        self.balances_block = 0  # Balances read at this block already include its transfers
+        self.balances_stale = True
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {"polls": 0, "requests": 0, "events": 0, "errors": 0}
+
+    def _queries(self) -> List[Dict]:
+        """eth_getLogs/eth_newFilter parameters of every log stream followed"""
+        queries = [{"address": self.client.GAME_ECONOMY_ADDRESS, "topics": [TOPICS["PricesUpdated"]]}]
+        if self.address:
+            player = "0x" + "00" * 12 + self.address[2:].lower()
+            queries += [
+                {"address": [self.client.GAME_ECONOMY_ADDRESS, self.client.LEADERBOARD_ADDRESS],
+                 "topics": [[TOPICS["ScoreSubmitted"], TOPICS["HealthPurchased"]], player]},
+                {"address": self.client.USDC_ADDRESS, "topics": [TOPICS["Transfer"], player]},
+                {"address": self.client.USDC_ADDRESS, "topics": [TOPICS["Transfer"], None, player]},
+            ]
+        return queries
+
+    def _batch(self, requests: List[Tuple[str, List]]) -> List[Dict]:
+        self.stats["requests"] += 1
+        return self.client._batch_rpc(requests)
+
+    # Lifecycle
+
+    def start(self) -> "ChainEventService":
+        """Start following from a background thread, which first reads the starting state (state["synced"] until then False)"""
+        self.thread = threading.Thread(target=self._run, name="chain-events", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        if self.filters:
+            try:
+                self._batch([("eth_uninstallFilter", [filter_id]) for filter_id in self.filters])
+            except Exception:
+                pass  # The node expires unused filters anyway
+            self.filters = None
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sync()
+                self._install_filters()
+                break
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Error reading chain state: {e}")
+                self.stop_event.wait(5.0)
+        while not self.stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Error polling chain events: {e}")
+
+    def _install_filters(self):
+        self.filters = None
+        if not self.use_filters:
+            return
+        replies = self._batch([("eth_newFilter", [dict(query, fromBlock=hex(self.last_block + 1))])
+                               for query in self._queries()])
+        if any("result" not in reply for reply in replies):
+            print("Log filters unavailable, polling eth_getLogs instead")
+            self.use_filters = False
+            return
+        self.filters = [reply["result"] for reply in replies]
+
+    # Reading the chain
+
+    def sync(self):
+        """Re-read everything the events would otherwise keep up to date"""
+        self._read_balances()
+        self.state.update(prices=self.client.pricing.refresh())
+        if self.address:
+            stats = self.client.get_player_stats()
+            self.state.update(best_score=stats["best_score"])
+        self.state.update(synced=True)
+
+    def _read_balances(self):
+        """Block number and both balances in one batch request"""
+        requests = [("eth_blockNumber", [])]
+        if self.address:
+            balance_of = REGISTRY.codec("USDC", "balanceOf").encode(self.address)
+            requests += [("eth_getBalance", [self.address, "latest"]),
+                         ("eth_call", [{"to": self.client.USDC_ADDRESS, "data": "0x" + balance_of.hex()}, "latest"])]
+        replies = self._batch(requests)
+        block = int(replies[0]["result"], 16)
+        self.last_block = self.last_block or block  # Follow events from here on
+        if self.address and "result" in replies[1] and "result" in replies[2]:
+            usdc = int(replies[2]["result"], 16)
+            self.state.update(eth_balance=Web3.from_wei(int(replies[1]["result"], 16), "ether"),
+                              usdc_balance=usdc / 1e6, usdc_balance_units=usdc, block=block)
+            self.balances_block = block
+        self.balances_time = time.monotonic()
+        self.balances_stale = False
+
+    def _new_logs(self) -> List[Dict]:
+        if self.filters:
+            replies = self._batch([("eth_getFilterChanges", [filter_id]) for filter_id in self.filters])
+            if all("result" in reply for reply in replies):
+                return [log for reply in replies for log in reply["result"]]
+            # Filters expire on most nodes after a few idle minutes: catch up by block range, then reinstall
+            print("Log filter lost, catching up with eth_getLogs")
+            logs = self._logs_since(self.last_block)
+            self._install_filters()
+            return logs
+        return self._logs_since(self.last_block)
+
+    def _logs_since(self, last_block: int) -> List[Dict]:
+        """Logs of every followed stream after last_block, one request when no block was mined"""
+        latest = int(self._batch([("eth_blockNumber", [])])[0]["result"], 16)
+        if latest <= last_block:
+            return []
+        replies = self._batch([("eth_getLogs", [dict(query, fromBlock=hex(last_block + 1), toBlock=hex(latest))])
+                               for query in self._queries()])
+        failed = [reply["error"] for reply in replies if "result" not in reply]
+        if failed:
+            raise ValueError(f"eth_getLogs failed: {failed[0]}")
+        self.last_block = latest
+        return [log for reply in replies for log in reply["result"]]
+
+    def poll(self) -> int:
+        """One round of following the chain, returns events applied"""
+        self.stats["polls"] += 1
+        logs = sorted(self._new_logs(), key=lambda log: (int(log["blockNumber"], 16), int(log["logIndex"], 16)))
+        for log in logs:
+            self._apply(log)
+            self.last_block = max(self.last_block, int(log["blockNumber"], 16))
+        self.stats["events"] += len(logs)
+        if self.address and (self.balances_stale or time.monotonic() - self.balances_time > self.balance_ttl):
+            self._read_balances()
+        return len(logs)
+
+    def _apply(self, log: Dict):
+        """Fold one log into the state"""
+        name = EVENT_NAMES.get(log["topics"][0])
+        data = bytes.fromhex(log["data"][2:])
+        event = {"event": name, "block": int(log["blockNumber"], 16), "tx": log["transactionHash"]}
+
+        if name == "PricesUpdated":
+            # Every player's prices move: take the new base prices, then re-read ours in one batch
+            self.client.pricing.on_prices_updated(_word(data, 0), _word(data, 1))
+            self.state.update(prices=self.client.pricing.refresh())
+            event.update(eth_price_wei=_word(data, 0), usdc_price_units=_word(data, 1))
+        elif name == "HealthPurchased":
+            # Already predicted when the purchase was sent, the event confirms it
+            self.state.update(prices=self.client.pricing.refresh())
+            self.balances_stale = True
+            event.update(health=_word(data, 0), cost_wei=_word(data, 1), cost_usdc=_word(data, 2), method=_string(data, 3))
+        elif name == "ScoreSubmitted":
+            score = _word(data, 1)
+            with self.state.lock:
+                self.state.values["best_score"] = max(self.state.values["best_score"], score)
+                self.state.values["last_score"] = score
+            self.balances_stale = True  # The player paid gas if they sent it
+            event.update(name=_string(data, 0), score=score, is_paid_player=bool(_word(data, 3)))
+        elif name == "Transfer":
+            value = _word(data, 0)
+            sender, receiver = _address(log["topics"][1]), _address(log["topics"][2])
+            if sender == receiver or event["block"] <= self.balances_block:
+                return
+            delta = value if receiver == self.address else -value
+            with self.state.lock:
+                units = self.state.values["usdc_balance_units"] + delta
+                self.state.values.update(usdc_balance_units=units, usdc_balance=units / 1e6)
+            event.update(sender=sender, receiver=receiver, value=value)
+        else:
+            return
+
+        with self.state.lock:
+            self.state.events.append(event)
+            self.state.values["block"] = max(self.state.values["block"], event["block"])
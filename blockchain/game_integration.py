@@ -6,8 +6,13 @@ Integrates Web3 functionality with the existing pygame-based game
 import pygame
 import sys
 import os
-from typing import Optional, Dict, Any
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, List
 from web3_client import SaveTheCastleWeb3Client
+from rank_index import RankIndex
+from event_service import ChainEventService
+from session_manager import GameSessions
+from rpc_metrics import METRICS
 
 # Add the main game directory to path to import game modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -32,12 +37,19 @@ class BlockchainGameManager:
         self.player_name = ""
         self.health_purchased_this_session = False
         self.original_health = 100  # Track original health to detect purchases
+        self.rank_index = RankIndex()  # Filled by refresh_rank_index, read by the leaderboard screens
+        self.chain_events: Optional[ChainEventService] = None  # Started by the first chain_state call
+        self.sessions: Optional[GameSessions] = None  # On-chain game sessions, wallet clients only
         
         # Initialize Web3 client
         try:
             self.web3_client = SaveTheCastleWeb3Client(private_key)
             self.blockchain_enabled = True
             print("Blockchain integration enabled")
+            if self.web3_client.account:
+                # Open the first game session now, so it is ready by the time the game starts
+                self.sessions = GameSessions(self.web3_client)
+                self.sessions.prepare()
         except Exception as e:
             print(f"Blockchain initialization failed: {e}")
             self.blockchain_enabled = False
@@ -59,6 +71,8 @@ class BlockchainGameManager:
             print("Blockchain not available")
             return None
         
+        if self.sessions:
+            self.sessions.wait_until_sent()  # Purchases need the session opened first, in nonce order
         tx_hash = self.web3_client.purchase_health_with_eth()
         if tx_hash:
             self.health_purchased_this_session = True
@@ -70,6 +84,8 @@ class BlockchainGameManager:
             print("Blockchain not available")
             return None
         
+        if self.sessions:
+            self.sessions.wait_until_sent()  # Purchases need the session opened first, in nonce order
         tx_hash = self.web3_client.purchase_health_with_usdc()
         if tx_hash:
             self.health_purchased_this_session = True
@@ -83,8 +99,25 @@ class BlockchainGameManager:
         
         return self.web3_client.approve_usdc()
     
+    def begin_game_session(self) -> Optional[Future]:
+        """Take the pre-opened on-chain session for a new game, without waiting for it to be mined"""
+        if not self.sessions:
+            return None
+        
+        self.health_purchased_this_session = False
+        return self.sessions.begin()
+    
+    def end_game_session(self, score: int, play_again: bool = True) -> Optional[Future]:
+        """Queue the game's endGameSession and the next game's startGameSession, returns a future of the end TX hash"""
+        if not self.sessions:
+            print("Blockchain not available - score not submitted")
+            return None
+        
+        self.health_purchased_this_session = False
+        return self.sessions.end(score, play_again)
+    
     def submit_game_score(self, score: int) -> Optional[str]:
-        """Submit final game score to blockchain leaderboard"""
+        """Submit final game score to blockchain, waiting until the transaction is sent"""
         if not self.blockchain_enabled:
             print("Blockchain not available - score not submitted")
             return None
@@ -93,23 +126,18 @@ class BlockchainGameManager:
             print("Player name not set - using default")
             self.player_name = f"Player_{self.web3_client.account.address[-6:] if self.web3_client.account else 'Unknown'}"
         
-        tx_hash = self.web3_client.submit_game_score(
-            self.player_name, 
-            score, 
-            self.health_purchased_this_session
-        )
-        
-        # Reset session state
-        self.health_purchased_this_session = False
-        
-        return tx_hash
+        if self.sessions:
+            self.sessions.begin()  # Games started without begin_game_session still need a session to end
+            ended = self.end_game_session(score, play_again=False)
+            return ended.result() if ended else None
+        return self.web3_client.submit_game_score(self.player_name, score, self.health_purchased_this_session)
     
-    def get_leaderboard(self, leaderboard_type: str = "all_time"):
-        """Get leaderboard data"""
+    def get_leaderboard(self, leaderboard_type: str = "all_time", limit: int = 100, offset: int = 0):
+        """Get a page of leaderboard data, fetch only the rows you will show"""
         if not self.blockchain_enabled:
             return []
         
-        return self.web3_client.get_leaderboard(leaderboard_type)
+        return self.web3_client.get_leaderboard(leaderboard_type, limit, offset)
     
     def get_player_stats(self):
         """Get current player statistics"""
@@ -118,6 +146,35 @@ class BlockchainGameManager:
         
         return self.web3_client.get_player_stats()
     
+    def refresh_rank_index(self, addresses: Optional[List[str]] = None) -> int:
+        """Fetch stats for the leaderboard's players (and ours) in bulk into the local rank index, returns players indexed"""
+        if not self.blockchain_enabled:
+            return 0
+        
+        if addresses is None:
+            addresses = [entry["player"] for entry in self.get_leaderboard("all_time")]
+            if self.web3_client.account:
+                addresses.append(self.web3_client.account.address)
+        addresses = list(dict.fromkeys(addresses))
+        
+        self.rank_index.update_many(zip(addresses, self.web3_client.get_many_player_stats(addresses)))
+        return len(self.rank_index)
+    
+    def player_context(self, radius: int = 2) -> Optional[Dict[str, Any]]:
+        """Our rank and the players around us, answered from the rank index without touching the chain"""
+        if not self.blockchain_enabled or not self.web3_client.account:
+            return None
+        
+        address = self.web3_client.account.address
+        if address not in self.rank_index:
+            return None
+        return {
+            "rank": self.rank_index.rank(address),
+            "players": len(self.rank_index),
+            "best_score": self.rank_index.stats[address]["best_score"],
+            "around": self.rank_index.around(address, radius)
+        }
+    
     def get_account_info(self):
         """Get account balance information"""
         if not self.blockchain_enabled:
@@ -125,14 +182,39 @@ class BlockchainGameManager:
         
         return self.web3_client.get_account_info()
     
+    def chain_state(self) -> Dict[str, Any]:
+        """Balances, prices and scores as last seen by the event service, free to call every frame"""
+        if not self.blockchain_enabled:
+            return {"address": None, "eth_balance": 0, "usdc_balance": 0, "prices": {"eth_price": 0, "usdc_price": 0},
+                    "best_score": 0, "last_score": None, "events": [], "synced": False}
+        
+        if self.chain_events is None:
+            self.chain_events = ChainEventService(self.web3_client).start()
+        return self.chain_events.state.snapshot()
+    
+    def serve_rpc_metrics(self, port: int):
+        """Serve the RPC call metrics of this process on a local port, see rpc_metrics.py"""
+        try:
+            METRICS.serve(port)
+        except OSError as e:
+            print(f"Error serving RPC metrics on port {port}: {e}")
+    
+    def shutdown(self):
+        """Stop following the chain and sending session transactions"""
+        if self.chain_events:
+            self.chain_events.stop()
+            self.chain_events = None
+        if self.sessions:
+            self.sessions.close()
+    
     def render_blockchain_ui(self, screen, font, y_offset=10):
         """Render blockchain-related UI elements"""
         if not self.blockchain_enabled:
             return y_offset
         
-        # Get account info
-        account_info = self.get_account_info()
-        prices = self.get_health_prices()
+        # Kept current by chain events, no RPC while rendering
+        account_info = self.chain_state()
+        prices = account_info["prices"]
         
         # Render account address (truncated)
         if account_info["address"]:
@@ -173,7 +255,7 @@ class BlockchainGameManager:
         if not self.blockchain_enabled:
             return
         
-        leaderboard = self.get_leaderboard("all_time")
+        leaderboard = self.get_leaderboard("all_time", limit=max_entries)
         
         # Header
         header = font.render("LEADERBOARD", True, (255, 255, 255))
@@ -193,6 +275,11 @@ class BlockchainGameManager:
             entry_surface = font.render(entry_text, True, color)
             screen.blit(entry_surface, (x, y))
             y += 20
+        
+        context = self.player_context()
+        if context:
+            you_text = f"You: #{context['rank']} of {context['players']} ({context['best_score']})"
+            screen.blit(font.render(you_text, True, (255, 255, 0)), (x, y + 10))
     
     def handle_blockchain_input(self, event) -> bool:
         """Handle blockchain-related input events"""
@@ -276,7 +363,7 @@ class EnhancedGameSession:
     def show_leaderboard(self):
         """Display current leaderboard"""
         print("\n=== ALL-TIME LEADERBOARD ===")
-        leaderboard = self.blockchain_manager.get_leaderboard("all_time")
+        leaderboard = self.blockchain_manager.get_leaderboard("all_time", limit=10)
         
         for i, entry in enumerate(leaderboard[:10]):
             rank = i + 1
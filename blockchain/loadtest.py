@@ -0,0 +1,206 @@
+"""
+Load generator for the Save the Castle web3 client
+Drives each SaveTheCastleWeb3Client method from many threads against the local mock chain (started
+in-process by default) or any RPC URL, and reports calls/sec, errors and latency percentiles per method
+"""
+
+import argparse
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from typing import Optional, Dict, List
+
+from eth_account import Account
+
+from web3_client import SaveTheCastleWeb3Client
+from relayer import HARDHAT_KEYS, percentile
+from mock_chain import MockChain, MockRPCServer
+
+# method -> (sends a transaction, relative weight, call)
+WORKLOAD = {
+    "get_health_prices": (False, 20, lambda client, rng: client.get_health_prices()),
+    "get_leaderboard": (False, 20, lambda client, rng: client.get_leaderboard(
+        rng.choice(["all_time", "daily", "weekly"]), 15)),
+    "get_player_stats": (False, 20, lambda client, rng: client.get_player_stats()),
+    "get_account_info": (False, 20, lambda client, rng: client.get_account_info()),
+    "approve_usdc": (True, 5, lambda client, rng: client.approve_usdc()),
+    "purchase_health_with_eth": (True, 5, lambda client, rng: client.purchase_health_with_eth()),
+    "purchase_health_with_usdc": (True, 5, lambda client, rng: client.purchase_health_with_usdc()),
+    "start_game_session": (True, 5, lambda client, rng: client.start_game_session()),
+    "submit_game_score": (True, 5, lambda client, rng: client.submit_game_score(
+        f"load{client.account.address[2:8]}", rng.randint(100, 5000), rng.random() < 0.3)),
+}
+
+
+class _ThreadConsole:
+    """Stands in for sys.stdout during a run: worker prints are kept per thread, the main thread's pass through"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        if threading.current_thread() is threading.main_thread():
+            return self.stream.write(text)
+        self.local.text = getattr(self.local, "text", "") + text
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def take(self) -> str:
+        """What this thread printed since the last take"""
+        text = getattr(self.local, "text", "")
+        self.local.text = ""
+        return text
+
+
+def run(rpc_url: str, keys: List[str], seconds: float, methods: List[str], chain_id: Optional[int] = None,
+        seed: int = 0, receipt_timeout: float = 60.0) -> Dict:
+    """One client per key, each on its own thread picking weighted methods until time is up"""
+    clients = [SaveTheCastleWeb3Client(key, rpc_url, chain_id) for key in keys]
+    weights = [WORKLOAD[method][1] for method in methods]
+    samples: Dict[str, List[float]] = {method: [] for method in methods}
+    errors = {method: 0 for method in methods}
+    sent: Dict[str, List[str]] = {method: [] for method in methods}
+    lock = threading.Lock()
+    console = _ThreadConsole(sys.stdout)
+    deadline = time.perf_counter() + seconds
+
+    def worker(index: int):
+        client, rng = clients[index], random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            method = rng.choices(methods, weights)[0]
+            is_transaction, _, call = WORKLOAD[method]
+            console.take()
+            start = time.perf_counter()
+            try:
+                result, failed = call(client, rng), False
+            except Exception:
+                result, failed = None, True
+            elapsed = time.perf_counter() - start
+            # The client reports failures by printing and returning defaults
+            failed = failed or "Error" in console.take() or (is_transaction and result is None)
+            with lock:
+                samples[method].append(elapsed)
+                errors[method] += failed
+                if is_transaction and result:
+                    sent[method].append(result)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(clients))]
+    sys.stdout = console
+    started = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.stdout = console.stream
+    wall = time.perf_counter() - started
+
+    # Sent is not mined: count transactions that reverted on chain separately
+    w3 = clients[0].w3
+
+    # One deadline for every receipt, a hash stuck behind a nonce gap is reported as unmined instead of waited on
+    statuses: Dict[str, int] = {}
+    waiting = [tx_hash for hashes in sent.values() for tx_hash in hashes]
+    deadline = time.monotonic() + receipt_timeout
+    while waiting and time.monotonic() < deadline:
+        for tx_hash in waiting:
+            try:  # Lookups can hit injected failures too, the hash is tried again on the next pass
+                statuses[tx_hash] = w3.eth.get_transaction_receipt(tx_hash).status
+            except Exception:
+                continue
+        waiting = [tx_hash for tx_hash in waiting if tx_hash not in statuses]
+        if waiting:
+            time.sleep(0.2)
+
+    reverted = {method: sum(1 for tx_hash in hashes if statuses.get(tx_hash) == 0) for method, hashes in sent.items()}
+    unmined = {method: sum(1 for tx_hash in hashes if tx_hash not in statuses) for method, hashes in sent.items()}
+
+    report = {"seconds": round(wall, 3), "clients": len(clients), "methods": {}}
+    for method in methods:
+        latencies = samples[method]
+        report["methods"][method] = {
+            "transaction": WORKLOAD[method][0],
+            "calls": len(latencies),
+            "errors": errors[method],
+            "reverted": reverted[method],
+            "unmined": unmined[method],
+            "per_sec": round(len(latencies) / wall, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(max(latencies, default=0) * 1000, 2),
+        }
+    rows = report["methods"].values()
+    report["reads_per_sec"] = round(sum(row["calls"] for row in rows if not row["transaction"]) / wall, 2)
+    report["tx_per_sec"] = round(sum(row["calls"] - row["errors"] for row in rows if row["transaction"]) / wall, 2)
+    return report
+
+
+def print_report(report: Dict):
+    print(f"{report['clients']} clients for {report['seconds']}s: "
+          f"{report['reads_per_sec']} reads/s, {report['tx_per_sec']} tx/s sent")
+    print(f"{'method':<28}{'calls':>7}{'errors':>8}{'reverted':>9}{'unmined':>8}{'per s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for method, row in report["methods"].items():
+        print(f"{method:<28}{row['calls']:>7}{row['errors']:>8}{row['reverted']:>9}{row['unmined']:>8}{row['per_sec']:>9}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test SaveTheCastleWeb3Client against a local mock chain or an RPC URL")
+    parser.add_argument("--rpc", default=None, help="Target RPC URL (default: start a mock chain in-process)")
+    parser.add_argument("--keys", default="", help="Comma separated funded keys for --rpc (default: Hardhat accounts)")
+    parser.add_argument("--chain-id", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent clients, each with its own account")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--methods", default=",".join(WORKLOAD), help="Comma separated client methods to drive")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mock chain: added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Mock chain: latency varies by up to this")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Mock chain: fraction of requests to fail")
+    parser.add_argument("--failure-mode", choices=["error", "http", "timeout"], default="error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--receipt-timeout", type=float, default=60.0,
+                        help="Seconds to collect receipts after the run, those still missing count as unmined")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    methods = [method.strip() for method in args.methods.split(",") if method.strip()]
+    unknown = [method for method in methods if method not in WORKLOAD]
+    if unknown:
+        parser.error(f"unknown methods {', '.join(unknown)}, expected some of {', '.join(WORKLOAD)}")
+
+    server = None
+    if args.rpc:
+        keys = [key.strip() for key in args.keys.split(",") if key.strip()] or HARDHAT_KEYS
+        keys = [keys[i % len(keys)] for i in range(args.threads)]  # Shared accounts race for nonces, as they would live
+        rpc_url = args.rpc
+    else:
+        keys = ["0x" + secrets.token_hex(32) for _ in range(args.threads)]
+        chain = MockChain(args.chain_id or SaveTheCastleWeb3Client.CHAIN_ID, HARDHAT_KEYS + keys)
+        server = MockRPCServer(chain, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                               failure_rate=args.failure_rate, failure_mode=args.failure_mode, seed=args.seed)
+        rpc_url = server.start()
+        print(f"Mock chain on {rpc_url}, accounts {', '.join(Account.from_key(key).address[:10] for key in keys)}")
+
+    try:
+        report = run(rpc_url, keys, args.seconds, methods, args.chain_id, args.seed, args.receipt_timeout)
+    finally:
+        if server:
+            server.stop()
+    if server:
+        report["mock"] = dict(server.stats, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              failure_rate=args.failure_rate)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
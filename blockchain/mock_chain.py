@@ -0,0 +1,945 @@
+"""
+Local JSON-RPC stand-in for the Save the Castle contracts
+Serves GameEconomy, Leaderboard and USDC from in-memory state at their Base Sepolia addresses, mining
+every transaction on arrival, with configurable latency and failure injection for offline tests and benchmarks
+"""
+
+import argparse
+import copy
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List, Tuple
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_account._utils.legacy_transactions import Transaction
+from eth_account._utils.typed_transactions import TypedTransaction
+from hexbytes import HexBytes
+from web3 import Web3
+
+from web3_client import SaveTheCastleWeb3Client
+from relayer import HARDHAT_KEYS
+
+ETHER = 10**18
+USDC_UNIT = 10**6
+INTRINSIC_GAS = 21000
+CALL_GAS = 45000  # Flat execution cost of any contract call, the mock does not meter opcodes
+DAY_DURATION = 86400
+WEEK_DURATION = 604800
+
+
+class Revert(Exception):
+    """A require() failing inside a mocked contract"""
+
+    def __init__(self, reason: str = ""):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class RPCError(Exception):
+    """A JSON-RPC error answer that is not a revert"""
+
+    def __init__(self, message: str, code: int = -32000):
+        super().__init__(message)
+        self.code = code
+
+
+def split_types(text: str) -> List[str]:
+    """'address,(uint256,bool)[],string' -> ['address', '(uint256,bool)[]', 'string']"""
+    types, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            types.append(text[start:i])
+            start = i + 1
+    if text[start:]:
+        types.append(text[start:])
+    return types
+
+
+def selector(signature: str) -> bytes:
+    return bytes(Web3.keccak(text=signature)[:4])
+
+
+def revert_data(reason: str) -> str:
+    """Error(string) payload, the way solc encodes require messages"""
+    if not reason:
+        return "0x"
+    return "0x08c379a0" + encode(["string"], [reason]).hex()
+
+
+def decode_raw_transaction(raw: bytes) -> Dict:
+    """Fields of a signed legacy or EIP-1559 transaction, with its sender and hash"""
+    raw = bytes(raw)
+    if raw[0] < 0x7f:
+        fields = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()
+        chain_id = fields["chainId"]
+        gas_price = fields.get("gasPrice", fields.get("maxFeePerGas", 0))
+    else:
+        fields = rlp.decode(raw, Transaction).as_dict()
+        chain_id = (fields["v"] - 35) // 2 if fields["v"] >= 35 else None
+        gas_price = fields["gasPrice"]
+    return {
+        "hash": "0x" + bytes(Web3.keccak(raw)).hex(),
+        "from": Account.recover_transaction(raw),
+        "to": Web3.to_checksum_address(bytes(fields["to"])) if fields["to"] else None,
+        "nonce": fields["nonce"],
+        "value": fields["value"],
+        "data": bytes(fields["data"]),
+        "gas": fields["gas"],
+        "gasPrice": gas_price,
+        "chainId": chain_id,
+    }
+
+
+class _Call:
+    """msg.sender, msg.value and block context of one contract call, collects its logs"""
+
+    def __init__(self, chain: "MockChain", sender: str, value: int, timestamp: int):
+        self.chain = chain
+        self.sender = sender
+        self.value = value
+        self.timestamp = timestamp
+        self.logs: List[Dict] = []
+
+    def emit(self, address: str, signature: str, values: Tuple, indexed: int = 0):
+        """Log an event whose first `indexed` parameters are topics"""
+        types = split_types(signature[signature.index("(") + 1:-1])
+        topics = ["0x" + bytes(Web3.keccak(text=signature)).hex()]
+        topics += ["0x" + encode([kind], [value]).hex() for kind, value in zip(types[:indexed], values[:indexed])]
+        self.logs.append({"address": address, "topics": topics, "data": "0x" + encode(types[indexed:], values[indexed:]).hex()})
+
+
+class MockChain:
+    """In-memory chain with the three game contracts deployed, every transaction mines its own block"""
+
+    def __init__(self, chain_id: int = SaveTheCastleWeb3Client.CHAIN_ID, keys: Optional[List[str]] = None,
+                 gas_price: int = 10**9, eth_balance: int = 1000 * ETHER, usdc_balance: int = 10**6 * USDC_UNIT,
+                 game_economy: str = SaveTheCastleWeb3Client.GAME_ECONOMY_ADDRESS,
+                 leaderboard: str = SaveTheCastleWeb3Client.LEADERBOARD_ADDRESS,
+                 usdc: str = SaveTheCastleWeb3Client.USDC_ADDRESS,
+                 multicall: str = SaveTheCastleWeb3Client.MULTICALL3_ADDRESS):
+        """
+        Args:
+            chain_id: Chain id reported and required in signed transactions
+            keys: Private keys of the funded accounts, the first one owns the contracts (defaults to Hardhat's)
+            gas_price: Answer of eth_gasPrice, in wei
+            eth_balance: Starting ETH of each funded account, in wei
+            usdc_balance: Starting USDC of each funded account, in units
+        """
+        self.chain_id = chain_id
+        self.gas_price = gas_price
+        self.lock = threading.RLock()
+        self.time_offset = 0
+        self.blocks: List[Dict] = []
+
+        self.game_economy_address = Web3.to_checksum_address(game_economy)
+        self.leaderboard_address = Web3.to_checksum_address(leaderboard)
+        self.usdc_address = Web3.to_checksum_address(usdc)
+        self.multicall_address = Web3.to_checksum_address(multicall)
+        self.contracts = (self.game_economy_address, self.leaderboard_address, self.usdc_address, self.multicall_address)
+        self.owner = Account.from_key((keys or HARDHAT_KEYS)[0]).address
+
+        # Everything a transaction can change, so eth_call of a write can run on a copy
+        self.state = {
+            "eth": {},
+            "nonces": {},
+            "usdc": {"balances": {}, "allowances": {}, "supply": 0},
+            "economy": {
+                "baseHealthPriceETH": ETHER // 1000,
+                "baseHealthPriceUSDC": 3 * USDC_UNIT,
+                "priceIncreasePercentage": 10,
+                "maxPriceMultiplier": 5,
+                "playerStats": {},
+                "currentGamePurchases": {},
+                "activeGameId": {},
+                "activeGameSessions": {},
+                "allPurchases": [],
+                "totalRevenueETH": 0,
+                "totalRevenueUSDC": 0,
+                "totalHealthSold": 0,
+                "nextGameId": 1,
+                "gameContract": "0x" + "00" * 20,
+            },
+            "leaderboard": {
+                "allTime": [],
+                "daily": [],
+                "weekly": [],
+                "playerStats": {},
+                "hasPlayed": {},
+                "nameToAddress": {},
+                "currentDay": self.now() // DAY_DURATION,
+                "currentWeek": self.now() // WEEK_DURATION,
+                "maxLeaderboardSize": 100,
+                "minScoreThreshold": 100,
+                "gameContract": self.game_economy_address,
+                "scoreRelayers": {},
+            },
+        }
+
+        genesis = {"number": 0, "hash": "0x" + bytes(Web3.keccak(b"genesis")).hex(), "parentHash": "0x" + "00" * 32,
+                   "timestamp": self.now(), "transactions": [], "gasUsed": 0}
+        self.blocks.append(genesis)
+        self.transactions: Dict[str, Dict] = {}
+        self.receipts: Dict[str, Dict] = {}
+        self.logs: List[Dict] = []
+        self.queued: Dict[str, Dict[int, Dict]] = {}  # sender -> nonce -> transaction waiting for a gap to fill
+        self.filters: Dict[str, Dict] = {}  # eth_newFilter id -> query and next block to report
+        self.filters_created = 0
+
+        self.functions: Dict[Tuple[str, bytes], Tuple] = {}
+        self._deploy_usdc()
+        self._deploy_game_economy()
+        self._deploy_leaderboard()
+        self._deploy_multicall()
+
+        for key in keys or HARDHAT_KEYS:
+            self.fund(Account.from_key(key).address, eth_balance, usdc_balance)
+
+    # Accounts and time
+
+    def fund(self, address: str, eth: int = 0, usdc: int = 0):
+        """Credit an account with ETH (wei) and USDC (units)"""
+        address = Web3.to_checksum_address(address)
+        with self.lock:
+            self.state["eth"][address] = self.state["eth"].get(address, 0) + eth
+            balances = self.state["usdc"]["balances"]
+            balances[address] = balances.get(address, 0) + usdc
+            self.state["usdc"]["supply"] += usdc
+
+    def now(self) -> int:
+        """Timestamp for the next block, never before the last one"""
+        now = int(time.time()) + self.time_offset
+        return max(now, self.blocks[-1]["timestamp"]) if self.blocks else now
+
+    def advance_time(self, seconds: int):
+        """Move block time forward, e.g. to roll the daily and weekly leaderboards over"""
+        self.time_offset += seconds
+
+    # Contract plumbing
+
+    def _register(self, address: str, signature: str, outputs: List[str], handler, mutability: str = "view"):
+        inputs = split_types(signature[signature.index("(") + 1:-1])
+        self.functions[(address, selector(signature))] = (signature, inputs, outputs, handler, mutability)
+
+    def _execute(self, call: _Call, to: str, data: bytes) -> bytes:
+        """Run one contract function, raises Revert like the EVM would"""
+        function = self.functions.get((to, data[:4]))
+        if function is None:
+            raise Revert()  # No fallback function in any of the contracts
+        signature, inputs, outputs, handler, mutability = function
+        if call.value and mutability != "payable":
+            raise Revert()
+        try:
+            args = decode(inputs, data[4:])
+        except Exception:
+            raise Revert()
+        args = [Web3.to_checksum_address(arg) if kind == "address" else arg for kind, arg in zip(inputs, args)]
+        result = handler(call, *args)
+        if not outputs:
+            return b""
+        return encode(outputs, [result] if len(outputs) == 1 else list(result))
+
+    def _mutability(self, to: str, data: bytes) -> Optional[str]:
+        function = self.functions.get((to, data[:4]))
+        return function[4] if function else None
+
+    def _move_eth(self, sender: str, recipient: str, amount: int):
+        balances = self.state["eth"]
+        if balances.get(sender, 0) < amount:
+            raise Revert()
+        balances[sender] = balances.get(sender, 0) - amount
+        balances[recipient] = balances.get(recipient, 0) + amount
+
+    # USDC (MockERC20)
+
+    def _deploy_usdc(self):
+        usdc, address = self.state["usdc"], self.usdc_address
+
+        def transfer(sender, recipient, amount):
+            if usdc["balances"].get(sender, 0) < amount:
+                raise Revert("ERC20InsufficientBalance")
+            usdc["balances"][sender] -= amount
+            usdc["balances"][recipient] = usdc["balances"].get(recipient, 0) + amount
+
+        def spend_allowance(owner, spender, amount):
+            allowed = usdc["allowances"].get((owner, spender), 0)
+            if allowed < amount:
+                raise Revert("ERC20InsufficientAllowance")
+            if allowed != 2**256 - 1:
+                usdc["allowances"][(owner, spender)] = allowed - amount
+
+        def do_transfer(call, recipient, amount):
+            transfer(call.sender, recipient, amount)
+            call.emit(address, "Transfer(address,address,uint256)", (call.sender, recipient, amount), indexed=2)
+            return True
+
+        def do_transfer_from(call, owner, recipient, amount):
+            if usdc["balances"].get(owner, 0) < amount:
+                raise Revert("ERC20InsufficientBalance")
+            spend_allowance(owner, call.sender, amount)
+            transfer(owner, recipient, amount)
+            call.emit(address, "Transfer(address,address,uint256)", (owner, recipient, amount), indexed=2)
+            return True
+
+        def approve(call, spender, amount):
+            usdc["allowances"][(call.sender, spender)] = amount
+            call.emit(address, "Approval(address,address,uint256)", (call.sender, spender, amount), indexed=2)
+            return True
+
+        def faucet(call, amount):
+            usdc["balances"][call.sender] = usdc["balances"].get(call.sender, 0) + amount
+            usdc["supply"] += amount
+            call.emit(address, "Transfer(address,address,uint256)", ("0x" + "00" * 20, call.sender, amount), indexed=2)
+
+        self._usdc_transfer_from = do_transfer_from
+        self._register(address, "name()", ["string"], lambda call: "USD Coin")
+        self._register(address, "symbol()", ["string"], lambda call: "USDC")
+        self._register(address, "decimals()", ["uint8"], lambda call: 6)
+        self._register(address, "totalSupply()", ["uint256"], lambda call: usdc["supply"])
+        self._register(address, "balanceOf(address)", ["uint256"], lambda call, owner: usdc["balances"].get(owner, 0))
+        self._register(address, "allowance(address,address)", ["uint256"],
+                       lambda call, owner, spender: usdc["allowances"].get((owner, spender), 0))
+        self._register(address, "approve(address,uint256)", ["bool"], approve, "nonpayable")
+        self._register(address, "transfer(address,uint256)", ["bool"], do_transfer, "nonpayable")
+        self._register(address, "transferFrom(address,address,uint256)", ["bool"], do_transfer_from, "nonpayable")
+        self._register(address, "faucet(uint256)", [], faucet, "nonpayable")
+
+    # SaveTheCastleGameEconomy
+
+    def _deploy_game_economy(self):
+        economy, address = self.state["economy"], self.game_economy_address
+
+        def cost(base, player, amount):
+            multiplier = 100 + economy["currentGamePurchases"].get(player, 0) * economy["priceIncreasePercentage"]
+            multiplier = min(multiplier, economy["maxPriceMultiplier"] * 100)
+            return base * amount // 100 * multiplier // 100
+
+        def eth_cost(call, player, amount):
+            return cost(economy["baseHealthPriceETH"], player, amount)
+
+        def usdc_cost(call, player, amount):
+            return cost(economy["baseHealthPriceUSDC"], player, amount)
+
+        def player_stats(call, player):
+            return tuple(economy["playerStats"].get(player, (0, 0, 0, 0, 0)))
+
+        def only_owner(call):
+            if call.sender != self.owner:
+                raise Revert("OwnableUnauthorizedAccount")
+
+        def require_session(call, amount=None):
+            if not economy["activeGameSessions"].get(call.sender):
+                raise Revert("No active game session")
+            if amount is not None and not 0 < amount <= 200:
+                raise Revert("Invalid health amount")
+
+        def start_session(call):
+            if economy["activeGameSessions"].get(call.sender):
+                raise Revert("Game session already active")
+            game_id = economy["nextGameId"]
+            economy["nextGameId"] += 1
+            economy["activeGameSessions"][call.sender] = True
+            economy["activeGameId"][call.sender] = game_id
+            economy["currentGamePurchases"][call.sender] = 0
+            call.emit(address, "GameSessionStarted(address,uint256)", (call.sender, game_id), indexed=1)
+            return game_id
+
+        def end_session(call, final_score):
+            require_session(call)
+            game_id = economy["activeGameId"][call.sender]
+            economy["activeGameSessions"][call.sender] = False
+            economy["activeGameId"][call.sender] = 0
+            economy["currentGamePurchases"][call.sender] = 0
+            call.emit(address, "GameSessionEnded(address,uint256,uint256)", (call.sender, game_id, final_score), indexed=1)
+
+        def process_purchase(call, amount, wei, units, method):
+            player = call.sender
+            spent_eth, spent_usdc, health, count, _ = economy["playerStats"].get(player, (0, 0, 0, 0, 0))
+            economy["playerStats"][player] = (spent_eth + wei, spent_usdc + units, health + amount, count + 1, call.timestamp)
+            economy["totalRevenueETH"] += wei
+            economy["totalRevenueUSDC"] += units
+            economy["currentGamePurchases"][player] = economy["currentGamePurchases"].get(player, 0) + 1
+            economy["totalHealthSold"] += amount
+            economy["allPurchases"].append((player, amount, wei, units, call.timestamp, method))
+            call.emit(address, "HealthPurchased(address,uint256,uint256,uint256,string,uint256,uint256)",
+                      (player, amount, wei, units, method, economy["activeGameId"][player], call.timestamp), indexed=1)
+
+        def purchase_eth(call, amount):
+            require_session(call, amount)
+            price = eth_cost(call, call.sender, amount)
+            if call.value < price:
+                raise Revert("Insufficient ETH sent")
+            process_purchase(call, amount, price, 0, "ETH")
+            if call.value > price:
+                self._move_eth(address, call.sender, call.value - price)
+
+        def purchase_usdc(call, amount):
+            require_session(call, amount)
+            price = usdc_cost(call, call.sender, amount)
+            inner = _Call(self, address, 0, call.timestamp)
+            self._usdc_transfer_from(inner, call.sender, address, price)
+            call.logs.extend(inner.logs)
+            process_purchase(call, amount, 0, price, "USDC")
+
+        def purchase(call, index):
+            if index >= len(economy["allPurchases"]):
+                raise Revert("Purchase index out of bounds")
+            return economy["allPurchases"][index]
+
+        def update_prices(call, eth_price, usdc_price):
+            only_owner(call)
+            economy["baseHealthPriceETH"], economy["baseHealthPriceUSDC"] = eth_price, usdc_price
+            call.emit(address, "PricesUpdated(uint256,uint256)", (eth_price, usdc_price))
+
+        def update_dynamic_pricing(call, percentage, multiplier):
+            only_owner(call)
+            economy["priceIncreasePercentage"], economy["maxPriceMultiplier"] = percentage, multiplier
+
+        def set_game_contract(call, game_contract):
+            only_owner(call)
+            economy["gameContract"] = game_contract
+
+        for name in ["baseHealthPriceETH", "baseHealthPriceUSDC", "priceIncreasePercentage", "maxPriceMultiplier",
+                     "totalRevenueETH", "totalRevenueUSDC", "totalHealthSold", "nextGameId"]:
+            self._register(address, name + "()", ["uint256"], lambda call, name=name: economy[name])
+        for name, kind, default in [("currentGamePurchases", "uint256", 0), ("activeGameId", "uint256", 0),
+                                    ("activeGameSessions", "bool", False)]:
+            self._register(address, name + "(address)", [kind],
+                           lambda call, player, name=name, default=default: economy[name].get(player, default))
+        self._register(address, "owner()", ["address"], lambda call: self.owner)
+        self._register(address, "gameContract()", ["address"], lambda call: economy["gameContract"])
+        self._register(address, "USDC()", ["address"], lambda call: self.usdc_address)
+        self._register(address, "calculateETHCost(address,uint256)", ["uint256"], eth_cost)
+        self._register(address, "calculateUSDCCost(address,uint256)", ["uint256"], usdc_cost)
+        self._register(address, "getCurrentPricing(address)", ["uint256", "uint256"],
+                       lambda call, player: (eth_cost(call, player, 100), usdc_cost(call, player, 100)))
+        self._register(address, "playerStats(address)", ["uint256"] * 5, player_stats)
+        self._register(address, "getPlayerStats(address)", ["(uint256,uint256,uint256,uint256,uint256)"], player_stats)
+        self._register(address, "getTotalPurchases()", ["uint256"], lambda call: len(economy["allPurchases"]))
+        self._register(address, "getPurchase(uint256)", ["(address,uint256,uint256,uint256,uint256,string)"], purchase)
+        self._register(address, "allPurchases(uint256)", ["address", "uint256", "uint256", "uint256", "uint256", "string"], purchase)
+        self._register(address, "hasActiveGameSession(address)", ["bool"],
+                       lambda call, player: economy["activeGameSessions"].get(player, False))
+        self._register(address, "getRevenueStats()", ["uint256"] * 4,
+                       lambda call: (economy["totalRevenueETH"], economy["totalRevenueUSDC"], economy["totalHealthSold"],
+                                     len(economy["allPurchases"])))
+        self._register(address, "getContractBalance()", ["uint256", "uint256"],
+                       lambda call: (self.state["eth"].get(address, 0), self.state["usdc"]["balances"].get(address, 0)))
+        self._register(address, "startGameSession()", ["uint256"], start_session, "nonpayable")
+        self._register(address, "endGameSession(uint256)", [], end_session, "nonpayable")
+        self._register(address, "purchaseHealthWithETH(uint256)", [], purchase_eth, "payable")
+        self._register(address, "purchaseHealthWithUSDC(uint256)", [], purchase_usdc, "nonpayable")
+        self._register(address, "updateBasePrices(uint256,uint256)", [], update_prices, "nonpayable")
+        self._register(address, "updateDynamicPricing(uint256,uint256)", [], update_dynamic_pricing, "nonpayable")
+        self._register(address, "setGameContract(address)", [], set_game_contract, "nonpayable")
+
+    # SaveTheCastleLeaderboard
+
+    def _deploy_leaderboard(self):
+        board, address = self.state["leaderboard"], self.leaderboard_address
+        entry_type = "(address,string,uint256,uint256,bool)[]"
+
+        def only_owner(call):
+            if call.sender != self.owner:
+                raise Revert("OwnableUnauthorizedAccount")
+
+        def only_game_contract(call):
+            if call.sender != board["gameContract"] and not board["scoreRelayers"].get(call.sender):
+                raise Revert("Only game contract can submit scores")
+
+        def insert(entries, entry):
+            position = len(entries)
+            for i, other in enumerate(entries):
+                if entry[2] > other[2]:
+                    position = i
+                    break
+            if position >= board["maxLeaderboardSize"]:
+                return
+            entries.insert(position, entry)
+            del entries[board["maxLeaderboardSize"]:]
+
+        def record(call, player, name, score, is_paid, total_spent):
+            day, week = call.timestamp // DAY_DURATION, call.timestamp // WEEK_DURATION
+            if day > board["currentDay"]:
+                board["daily"], board["currentDay"] = [], day
+                call.emit(address, "LeaderboardReset(string,uint256)", ("daily", call.timestamp))
+            if week > board["currentWeek"]:
+                board["weekly"], board["currentWeek"] = [], week
+                call.emit(address, "LeaderboardReset(string,uint256)", ("weekly", call.timestamp))
+            best, games, spent, _ = board["playerStats"].get(player, (0, 0, 0, ""))
+            board["playerStats"][player] = (max(best, score), games + 1, spent + total_spent, name)
+            board["nameToAddress"][name] = player
+            board["hasPlayed"][player] = True
+            entry = (player, name, score, call.timestamp, is_paid)
+            for key in ("allTime", "daily", "weekly"):
+                insert(board[key], entry)
+            call.emit(address, "ScoreSubmitted(address,string,uint256,uint256,bool)",
+                      (player, name, score, call.timestamp, is_paid), indexed=1)
+
+        def submit_score(call, player, name, score, is_paid, total_spent):
+            only_game_contract(call)
+            if score < board["minScoreThreshold"]:
+                raise Revert("Score below minimum threshold")
+            if not 0 < len(name.encode()) <= 32:
+                raise Revert("Invalid player name")
+            if board["nameToAddress"].get(name, player) != player:
+                raise Revert("Player name already taken")
+            record(call, player, name, score, is_paid, total_spent)
+
+        def submit_scores(call, claims):
+            only_game_contract(call)
+            for player, name, score, is_paid, total_spent in claims:
+                player = Web3.to_checksum_address(player)
+                if score < board["minScoreThreshold"] or not 0 < len(name.encode()) <= 32:
+                    continue
+                if board["nameToAddress"].get(name, player) != player:
+                    continue
+                record(call, player, name, score, is_paid, total_spent)
+
+        def rank(call, player):
+            for i, entry in enumerate(board["allTime"]):
+                if entry[0] == player:
+                    return i + 1
+            return 0
+
+        def element_missing():
+            raise Revert()  # Public array getters panic past the end
+
+        def set_relayer(call, relayer, allowed):
+            only_owner(call)
+            board["scoreRelayers"][relayer] = allowed
+            call.emit(address, "ScoreRelayerUpdated(address,bool)", (relayer, allowed), indexed=1)
+
+        def setter(name, check=only_owner):
+            def set_value(call, value):
+                check(call)
+                board[name] = value
+            return set_value
+
+        for function, key in [("getTopScores", "allTime"), ("getDailyTopScores", "daily"), ("getWeeklyTopScores", "weekly")]:
+            self._register(address, function + "(uint256)", [entry_type], lambda call, limit, key=key: board[key][:limit])
+        for getter, key in [("allTimeLeaderboard", "allTime"), ("dailyLeaderboard", "daily"), ("weeklyLeaderboard", "weekly")]:
+            self._register(address, getter + "(uint256)", entry_type[1:-3].split(","),
+                           lambda call, index, key=key: board[key][index] if index < len(board[key]) else element_missing())
+        for name in ["maxLeaderboardSize", "minScoreThreshold", "currentDay", "currentWeek"]:
+            self._register(address, name + "()", ["uint256"], lambda call, name=name: board[name])
+        self._register(address, "owner()", ["address"], lambda call: self.owner)
+        self._register(address, "gameContract()", ["address"], lambda call: board["gameContract"])
+        self._register(address, "scoreRelayers(address)", ["bool"], lambda call, relayer: board["scoreRelayers"].get(relayer, False))
+        self._register(address, "hasPlayed(address)", ["bool"], lambda call, player: board["hasPlayed"].get(player, False))
+        self._register(address, "nameToAddress(string)", ["address"],
+                       lambda call, name: board["nameToAddress"].get(name, "0x" + "00" * 20))
+        self._register(address, "isNameAvailable(string)", ["bool"], lambda call, name: name not in board["nameToAddress"])
+        self._register(address, "playerStats(address)", ["uint256", "uint256", "uint256", "string"],
+                       lambda call, player: board["playerStats"].get(player, (0, 0, 0, "")))
+        self._register(address, "getPlayerStats(address)", ["(uint256,uint256,uint256,string)"],
+                       lambda call, player: board["playerStats"].get(player, (0, 0, 0, "")))
+        self._register(address, "getPlayerRank(address)", ["uint256"], rank)
+        self._register(address, "getTotalPlayers()", ["uint256"],
+                       lambda call: sum(1 for entry in board["allTime"] if board["hasPlayed"].get(entry[0])))
+        self._register(address, "submitScore(address,string,uint256,bool,uint256)", [], submit_score, "nonpayable")
+        self._register(address, "submitScores((address,string,uint256,bool,uint256)[])", [], submit_scores, "nonpayable")
+        self._register(address, "setScoreRelayer(address,bool)", [], set_relayer, "nonpayable")
+        self._register(address, "setGameContract(address)", [], setter("gameContract"), "nonpayable")
+        self._register(address, "setMinScoreThreshold(uint256)", [], setter("minScoreThreshold"), "nonpayable")
+        self._register(address, "setMaxLeaderboardSize(uint256)", [], setter("maxLeaderboardSize"), "nonpayable")
+
+    # Multicall3
+
+    def _deploy_multicall(self):
+        address = self.multicall_address
+
+        def aggregate3(call, calls):
+            results = []
+            for target, allow_failure, data in calls:
+                inner = _Call(self, address, 0, call.timestamp)
+                try:
+                    results.append((True, self._execute(inner, Web3.to_checksum_address(target), bytes(data))))
+                    call.logs.extend(inner.logs)
+                except Revert:
+                    if not allow_failure:
+                        raise Revert("Multicall3: call failed")
+                    results.append((False, b""))
+            return results
+
+        self._register(address, "aggregate3((address,bool,bytes)[])", ["(bool,bytes)[]"], aggregate3, "payable")
+
+    # Calls and transactions
+
+    def _is_view(self, to: str, data: bytes) -> bool:
+        """Whether a call leaves state alone, looking inside Multicall3 batches"""
+        if to == self.multicall_address and data[:4] == selector("aggregate3((address,bool,bytes)[])"):
+            try:
+                calls = decode(["(address,bool,bytes)[]"], data[4:])[0]
+            except Exception:
+                return True
+            return all(self._is_view(Web3.to_checksum_address(target), bytes(inner)) for target, _, inner in calls)
+        return self._mutability(to, data) in ("view", None)
+
+    def call(self, to: str, data: bytes, sender: Optional[str] = None, value: int = 0) -> bytes:
+        """eth_call against the latest state, writes run on a copy that is thrown away"""
+        to = Web3.to_checksum_address(to)
+        sender = Web3.to_checksum_address(sender) if sender else "0x" + "00" * 20
+        with self.lock:
+            call = _Call(self, sender, value, self.now())
+            if self._is_view(to, data):
+                return self._execute(call, to, data)
+            saved = copy.deepcopy(self.state)
+            try:
+                self.state["eth"][sender] = self.state["eth"].get(sender, 0) + value
+                self._move_eth(sender, to, value)
+                return self._execute(call, to, data)
+            finally:
+                self._restore(saved)
+
+    def _restore(self, saved: Dict):
+        # Handlers close over the nested dicts, so copy the saved values back into them
+        for name, part in saved.items():
+            self.state[name].clear()
+            self.state[name].update(part)
+
+    def send_raw_transaction(self, raw: bytes) -> str:
+        """Check and mine a signed transaction, one with a future nonce waits until the gap fills"""
+        tx = decode_raw_transaction(raw)
+        with self.lock:
+            if tx["chainId"] != self.chain_id:
+                raise RPCError(f"invalid chain id {tx['chainId']}, expected {self.chain_id}")
+            if tx["hash"] in self.transactions:
+                raise RPCError("already known")
+            expected = self.state["nonces"].get(tx["from"], 0)
+            if tx["nonce"] < expected:
+                raise RPCError(f"nonce too low: next nonce {expected}, tx nonce {tx['nonce']}")
+            if self.state["eth"].get(tx["from"], 0) < tx["value"] + tx["gas"] * tx["gasPrice"]:
+                raise RPCError("insufficient funds for gas * price + value")
+            if tx["nonce"] > expected:
+                self.queued.setdefault(tx["from"], {})[tx["nonce"]] = tx
+                return tx["hash"]
+            self._mine(tx)
+            waiting = self.queued.get(tx["from"], {})
+            while self.state["nonces"][tx["from"]] in waiting:
+                self._mine(waiting.pop(self.state["nonces"][tx["from"]]))
+            return tx["hash"]
+
+    def _mine(self, tx: Dict):
+        number, timestamp = len(self.blocks), self.now()
+        sender, to = tx["from"], tx["to"]
+        call = _Call(self, sender, tx["value"], timestamp)
+        gas_used = INTRINSIC_GAS + sum(16 if byte else 4 for byte in tx["data"])
+        if to in self.contracts:
+            gas_used += CALL_GAS
+        status = 1
+        if gas_used > tx["gas"] or to is None:
+            status, gas_used = 0, tx["gas"]  # Out of gas, or a deployment which the mock does not run
+        else:
+            # Handlers check every require before writing, so a revert only has the value transfer to undo
+            try:
+                self._move_eth(sender, to, tx["value"])
+                try:
+                    if to in self.contracts:
+                        self._execute(call, to, tx["data"])
+                except Revert:
+                    self._move_eth(to, sender, tx["value"])
+                    raise
+            except Revert:
+                status, call.logs = 0, []
+        self.state["eth"][sender] -= gas_used * tx["gasPrice"]
+        self.state["nonces"][sender] = tx["nonce"] + 1
+
+        block_hash = "0x" + bytes(Web3.keccak(number.to_bytes(8, "big") + bytes.fromhex(tx["hash"][2:]))).hex()
+        self.blocks.append({"number": number, "hash": block_hash, "parentHash": self.blocks[-1]["hash"],
+                            "timestamp": timestamp, "transactions": [tx["hash"]], "gasUsed": gas_used})
+        logs = []
+        for i, log in enumerate(call.logs):
+            log = dict(log, blockNumber=number, blockHash=block_hash, transactionHash=tx["hash"],
+                       transactionIndex=0, logIndex=i, removed=False)
+            logs.append(log)
+        self.logs.extend(logs)
+        self.transactions[tx["hash"]] = dict(tx, blockNumber=number, blockHash=block_hash)
+        self.receipts[tx["hash"]] = {"transactionHash": tx["hash"], "blockNumber": number, "blockHash": block_hash,
+                                     "transactionIndex": 0, "from": sender, "to": to, "status": status,
+                                     "gasUsed": gas_used, "cumulativeGasUsed": gas_used,
+                                     "effectiveGasPrice": tx["gasPrice"], "logs": logs}
+
+    def get_logs(self, from_block: int = 0, to_block: Optional[int] = None, address=None, topics=None) -> List[Dict]:
+        """Logs in a block range matching an address (or list) and topic filter"""
+        to_block = len(self.blocks) - 1 if to_block is None else to_block
+        addresses = {Web3.to_checksum_address(a) for a in ([address] if isinstance(address, str) else address or [])}
+        matches = []
+        for log in self.logs:
+            if not from_block <= log["blockNumber"] <= to_block:
+                continue
+            if addresses and log["address"] not in addresses:
+                continue
+            wanted = topics or []
+            if any(topic is not None and (log["topics"][i] if i < len(log["topics"]) else None) not in
+                   ([topic] if isinstance(topic, str) else topic) for i, topic in enumerate(wanted)):
+                continue
+            matches.append(log)
+        return matches
+
+    # JSON-RPC
+
+    def _block_number(self, tag) -> int:
+        latest = len(self.blocks) - 1
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return latest
+        if tag == "earliest":
+            return 0
+        return min(int(tag, 16), latest)
+
+    def _format_block(self, block: Dict) -> Dict:
+        return {"number": hex(block["number"]), "hash": block["hash"], "parentHash": block["parentHash"],
+                "timestamp": hex(block["timestamp"]), "transactions": block["transactions"],
+                "gasUsed": hex(block["gasUsed"]), "gasLimit": hex(30000000), "baseFeePerGas": hex(self.gas_price),
+                "miner": "0x" + "00" * 20, "difficulty": "0x0", "extraData": "0x", "nonce": "0x" + "00" * 8,
+                "size": "0x0", "logsBloom": "0x" + "00" * 256, "transactionsRoot": "0x" + "00" * 32,
+                "stateRoot": "0x" + "00" * 32, "receiptsRoot": "0x" + "00" * 32, "sha3Uncles": "0x" + "00" * 32,
+                "uncles": [], "mixHash": "0x" + "00" * 32, "totalDifficulty": "0x0"}
+
+    @staticmethod
+    def _format_log(log: Dict) -> Dict:
+        return dict(log, blockNumber=hex(log["blockNumber"]), transactionIndex=hex(log["transactionIndex"]),
+                    logIndex=hex(log["logIndex"]))
+
+    def _format_receipt(self, receipt: Dict) -> Dict:
+        return dict(receipt, blockNumber=hex(receipt["blockNumber"]), transactionIndex="0x0", status=hex(receipt["status"]),
+                    gasUsed=hex(receipt["gasUsed"]), cumulativeGasUsed=hex(receipt["cumulativeGasUsed"]),
+                    effectiveGasPrice=hex(receipt["effectiveGasPrice"]), logs=[self._format_log(l) for l in receipt["logs"]],
+                    contractAddress=None, type="0x0", logsBloom="0x" + "00" * 256)
+
+    def _format_transaction(self, tx: Dict) -> Dict:
+        return {"hash": tx["hash"], "from": tx["from"], "to": tx["to"], "nonce": hex(tx["nonce"]), "value": hex(tx["value"]),
+                "input": "0x" + tx["data"].hex(), "gas": hex(tx["gas"]), "gasPrice": hex(tx["gasPrice"]),
+                "chainId": hex(self.chain_id), "blockNumber": hex(tx["blockNumber"]) if "blockNumber" in tx else None,
+                "blockHash": tx.get("blockHash"), "transactionIndex": "0x0" if "blockNumber" in tx else None,
+                "type": "0x0", "v": "0x0", "r": "0x0", "s": "0x0"}
+
+    def handle(self, method: str, params: List):
+        """Answer one JSON-RPC method, raises Revert or RPCError for error replies"""
+        with self.lock:
+            if method == "eth_chainId":
+                return hex(self.chain_id)
+            if method == "net_version":
+                return str(self.chain_id)
+            if method == "web3_clientVersion":
+                return "SaveTheCastleMockChain/v1"
+            if method == "eth_syncing":
+                return False
+            if method == "eth_accounts":
+                return []
+            if method == "eth_blockNumber":
+                return hex(len(self.blocks) - 1)
+            if method in ("eth_gasPrice", "eth_maxPriorityFeePerGas"):
+                return hex(self.gas_price)
+            if method == "eth_getBalance":
+                return hex(self.state["eth"].get(Web3.to_checksum_address(params[0]), 0))
+            if method == "eth_getTransactionCount":
+                address = Web3.to_checksum_address(params[0])
+                nonce = self.state["nonces"].get(address, 0)
+                if len(params) > 1 and params[1] == "pending":
+                    while nonce in self.queued.get(address, {}):
+                        nonce += 1
+                return hex(nonce)
+            if method == "eth_getCode":
+                return "0xfe" if Web3.to_checksum_address(params[0]) in self.contracts else "0x"
+            if method in ("eth_call", "eth_estimateGas"):
+                request = params[0]
+                data = bytes(HexBytes(request.get("data") or request.get("input") or "0x"))
+                value = int(request.get("value", "0x0"), 16)
+                if request.get("to") is None:
+                    raise RPCError("contract creation is not supported by the mock chain")
+                result = self.call(request["to"], data, request.get("from"), value)
+                if method == "eth_call":
+                    return "0x" + result.hex()
+                return hex(INTRINSIC_GAS + sum(16 if byte else 4 for byte in data) + CALL_GAS)
+            if method == "eth_sendRawTransaction":
+                return self.send_raw_transaction(bytes(HexBytes(params[0])))
+            if method == "eth_getTransactionReceipt":
+                receipt = self.receipts.get(params[0])
+                return self._format_receipt(receipt) if receipt else None
+            if method == "eth_getTransactionByHash":
+                tx = self.transactions.get(params[0])
+                if tx is None:
+                    tx = next((tx for waiting in self.queued.values() for tx in waiting.values() if tx["hash"] == params[0]), None)
+                return self._format_transaction(tx) if tx else None
+            if method == "eth_getBlockByNumber":
+                number = self._block_number(params[0])
+                return self._format_block(self.blocks[number])
+            if method == "eth_getBlockByHash":
+                block = next((block for block in self.blocks if block["hash"] == params[0]), None)
+                return self._format_block(block) if block else None
+            if method == "eth_getLogs":
+                query = params[0] if params else {}
+                logs = self.get_logs(self._block_number(query.get("fromBlock", "earliest")),
+                                     self._block_number(query.get("toBlock", "latest")),
+                                     query.get("address"), query.get("topics"))
+                return [self._format_log(log) for log in logs]
+            if method == "eth_newFilter":
+                query = params[0] if params else {}
+                from_block = query.get("fromBlock", "latest")
+                self.filters_created += 1
+                filter_id = hex(self.filters_created)
+                self.filters[filter_id] = {"query": query, "next": len(self.blocks) if from_block in ("latest", "pending")
+                                           else self._block_number(from_block)}
+                return filter_id
+            if method in ("eth_getFilterChanges", "eth_getFilterLogs"):
+                log_filter = self.filters.get(params[0])
+                if log_filter is None:
+                    raise RPCError("filter not found")
+                query, latest = log_filter["query"], len(self.blocks) - 1
+                start = log_filter["next"] if method == "eth_getFilterChanges" else self._block_number(query.get("fromBlock", "earliest"))
+                logs = self.get_logs(start, min(latest, self._block_number(query.get("toBlock", "latest"))),
+                                     query.get("address"), query.get("topics"))
+                if method == "eth_getFilterChanges":
+                    log_filter["next"] = latest + 1
+                return [self._format_log(log) for log in logs]
+            if method == "eth_uninstallFilter":
+                return self.filters.pop(params[0], None) is not None
+        raise RPCError(f"the method {method} does not exist/is not available", -32601)
+
+
+class MockRPCServer:
+    """Serves a MockChain over HTTP JSON-RPC on a background thread"""
+
+    def __init__(self, chain: Optional[MockChain] = None, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, failure_mode: str = "error",
+                 seed: Optional[int] = None):
+        """
+        Args:
+            chain: Chain to serve (defaults to a fresh MockChain)
+            port: Port to listen on, 0 picks a free one
+            latency: Seconds added to every HTTP request, like a remote node's round trip
+            jitter: Latency varies uniformly by up to this many seconds either way
+            failure_rate: Fraction of requests that fail instead of being answered
+            failure_mode: "error" answers with a JSON-RPC server error, "http" with HTTP 503,
+                "timeout" holds the request for 30 seconds and then drops the connection
+        """
+        self.chain = chain or MockChain()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = {"requests": 0, "calls": 0, "failures": 0}
+        self.thread: Optional[threading.Thread] = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, web3's requests session reuses connections
+            disable_nagle_algorithm = True  # Headers and body go out as two writes, don't wait on delayed ACKs
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                delay, fail = server._draw()
+                if delay > 0:
+                    time.sleep(delay)
+                if fail and server.failure_mode == "http":
+                    self._reply(503, b'{"error": "injected failure"}')
+                    return
+                if fail and server.failure_mode == "timeout":
+                    time.sleep(30)
+                    self.close_connection = True
+                    return
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self._reply(200, json.dumps({"jsonrpc": "2.0", "id": None,
+                                                 "error": {"code": -32700, "message": "parse error"}}).encode())
+                    return
+                if isinstance(payload, list):
+                    answer = [server.answer(request, fail) for request in payload]
+                else:
+                    answer = server.answer(payload, fail)
+                self._reply(200, json.dumps(answer).encode())
+
+            def _reply(self, status: int, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self.random_lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+            fail = self.random.random() < self.failure_rate
+            self.stats["requests"] += 1
+            self.stats["failures"] += fail
+        return delay, fail
+
+    def answer(self, request: Dict, fail: bool = False) -> Dict:
+        """JSON-RPC reply object for one request object"""
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        with self.random_lock:
+            self.stats["calls"] += 1
+        if fail:
+            reply["error"] = {"code": -32603, "message": "injected failure"}
+            return reply
+        try:
+            reply["result"] = self.chain.handle(request.get("method"), request.get("params") or [])
+        except Revert as e:
+            message = f"execution reverted: {e.reason}" if e.reason else "execution reverted"
+            reply["error"] = {"code": 3, "message": message, "data": revert_data(e.reason)}
+        except RPCError as e:
+            reply["error"] = {"code": e.code, "message": str(e)}
+        except Exception as e:
+            reply["error"] = {"code": -32602, "message": f"invalid params: {e}"}
+        return reply
+
+    def start(self) -> str:
+        """Serve on a daemon thread, returns the RPC URL"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local JSON-RPC chain with the Save the Castle contracts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--chain-id", type=int, default=SaveTheCastleWeb3Client.CHAIN_ID)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests to fail, 0-1")
+    parser.add_argument("--failure-mode", choices=["error", "http", "timeout"], default="error")
+    args = parser.parse_args()
+
+    server = MockRPCServer(MockChain(args.chain_id), args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+                           args.failure_rate, args.failure_mode)
+    print(f"Mock chain {args.chain_id} on {server.url}")
+    print(f"GameEconomy: {server.chain.game_economy_address}")
+    print(f"Leaderboard: {server.chain.leaderboard_address}")
+    print(f"USDC:        {server.chain.usdc_address}")
+    print(f"Multicall3:  {server.chain.multicall_address}")
+    print("Funded accounts (Hardhat's development keys):")
+    for key in HARDHAT_KEYS:
+        print(f"  {Account.from_key(key).address}  {key}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Health pricing for Save the Castle
+Fetches the player's ETH and USDC health prices with one getCurrentPricing call, keeps the contract's
+dynamic pricing parameters, and predicts the next price locally after each purchase so the HUD never waits
+"""
+
+import threading
+import time
+from typing import Optional, Dict
+
+from web3 import Web3
+
+from abi_registry import REGISTRY
+
+HEALTH_PER_PURCHASE = 100  # getCurrentPricing quotes, and the client buys, 100 health at a time
+PRICES_UPDATED_TOPIC = Web3.to_hex(Web3.keccak(text="PricesUpdated(uint256,uint256)"))
+ZERO_ADDRESS = "0x" + "00" * 20
+
+# GameEconomy public variables the price formula reads
+PRICING_CONFIG = ["baseHealthPriceETH", "baseHealthPriceUSDC", "priceIncreasePercentage", "maxPriceMultiplier"]
+
+
+def format_health_prices(eth_price_wei: int, usdc_price_units: int) -> Dict[str, float]:
+    """Price dict returned by get_health_prices"""
+    return {
+        "eth_price": Web3.from_wei(eth_price_wei, 'ether'),
+        "usdc_price": usdc_price_units / 1e6,  # USDC has 6 decimals
+        "eth_price_wei": eth_price_wei,
+        "usdc_price_units": usdc_price_units
+    }
+
+
+def health_cost(base_price: int, purchases: int, increase_percentage: int, max_multiplier: int,
+                health_amount: int = HEALTH_PER_PURCHASE) -> int:
+    """GameEconomy.calculateETHCost/calculateUSDCCost, with the same integer rounding"""
+    multiplier = min(100 + purchases * increase_percentage, max_multiplier * 100)
+    return (base_price * health_amount) // 100 * multiplier // 100
+
+
+class HealthPricing:
+    """A player's current health prices, refreshed from the chain on TTL expiry or PricesUpdated, predicted in between"""
+
+    def __init__(self, client, ttl: float = 60.0, config_ttl: float = 600.0, poll_interval: float = 15.0):
+        """
+        Args:
+            client: SaveTheCastleWeb3Client to query through
+            ttl: Seconds before prices are re-read from the chain
+            config_ttl: Seconds before the pricing parameters are re-read (updateDynamicPricing emits no event)
+            poll_interval: Least seconds between PricesUpdated log polls
+        """
+        self.client = client
+        self.ttl = ttl
+        self.config_ttl = config_ttl
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.config: Optional[Dict[str, int]] = None
+        self.config_time = 0.0
+        self.purchases = 0  # Purchases in the player's current game, which drive the multiplier
+        self.prices: Optional[Dict] = None
+        self.prices_time = 0.0
+        self.last_block: Optional[int] = None  # Last block checked for PricesUpdated
+        self.poll_time = 0.0
+
+    def _player(self) -> str:
+        return self.client.account.address if self.client.account else ZERO_ADDRESS
+
+    def refresh(self) -> Dict:
+        """Read prices, the purchase count and (when stale) the pricing parameters in one batch request"""
+        game_economy = self.client.GAME_ECONOMY_ADDRESS
+        player = self._player()
+        calls = [(game_economy, REGISTRY.codec("GameEconomy", "getCurrentPricing").encode(player)),
+                 (game_economy, REGISTRY.codec("GameEconomy", "currentGamePurchases").encode(player))]
+        read_config = self.config is None or time.monotonic() - self.config_time > self.config_ttl
+        if read_config:
+            calls += [(game_economy, REGISTRY.codec("GameEconomy", name).encode()) for name in PRICING_CONFIG]
+
+        replies = self.client._batch_call(calls)
+        if None in replies:
+            raise ValueError("GameEconomy pricing call failed")
+        eth_cost, usdc_cost = REGISTRY.codec("GameEconomy", "getCurrentPricing").decode(replies[0])
+        with self.lock:
+            self.purchases = REGISTRY.codec("GameEconomy", "currentGamePurchases").decode(replies[1])[0]
+            if read_config:
+                self.config = {name: REGISTRY.codec("GameEconomy", name).decode(reply)[0]
+                               for name, reply in zip(PRICING_CONFIG, replies[2:])}
+                self.config_time = time.monotonic()
+            self.prices = format_health_prices(eth_cost, usdc_cost)
+            self.prices_time = time.monotonic()
+            return self.prices
+
+    def current(self) -> Dict:
+        """Cached or predicted prices, re-read from the chain only once they are older than the TTL"""
+        prices = self.prices
+        if prices is None or time.monotonic() - self.prices_time > self.ttl:
+            prices = self.refresh()
+        return prices
+
+    def predict(self, purchases: int) -> Optional[Dict]:
+        """Prices after `purchases` purchases in the current game, from the cached parameters"""
+        config = self.config
+        if config is None:
+            return None
+        rules = (purchases, config["priceIncreasePercentage"], config["maxPriceMultiplier"])
+        return format_health_prices(health_cost(config["baseHealthPriceETH"], *rules),
+                                    health_cost(config["baseHealthPriceUSDC"], *rules))
+
+    def record_purchase(self):
+        """A purchase was sent: move to the next price without asking the chain"""
+        with self.lock:
+            self.purchases += 1
+            self.prices = self.predict(self.purchases)
+
+    def reset_session(self):
+        """A game session started or ended, the contract resets the player's purchase count"""
+        with self.lock:
+            self.purchases = 0
+            self.prices = self.predict(0)
+
+    def on_prices_updated(self, eth_price: int, usdc_price: int):
+        """Apply a PricesUpdated event and re-read the player's prices on next use"""
+        with self.lock:
+            if self.config is not None:
+                self.config.update(baseHealthPriceETH=eth_price, baseHealthPriceUSDC=usdc_price)
+            self.prices_time = 0.0
+
+    def poll_events(self) -> int:
+        """Check for PricesUpdated logs since the last poll, at most every poll_interval seconds, returns events seen"""
+        if time.monotonic() - self.poll_time < self.poll_interval:
+            return 0
+        self.poll_time = time.monotonic()
+        latest = self.client.w3.eth.block_number
+        if self.last_block is None or latest <= self.last_block:
+            self.last_block = max(latest, self.last_block or 0)
+            return 0
+        logs = self.client.w3.eth.get_logs({"fromBlock": self.last_block + 1, "toBlock": latest,
+                                            "address": self.client.GAME_ECONOMY_ADDRESS,
+                                            "topics": [PRICES_UPDATED_TOPIC]})
+        self.last_block = latest
+        for log in logs:
+            data = bytes(log["data"])
+            self.on_prices_updated(int.from_bytes(data[:32], "big"), int.from_bytes(data[32:64], "big"))
+        return len(logs)
@@ -0,0 +1,326 @@
+"""
+Purchase-history analytics for Save the Castle
+Backfills GameEconomy purchases (from allPurchases via getPurchase, or from HealthPurchased logs) with
+concurrent batched requests into an append-only columnar store on disk, and answers revenue and spend
+aggregates from that store in fixed-size chunks, so memory stays flat however many purchases there are
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from web3 import Web3
+
+from abi_registry import REGISTRY
+from web3_client import SaveTheCastleWeb3Client
+
+HEALTH_PURCHASED_TOPIC = Web3.to_hex(Web3.keccak(text="HealthPurchased(address,uint256,uint256,uint256,string,uint256,uint256)"))
+
+# Column name -> dtype, one <name>.bin file each, row i of every file is purchase i
+COLUMNS = {
+    "player": np.uint32,     # Index into players.txt
+    "amount": np.uint32,     # Health points bought
+    "cost_wei": np.uint64,   # A single purchase costs far below the 18 ETH a uint64 holds
+    "cost_usdc": np.uint64,  # 6 decimals
+    "timestamp": np.uint64,
+    "method": np.uint8,      # Index into METHODS, OTHER_METHOD for anything else
+}
+METHODS = ["ETH", "USDC"]
+OTHER_METHOD = 255
+
+# (player as lowercase hex, amount, cost_wei, cost_usdc, timestamp, payment method)
+Purchase = Tuple[str, int, int, int, int, str]
+
+
+def _word(data: bytes, offset: int) -> int:
+    return int.from_bytes(data[offset:offset + 32], "big")
+
+
+def parse_purchase(data: bytes) -> Purchase:
+    """Decode a getPurchase(index) reply by reading the fixed ABI layout directly, several times faster than eth_abi"""
+    base = _word(data, 0)
+    method = base + _word(data, base + 160)
+    return ("0x" + data[base + 12:base + 32].hex(), _word(data, base + 32), _word(data, base + 64),
+            _word(data, base + 96), _word(data, base + 128), data[method + 32:method + 32 + _word(data, method)].decode())
+
+
+def parse_health_purchased(log) -> Purchase:
+    """Decode a HealthPurchased log: player is indexed, the rest is
+    (healthAmount, costInWei, costInUSDC, paymentMethod, gameId, timestamp)"""
+    data = bytes(log["data"])
+    method = _word(data, 96)
+    return ("0x" + bytes(log["topics"][1])[12:].hex(), _word(data, 0), _word(data, 32), _word(data, 64),
+            _word(data, 160), data[method + 32:method + 32 + _word(data, method)].decode())
+
+
+def exact_sums(values: np.ndarray, starts: np.ndarray) -> List[int]:
+    """Exact integer sums of uint64 runs beginning at `starts`, split in 32-bit halves so totals cannot overflow"""
+    high = np.add.reduceat(values >> np.uint64(32), starts)
+    low = np.add.reduceat(values & np.uint64(0xFFFFFFFF), starts)
+    return [(int(h) << 32) + int(l) for h, l in zip(high, low)]
+
+
+def group_by(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(distinct keys, start of each group, order that sorts rows into groups)"""
+    order = np.argsort(keys, kind="stable")
+    ordered = keys[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    return ordered[starts], starts, order
+
+
+class PurchaseStore:
+    """Append-only columnar purchase store: one binary file per column, players.txt, and meta.json as the commit point"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta = {"source": None, "address": None, "rows": 0, "players": 0, "cursor": 0}
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as handle:
+                self.meta.update(json.load(handle))
+
+        # Drop anything written after the last commit, e.g. by a run that was killed mid-append
+        for name, dtype in COLUMNS.items():
+            column_path = self._column_path(name)
+            if not os.path.exists(column_path):
+                open(column_path, "wb").close()
+            with open(column_path, "r+b") as handle:
+                handle.truncate(self.meta["rows"] * np.dtype(dtype).itemsize)
+        self.players: List[str] = []
+        players_path = os.path.join(path, "players.txt")
+        if os.path.exists(players_path):
+            with open(players_path) as handle:
+                self.players = [line.strip() for _, line in zip(range(self.meta["players"]), handle)]
+        with open(players_path, "w") as handle:
+            handle.writelines(player + "\n" for player in self.players)
+        self.player_ids = {player.lower(): i for i, player in enumerate(self.players)}
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, name + ".bin")
+
+    def bind(self, source: str, address: str):
+        """Tie the store to one source and contract, a store filled from anything else would double count"""
+        if self.meta["source"] is None:
+            self.meta["source"], self.meta["address"] = source, address
+        elif (self.meta["source"], self.meta["address"]) != (source, address):
+            raise ValueError(f"Store {self.path} holds {self.meta['source']} purchases from {self.meta['address']}, "
+                             f"not {source} purchases from {address}")
+
+    def append(self, purchases: List[Purchase], cursor: int):
+        """Append a batch of purchases and commit it together with the backfill cursor that follows it"""
+        new_players = []
+        for player, *_ in purchases:
+            if player not in self.player_ids:
+                self.player_ids[player] = len(self.players)
+                self.players.append(Web3.to_checksum_address(player))  # Checksummed once per player, not per row
+                new_players.append(self.players[-1])
+
+        methods = {method: i for i, method in enumerate(METHODS)}
+        columns = {
+            "player": [self.player_ids[purchase[0]] for purchase in purchases],
+            "amount": [purchase[1] for purchase in purchases],
+            "cost_wei": [purchase[2] for purchase in purchases],
+            "cost_usdc": [purchase[3] for purchase in purchases],
+            "timestamp": [purchase[4] for purchase in purchases],
+            "method": [methods.get(purchase[5], OTHER_METHOD) for purchase in purchases],
+        }
+        for name, values in columns.items():
+            with open(self._column_path(name), "ab") as handle:
+                handle.write(np.asarray(values, dtype=COLUMNS[name]).tobytes())
+        with open(os.path.join(self.path, "players.txt"), "a") as handle:
+            handle.writelines(player + "\n" for player in new_players)
+
+        self.meta.update(rows=self.meta["rows"] + len(purchases), players=len(self.players), cursor=cursor)
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path + ".tmp", "w") as handle:
+            json.dump(self.meta, handle)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def column(self, name: str) -> np.ndarray:
+        """Memory-mapped column, pages are only read as they are touched"""
+        if not self.meta["rows"]:
+            return np.zeros(0, dtype=COLUMNS[name])
+        return np.memmap(self._column_path(name), dtype=COLUMNS[name], mode="r", shape=(self.meta["rows"],))
+
+    def chunks(self, names: List[str], size: int = 1 << 20) -> Iterator[Dict[str, np.ndarray]]:
+        """The given columns in slices of `size` rows"""
+        columns = {name: self.column(name) for name in names}
+        for start in range(0, self.meta["rows"], size):
+            yield {name: np.asarray(column[start:start + size]) for name, column in columns.items()}
+
+    # Aggregates
+
+    def _grouped_totals(self, key, since: Optional[int] = None) -> Dict[int, List[int]]:
+        """Per group key: [purchases, health, cost_wei, cost_usdc], accumulated chunk by chunk"""
+        totals: Dict[int, List[int]] = {}
+        for chunk in self.chunks(["player", "amount", "cost_wei", "cost_usdc", "timestamp", "method"]):
+            if since is not None:
+                chunk = {name: values[chunk["timestamp"] >= since] for name, values in chunk.items()}
+            if not len(chunk["timestamp"]):
+                continue
+            keys, starts, order = group_by(key(chunk))
+            counts = np.diff(np.r_[starts, len(order)])
+            sums = [exact_sums(chunk[name][order].astype(np.uint64), starts) for name in ("amount", "cost_wei", "cost_usdc")]
+            for i, group in enumerate(keys.tolist()):
+                row = totals.setdefault(group, [0, 0, 0, 0])
+                row[0] += int(counts[i])
+                row[1] += sums[0][i]
+                row[2] += sums[1][i]
+                row[3] += sums[2][i]
+        return totals
+
+    def revenue_per_hour(self, since: Optional[int] = None) -> List[Dict]:
+        """Purchases and revenue per hour (unix time of its start), oldest first"""
+        totals = self._grouped_totals(lambda chunk: chunk["timestamp"] // np.uint64(3600), since)
+        return [{"hour": hour * 3600, "purchases": row[0], "health": row[1], "eth_wei": row[2], "usdc": row[3]}
+                for hour, row in sorted(totals.items())]
+
+    def player_spend(self, top: Optional[int] = None, by: str = "eth_wei", since: Optional[int] = None) -> List[Dict]:
+        """Per-player totals, biggest spenders first by "eth_wei", "usdc", "purchases" or "health" """
+        totals = self._grouped_totals(lambda chunk: chunk["player"], since)
+        rows = [{"player": self.players[player], "purchases": row[0], "health": row[1], "eth_wei": row[2], "usdc": row[3]}
+                for player, row in totals.items()]
+        rows.sort(key=lambda row: row[by], reverse=True)
+        return rows[:top] if top else rows
+
+    def payment_split(self, since: Optional[int] = None) -> Dict[str, Dict]:
+        """Purchases and revenue per payment method"""
+        totals = self._grouped_totals(lambda chunk: chunk["method"], since)
+        return {(METHODS[method] if method < len(METHODS) else "other"):
+                {"purchases": row[0], "health": row[1], "eth_wei": row[2], "usdc": row[3]}
+                for method, row in sorted(totals.items())}
+
+
+def _pipelined(executor: ThreadPoolExecutor, fetch, jobs: Iterable, window: int) -> Iterator:
+    """fetch(job) for each job on the executor, at most `window` in flight, results in job order"""
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(fetch, job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class PurchaseExtractor:
+    """Streams purchases from the chain into a PurchaseStore, resuming from the store's cursor"""
+
+    def __init__(self, client: SaveTheCastleWeb3Client, store: PurchaseStore, workers: int = 4, chunk: int = 100,
+                 block_range: int = 2000):
+        self.client = client
+        self.store = store
+        self.workers = workers
+        self.chunk = chunk  # getPurchase calls per batch request
+        self.block_range = block_range  # Blocks per eth_getLogs request, public endpoints cap the range
+
+    def _fetch_purchases(self, indices: range) -> List[Purchase]:
+        get_purchase = REGISTRY.codec("GameEconomy", "getPurchase")
+        calls = [(self.client.GAME_ECONOMY_ADDRESS, get_purchase.encode(index)) for index in indices]
+        for _ in range(3):
+            replies = self.client._batch_call(calls)
+            if None not in replies:
+                return [parse_purchase(reply) for reply in replies]
+        raise RuntimeError(f"getPurchase failed for purchases {indices.start}-{indices.stop - 1}")
+
+    def _fetch_logs(self, blocks: range) -> List[Purchase]:
+        logs = self.client.w3.eth.get_logs({"fromBlock": blocks.start, "toBlock": blocks.stop - 1,
+                                            "address": self.client.GAME_ECONOMY_ADDRESS,
+                                            "topics": [HEALTH_PURCHASED_TOPIC]})
+        return [parse_health_purchased(log) for log in logs]
+
+    def _run(self, fetch, jobs: List[range], progress) -> int:
+        added = 0
+        with ThreadPoolExecutor(self.workers) as executor:
+            for job, purchases in zip(jobs, _pipelined(executor, fetch, jobs, self.workers * 2)):
+                self.store.append(purchases, job.stop)
+                added += len(purchases)
+                if progress:
+                    progress(len(self.store), job.stop)
+        return added
+
+    def backfill_storage(self, progress=None) -> int:
+        """Read allPurchases from the cursor up to getTotalPurchases, returns purchases added"""
+        self.store.bind("storage", self.client.GAME_ECONOMY_ADDRESS)
+        total = self.client.game_economy.functions.getTotalPurchases().call()
+        jobs = [range(start, min(start + self.chunk, total)) for start in range(self.store.meta["cursor"], total, self.chunk)]
+        return self._run(self._fetch_purchases, jobs, progress)
+
+    def backfill_logs(self, from_block: int = 0, to_block: Optional[int] = None, progress=None) -> int:
+        """Scan HealthPurchased logs from the cursor (or from_block, for a new store) to to_block, returns purchases added"""
+        self.store.bind("logs", self.client.GAME_ECONOMY_ADDRESS)
+        start = max(self.store.meta["cursor"], from_block)
+        end = (self.client.w3.eth.block_number if to_block is None else to_block) + 1
+        jobs = [range(block, min(block + self.block_range, end)) for block in range(start, end, self.block_range)]
+        return self._run(self._fetch_logs, jobs, progress)
+
+
+def print_report(store: PurchaseStore, since: Optional[int] = None, top: int = 10, hours: int = 24):
+    print(f"{len(store)} purchases by {len(store.players)} players ({store.meta['source']}, {store.meta['address']})")
+    print("\nPayment split")
+    for method, row in store.payment_split(since).items():
+        print(f"  {method:<6}{row['purchases']:>10} purchases  {row['eth_wei'] / 1e18:>12.6f} ETH  {row['usdc'] / 1e6:>12.2f} USDC")
+    print(f"\nLast {hours} hours with purchases")
+    for row in store.revenue_per_hour(since)[-hours:]:
+        hour = time.strftime("%Y-%m-%d %H:00", time.localtime(row["hour"]))
+        print(f"  {hour}{row['purchases']:>8}  {row['eth_wei'] / 1e18:>12.6f} ETH  {row['usdc'] / 1e6:>12.2f} USDC")
+    print(f"\nTop {top} spenders (ETH)")
+    for row in store.player_spend(top, "eth_wei", since):
+        print(f"  {row['player']}{row['purchases']:>8}  {row['eth_wei'] / 1e18:>12.6f} ETH  {row['usdc'] / 1e6:>12.2f} USDC")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save the Castle purchase analytics")
+    parser.add_argument("command", choices=["backfill", "report"])
+    parser.add_argument("--store", default="purchases", help="Store directory")
+    parser.add_argument("--rpc", default=SaveTheCastleWeb3Client.BASE_SEPOLIA_RPC)
+    parser.add_argument("--chain-id", type=int, default=None)
+    parser.add_argument("--game-economy", default=SaveTheCastleWeb3Client.GAME_ECONOMY_ADDRESS)
+    parser.add_argument("--source", choices=["storage", "logs"], default="storage",
+                        help="getPurchase over allPurchases, or HealthPurchased logs")
+    parser.add_argument("--from-block", type=int, default=0, help="Logs: deployment block, for a new store")
+    parser.add_argument("--block-range", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk", type=int, default=100)
+    parser.add_argument("--since-hours", type=float, default=None, help="Report: only purchases this recent")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Report: print JSON")
+    args = parser.parse_args()
+
+    store = PurchaseStore(args.store)
+    if args.command == "backfill":
+        client = SaveTheCastleWeb3Client(None, args.rpc, args.chain_id,
+                                         {"game_economy": Web3.to_checksum_address(args.game_economy)})
+        extractor = PurchaseExtractor(client, store, args.workers, args.chunk, args.block_range)
+        started = time.perf_counter()
+
+        def progress(rows, cursor):
+            print(f"\r{rows} purchases stored, cursor {cursor}", end="", flush=True)
+
+        if args.source == "storage":
+            added = extractor.backfill_storage(progress)
+        else:
+            added = extractor.backfill_logs(args.from_block, progress=progress)
+        elapsed = time.perf_counter() - started
+        print(f"\nBackfilled {added} purchases in {elapsed:.1f}s ({added / max(elapsed, 1e-9):.0f}/s), {len(store)} stored")
+        return
+
+    since = int(time.time() - args.since_hours * 3600) if args.since_hours else None
+    if args.json:
+        print(json.dumps({"purchases": len(store), "payment_split": store.payment_split(since),
+                          "revenue_per_hour": store.revenue_per_hour(since),
+                          "top_spenders": store.player_spend(args.top, "eth_wei", since)}, indent=2))
+    else:
+        print_report(store, since, args.top)
+
+
+if __name__ == "__main__":
+    main()
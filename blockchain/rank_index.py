@@ -0,0 +1,70 @@
+"""
+In-memory rank index over player best scores
+Players are kept sorted by best score with bisect lookups, so "what's my rank" and "who's near me"
+answer locally in microseconds once their stats have been fetched in bulk
+"""
+
+import bisect
+from typing import Optional, Dict, Iterable, List, Tuple
+
+
+class RankIndex:
+    """Players ordered by best score, highest first, ties broken by address"""
+
+    def __init__(self):
+        self.keys: List[Tuple[int, str]] = []  # (-best_score, address), ascending
+        self.stats: Dict[str, Dict] = {}  # address -> format_player_stats dict
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self.stats
+
+    def _key(self, address: str) -> Tuple[int, str]:
+        return (-self.stats[address]["best_score"], address)
+
+    def update(self, address: str, stats: Dict):
+        """Insert or move one player, players who never finished a game are left out"""
+        if address in self.stats:
+            del self.keys[bisect.bisect_left(self.keys, self._key(address))]
+            del self.stats[address]
+        if stats.get("total_games", 0) > 0:
+            self.stats[address] = stats
+            bisect.insort(self.keys, self._key(address))
+
+    def update_many(self, entries: Iterable[Tuple[str, Dict]]):
+        """Apply a bulk fetch, re-sorting once instead of inserting one by one"""
+        for address, stats in entries:
+            if stats.get("total_games", 0) > 0:
+                self.stats[address] = stats
+            else:
+                self.stats.pop(address, None)
+        self.keys = sorted(self._key(address) for address in self.stats)
+
+    def rank(self, address: str) -> int:
+        """1-based rank of a player, 0 if not indexed"""
+        if address not in self.stats:
+            return 0
+        return bisect.bisect_left(self.keys, self._key(address)) + 1
+
+    def rank_for_score(self, score: int) -> int:
+        """Rank a new best score would take, behind players who already have it"""
+        return bisect.bisect_left(self.keys, (-score + 1,)) + 1
+
+    def entry(self, rank: int) -> Optional[Dict]:
+        """Stats of the player at a 1-based rank, with their address and rank"""
+        if not 0 < rank <= len(self.keys):
+            return None
+        address = self.keys[rank - 1][1]
+        return dict(self.stats[address], address=address, rank=rank)
+
+    def top(self, count: int) -> List[Dict]:
+        return [self.entry(rank) for rank in range(1, min(count, len(self.keys)) + 1)]
+
+    def around(self, address: str, radius: int = 2) -> List[Dict]:
+        """The player and up to `radius` players either side of them"""
+        rank = self.rank(address)
+        if not rank:
+            return []
+        return [self.entry(other) for other in range(max(1, rank - radius), min(len(self.keys), rank + radius) + 1)]
@@ -0,0 +1,516 @@
+"""
+Score-submission relayer for Save the Castle tournaments
+Players sign score claims off-chain, the relayer checks them, queues them and sends them to
+Leaderboard.submitScores in batches from one or more authorized hot wallets
+"""
+
+import argparse
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List
+
+from eth_abi import encode
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from web3 import Web3
+
+from web3_client import SaveTheCastleWeb3Client
+
+RELAYER_LEADERBOARD_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "player", "type": "address"},
+                    {"name": "playerName", "type": "string"},
+                    {"name": "score", "type": "uint256"},
+                    {"name": "isPaidPlayer", "type": "bool"},
+                    {"name": "totalSpent", "type": "uint256"}
+                ],
+                "name": "claims",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "submitScores",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "minScoreThreshold",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "relayer", "type": "address"}, {"name": "allowed", "type": "bool"}],
+        "name": "setScoreRelayer",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    }
+]
+
+# Purchase stats decide isPaidPlayer on the relayer's side, players cannot claim it
+RELAYER_ECONOMY_ABI = [
+    {
+        "inputs": [{"name": "", "type": "address"}],
+        "name": "playerStats",
+        "outputs": [
+            {"name": "totalSpentETH", "type": "uint256"},
+            {"name": "totalSpentUSDC", "type": "uint256"},
+            {"name": "totalHealthPurchased", "type": "uint256"},
+            {"name": "purchaseCount", "type": "uint256"},
+            {"name": "lastPurchaseTimestamp", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# Hardhat's well-known development accounts (`npx hardhat node`), never use them on a real network
+HARDHAT_KEYS = [
+    "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80",
+    "0x59c6995e998f97a5a0044966f0945389dc9e86dae88c7a8412f4603b6b78690d",
+    "0x5de4111afa1a4b94908f83103eb1f1706367c2e68ca870fc3fb9a804cdab365a",
+    "0x7c852118294e51e653712a81e05800f419141751be58f605c371e15141b007a6",
+]
+
+
+def claim_hash(leaderboard: str, chain_id: int, claim: Dict) -> bytes:
+    """What a player signs: the claim bound to one leaderboard on one chain"""
+    return Web3.keccak(encode(
+        ["address", "uint256", "address", "string", "uint256", "uint256"],
+        [leaderboard, chain_id, claim["player"], claim["name"], claim["score"], claim["claim_id"]]))
+
+
+def sign_score_claim(private_key: str, name: str, score: int,
+                     leaderboard: str = SaveTheCastleWeb3Client.LEADERBOARD_ADDRESS,
+                     chain_id: int = SaveTheCastleWeb3Client.CHAIN_ID, claim_id: Optional[int] = None) -> Dict:
+    """Build and sign a claim on the player's side, ready to POST to the relayer"""
+    account = Account.from_key(private_key)
+    claim = {
+        "player": account.address,
+        "name": name,
+        "score": score,
+        "claim_id": secrets.randbits(64) if claim_id is None else claim_id
+    }
+    signed = Account.sign_message(encode_defunct(primitive=claim_hash(leaderboard, chain_id, claim)), private_key)
+    claim["signature"] = signed.signature.hex()
+    return claim
+
+
+# Process pool workers: signing and signature recovery are pure CPU, so they run outside the GIL
+_worker_keys: List[str] = []
+
+
+def _init_worker(keys: List[str]):
+    global _worker_keys
+    _worker_keys = keys
+
+
+def _sign_transaction(wallet: int, transaction: Dict) -> bytes:
+    return bytes(Account.sign_transaction(transaction, _worker_keys[wallet]).rawTransaction)
+
+
+def _recover_signer(message_hash: bytes, signature: str) -> Optional[str]:
+    try:
+        return Account.recover_message(encode_defunct(primitive=message_hash), signature=signature)
+    except Exception:
+        return None
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile, 0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Wallet:
+    """A hot wallet with its own locally pipelined nonce"""
+
+    def __init__(self, index: int, address: str):
+        self.index = index
+        self.address = address
+        self.nonce: Optional[int] = None
+        self.in_flight = 0
+        self.resync = False  # Set by the receipt thread, the sender rereads the nonce before its next batch
+
+
+class ScoreRelayer:
+    """Queues signed claims and submits them in batches with nonce pipelining across hot wallets"""
+
+    def __init__(self, wallet_keys: List[str], rpc_url: Optional[str] = None,
+                 leaderboard_address: Optional[str] = None, chain_id: Optional[int] = None,
+                 economy_address: Optional[str] = None,
+                 batch_size: int = 20, flush_interval: float = 0.5, max_in_flight: int = 16,
+                 workers: Optional[int] = None, gas_per_claim: int = 250000, receipt_timeout: float = 120.0):
+        """
+        Args:
+            wallet_keys: Private keys of relayer wallets authorized with Leaderboard.setScoreRelayer
+            rpc_url: RPC endpoint (defaults to Base Sepolia)
+            batch_size: Most claims per transaction
+            flush_interval: Longest wait for a batch to fill, in seconds
+            max_in_flight: Unconfirmed transactions allowed per wallet before it waits
+            workers: Size of the signing process pool (defaults to one per CPU)
+            receipt_timeout: Seconds without a receipt after which a transaction counts as dropped by the node
+                and its claims are sent again
+        """
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url or SaveTheCastleWeb3Client.BASE_SEPOLIA_RPC))
+        if not self.w3.is_connected():
+            raise ConnectionError(f"Failed to connect to {rpc_url}")
+        self.chain_id = chain_id or self.w3.eth.chain_id
+        self.leaderboard_address = Web3.to_checksum_address(leaderboard_address or SaveTheCastleWeb3Client.LEADERBOARD_ADDRESS)
+        self.leaderboard = self.w3.eth.contract(address=self.leaderboard_address, abi=RELAYER_LEADERBOARD_ABI)
+        self.min_score = self.leaderboard.functions.minScoreThreshold().call()
+        self.economy = self.w3.eth.contract(
+            address=Web3.to_checksum_address(economy_address or SaveTheCastleWeb3Client.GAME_ECONOMY_ADDRESS),
+            abi=RELAYER_ECONOMY_ABI)
+        self.paid = set()  # Players GameEconomy has seen buy health, purchases are never undone
+
+        self.wallets = [_Wallet(i, Account.from_key(key).address) for i, key in enumerate(wallet_keys)]
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(list(wallet_keys),))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_in_flight = max_in_flight
+        self.gas_per_claim = gas_per_claim
+        self.receipt_timeout = receipt_timeout
+
+        self.queue: "queue.Queue[Dict]" = queue.Queue()
+        self.pending: Dict[str, Dict] = {}  # tx hash -> {"wallet", "claims", "sent"}
+        self.seen = set()  # (player, claim_id) of every claim with a valid signature, against replays
+        self.open_claims = 0  # Accepted claims not yet confirmed, failed or rejected, wherever they are
+        self.lock = threading.Lock()
+        self.running = False
+        self.threads: List[threading.Thread] = []
+        self.started = time.time()
+        self.stats = {"received": 0, "rejected": 0, "transactions": 0, "confirmed": 0, "failed": 0, "dropped": 0}
+        self.queue_latency: List[float] = []  # Seconds from claim received to transaction sent
+        self.confirm_latency: List[float] = []  # Seconds from claim received to receipt seen
+
+    def submit(self, claim: Dict) -> bool:
+        """Check a claim's fields and queue it, the signature is verified (and the claim id used up) in the pool before sending"""
+        try:
+            claim = {
+                "player": Web3.to_checksum_address(claim["player"]),
+                "name": str(claim["name"]),
+                "score": int(claim["score"]),
+                "claim_id": int(claim["claim_id"]),
+                "signature": str(claim["signature"]),
+            }
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"Rejected malformed claim: {e}")
+            with self.lock:
+                self.stats["rejected"] += 1
+            return False
+
+        key = (claim["player"], claim["claim_id"])
+        with self.lock:
+            if key in self.seen or claim["score"] < self.min_score or not 0 < len(claim["name"].encode()) <= 32:
+                self.stats["rejected"] += 1
+                return False
+            self.stats["received"] += 1
+            self.open_claims += 1
+        claim["received"] = time.time()
+        self.queue.put(claim)
+        return True
+
+    def start(self):
+        """One sender thread per wallet plus a receipt poller"""
+        self.pool.submit(percentile, [], 0.5).result()  # Fork the pool workers before any thread exists
+        self.running = True
+        self.started = time.time()
+        for wallet in self.wallets:
+            self.threads.append(threading.Thread(target=self._send_loop, args=(wallet,), daemon=True))
+        self.threads.append(threading.Thread(target=self._receipt_loop, daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, drain: bool = True, timeout: float = 60.0):
+        """Stop the threads, by default after every accepted claim is confirmed, failed or rejected"""
+        deadline = time.time() + timeout
+        # open_claims also counts batches a sender took off the queue and has not sent yet
+        while drain and self.open_claims and time.time() < deadline:
+            time.sleep(0.1)
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.pool.shutdown()
+
+    def _take_batch(self) -> List[Dict]:
+        """Up to batch_size claims, waiting at most flush_interval for the batch to fill"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.time())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _verify(self, batch: List[Dict]) -> List[Dict]:
+        """Keep the claims signed by the player they name, each claim id once"""
+        # Claims requeued after a failed send were verified (and their ids used up) on their first pass
+        retried = [claim for claim in batch if claim.get("verified")]
+        fresh = [claim for claim in batch if not claim.get("verified")]
+        hashes = [claim_hash(self.leaderboard_address, self.chain_id, claim) for claim in fresh]
+        signers = self.pool.map(_recover_signer, hashes, [claim["signature"] for claim in fresh])
+        valid = []
+        with self.lock:
+            for claim, signer in zip(fresh, signers):
+                key = (claim["player"], claim["claim_id"])
+                if signer == claim["player"] and key not in self.seen:
+                    self.seen.add(key)
+                    claim["verified"] = True
+                    valid.append(claim)
+            self.stats["rejected"] += len(fresh) - len(valid)
+            self.open_claims -= len(fresh) - len(valid)
+        return retried + valid
+
+    def _paid_players(self, players: List[str]) -> set:
+        """The players among these who bought health, read from GameEconomy for those not known to have"""
+        for player in set(players) - self.paid:
+            if self.economy.functions.playerStats(player).call()[3] > 0:
+                self.paid.add(player)
+        return self.paid
+
+    def _send_loop(self, wallet: _Wallet):
+        while self.running:
+            if wallet.in_flight >= self.max_in_flight:
+                time.sleep(0.05)
+                continue
+            batch = self._take_batch()
+            if batch:
+                batch = self._verify(batch)
+            if batch:
+                self._send_batch(wallet, batch)
+
+    def _send_batch(self, wallet: _Wallet, batch: List[Dict]):
+        """Build, sign in the pool and send one submitScores transaction"""
+        if wallet.resync:
+            wallet.resync, wallet.nonce = False, None
+        try:
+            paid = self._paid_players([claim["player"] for claim in batch])
+            claims = [(claim["player"], claim["name"], claim["score"], claim["player"] in paid, 0) for claim in batch]
+            if wallet.nonce is None:
+                wallet.nonce = self.w3.eth.get_transaction_count(wallet.address, "pending")
+            transaction = self.leaderboard.functions.submitScores(claims).build_transaction({
+                "from": wallet.address,
+                "gas": 100000 + self.gas_per_claim * len(claims),
+                "gasPrice": self.w3.eth.gas_price,
+                "nonce": wallet.nonce,
+                "chainId": self.chain_id
+            })
+            raw = self.pool.submit(_sign_transaction, wallet.index, transaction).result()
+            tx_hash = self.w3.eth.send_raw_transaction(raw).hex()
+        except Exception as e:
+            print(f"Error relaying {len(batch)} claims from {wallet.address}: {e}")
+            wallet.nonce = None  # Resync from the node, the nonce may not have been used
+            for claim in batch:
+                self.queue.put(claim)
+            time.sleep(self.flush_interval)
+            return
+
+        sent = time.time()
+        wallet.nonce += 1
+        with self.lock:
+            wallet.in_flight += 1
+            self.pending[tx_hash] = {"wallet": wallet, "claims": batch, "sent": sent, "nonce": transaction["nonce"], "raw": raw}
+            self.stats["transactions"] += 1
+            self.queue_latency.extend(sent - claim["received"] for claim in batch)
+
+    def _receipt_loop(self):
+        while self.running:
+            with self.lock:
+                waiting = list(self.pending.items())
+            # Only a wallet's lowest pending nonce can be lost, the transactions after it wait behind it
+            lowest = {}
+            for _, entry in waiting:
+                wallet = entry["wallet"]
+                lowest[wallet.index] = min(lowest.get(wallet.index, entry["nonce"]), entry["nonce"])
+            for tx_hash, entry in waiting:
+                try:
+                    receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+                except Exception:
+                    if time.time() - entry["sent"] > self.receipt_timeout and entry["nonce"] == lowest[entry["wallet"].index]:
+                        self._unmined(tx_hash, entry)
+                    continue  # Not mined yet
+                now = time.time()
+                with self.lock:
+                    del self.pending[tx_hash]
+                    entry["wallet"].in_flight -= 1
+                    self.open_claims -= len(entry["claims"])
+                    if receipt["status"] == 1:
+                        self.stats["confirmed"] += len(entry["claims"])
+                        self.confirm_latency.extend(now - claim["received"] for claim in entry["claims"])
+                    else:
+                        self.stats["failed"] += len(entry["claims"])
+                        print(f"Relay transaction {tx_hash} reverted ({len(entry['claims'])} claims)")
+            time.sleep(0.2)
+
+    def _unmined(self, tx_hash: str, entry: Dict):
+        """No receipt by the deadline: rebroadcast the same signed transaction, which cannot land twice.
+        Only when its nonce went to another transaction are the claims sent again, in a new one"""
+        wallet = entry["wallet"]
+        entry["sent"] = time.time()
+        try:
+            self.w3.eth.send_raw_transaction(entry["raw"])
+            print(f"Relay transaction {tx_hash} not mined after {self.receipt_timeout:g}s, rebroadcast it")
+            return
+        except Exception as e:
+            try:
+                used = self.w3.eth.get_transaction_count(wallet.address, "latest") > entry["nonce"]
+            except Exception:
+                return  # Try again after the next deadline
+            if not used:
+                print(f"Relay transaction {tx_hash} not mined and not accepted again: {e}")
+                return
+            try:
+                self.w3.eth.get_transaction_receipt(tx_hash)
+                return  # Mined after all, the receipt loop collects it
+            except Exception:
+                pass
+        with self.lock:
+            if self.pending.pop(tx_hash, None) is None:
+                return
+            entry["wallet"].in_flight -= 1
+            entry["wallet"].resync = True
+            self.stats["dropped"] += 1
+        print(f"Relay transaction {tx_hash} lost its nonce to another transaction, resending {len(entry['claims'])} claims")
+        for claim in entry["claims"]:
+            self.queue.put(claim)
+
+    def metrics(self) -> Dict:
+        """Throughput, queue depth and latency percentiles since start()"""
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            return dict(self.stats,
+                        queued=self.queue.qsize(),
+                        in_flight=len(self.pending),
+                        submissions_per_sec=round(self.stats["confirmed"] / elapsed, 2),
+                        queue_latency_p50=round(percentile(self.queue_latency, 0.5), 4),
+                        queue_latency_p99=round(percentile(self.queue_latency, 0.99), 4),
+                        confirm_latency_p50=round(percentile(self.confirm_latency, 0.5), 4),
+                        confirm_latency_p99=round(percentile(self.confirm_latency, 0.99), 4))
+
+
+def serve(relayer: ScoreRelayer, host: str = "127.0.0.1", port: int = 8600):
+    """POST /claim with a signed claim as JSON, GET /metrics for the counters"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: Dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/claim":
+                return self._reply(404, {"error": "not found"})
+            try:
+                claim = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError:
+                return self._reply(400, {"error": "invalid JSON"})
+            accepted = relayer.submit(claim)
+            self._reply(202 if accepted else 400, {"accepted": accepted})
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                return self._reply(404, {"error": "not found"})
+            self._reply(200, relayer.metrics())
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Relayer listening on http://{host}:{port} with {len(relayer.wallets)} wallets")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def bench(relayer: ScoreRelayer, claims: int, players: int = 50):
+    """End-to-end run: sign `claims` claims from random players, relay them and wait for receipts"""
+    keys = ["0x" + secrets.token_hex(32) for _ in range(players)]
+    signed = [sign_score_claim(keys[i % players], f"bench{i % players}", relayer.min_score + i,
+                               relayer.leaderboard_address, relayer.chain_id, i) for i in range(claims)]
+    relayer.start()
+    start = time.time()
+    for claim in signed:
+        relayer.submit(claim)
+    relayer.stop(drain=True, timeout=max(60.0, claims * 0.5))
+    metrics = relayer.metrics()
+    metrics["wall_seconds"] = round(time.time() - start, 3)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save the Castle score relayer")
+    parser.add_argument("command", choices=["serve", "bench", "authorize"])
+    parser.add_argument("--rpc", default=os.getenv("RELAYER_RPC_URL", SaveTheCastleWeb3Client.BASE_SEPOLIA_RPC))
+    parser.add_argument("--leaderboard", default=os.getenv("LEADERBOARD_ADDRESS", SaveTheCastleWeb3Client.LEADERBOARD_ADDRESS))
+    parser.add_argument("--economy", default=os.getenv("GAME_ECONOMY_ADDRESS", SaveTheCastleWeb3Client.GAME_ECONOMY_ADDRESS),
+                        help="GameEconomy whose purchase stats decide isPaidPlayer")
+    parser.add_argument("--keys", default=os.getenv("RELAYER_KEYS", ""),
+                        help="Comma separated relayer wallet keys (bench/authorize default to Hardhat accounts 1-3)")
+    parser.add_argument("--owner-key", default=os.getenv("PRIVATE_KEY", ""), help="Leaderboard owner, for authorize")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--claims", type=int, default=500, help="Claims to relay in bench")
+    args = parser.parse_args()
+
+    keys = [key.strip() for key in args.keys.split(",") if key.strip()]
+    if not keys and args.command in ("bench", "authorize"):
+        keys = HARDHAT_KEYS[1:]
+    if not keys:
+        parser.error("--keys (or RELAYER_KEYS) is required")
+
+    if args.command == "authorize":
+        # Local dev chain setup: the owner (Hardhat account 0 by default) allows the relayer wallets
+        w3 = Web3(Web3.HTTPProvider(args.rpc))
+        owner = Account.from_key(args.owner_key or HARDHAT_KEYS[0])
+        leaderboard = w3.eth.contract(address=Web3.to_checksum_address(args.leaderboard), abi=RELAYER_LEADERBOARD_ABI)
+        for key in keys:
+            address = Account.from_key(key).address
+            transaction = leaderboard.functions.setScoreRelayer(address, True).build_transaction({
+                "from": owner.address,
+                "nonce": w3.eth.get_transaction_count(owner.address, "pending"),
+                "gasPrice": w3.eth.gas_price,
+                "chainId": w3.eth.chain_id
+            })
+            tx_hash = w3.eth.send_raw_transaction(owner.sign_transaction(transaction).rawTransaction)
+            w3.eth.wait_for_transaction_receipt(tx_hash)
+            print(f"Authorized relayer {address}")
+        return
+
+    relayer = ScoreRelayer(keys, args.rpc, args.leaderboard, economy_address=args.economy,
+                           batch_size=args.batch_size, workers=args.workers)
+    if args.command == "serve":
+        relayer.start()
+        serve(relayer, port=args.port)
+        relayer.stop(drain=False)
+    else:
+        print(json.dumps(bench(relayer, args.claims), indent=2))
+
+
+if __name__ == "__main__":
+    main()
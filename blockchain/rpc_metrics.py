@@ -0,0 +1,411 @@
+"""
+RPC metrics for Save the Castle
+Web3 middleware that counts every JSON-RPC request per method and per contract function, with latency
+histograms, payload sizes, error classes and the code path that made it, logs slow calls, and exports the
+lot as Prometheus text or JSON from a tiny local HTTP server
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List, Tuple
+
+import rlp
+
+from abi_registry import REGISTRY
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds, +Inf implied
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTRACT_METHODS = ("eth_call", "eth_estimateGas", "eth_sendTransaction")
+PLUMBING = {"_batch_rpc", "_batch_call", "_multicall"}  # Client internals left out of caller paths
+
+# [request bytes, response bytes] of the request in flight, filled in by the instrumented provider
+_payload: ContextVar[Optional[List[int]]] = ContextVar("rpc_payload", default=None)
+
+
+def error_class(error) -> str:
+    """Short class of a failed request: the exception type, "revert", or the JSON-RPC error code"""
+    if isinstance(error, BaseException):
+        return type(error).__name__
+    if not isinstance(error, dict):
+        return "rpc_error"
+    if "revert" in str(error.get("message", "")).lower():
+        return "revert"
+    return f"rpc_{error['code']}" if "code" in error else "rpc_error"
+
+
+def _bytes(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value or b"")
+
+
+def _raw_transaction_call(raw: bytes) -> Tuple[bytes, bytes]:
+    """(to, calldata) of a signed legacy, EIP-2930 or EIP-1559 transaction"""
+    if raw[0] >= 0xc0:
+        fields = rlp.decode(raw)
+        return fields[3], fields[5]
+    fields = rlp.decode(raw[1:])
+    return (fields[4], fields[6]) if raw[0] == 1 else (fields[5], fields[7])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Series:
+    """Counters and latency histogram of one method or contract function"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = Counter()
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.slow = 0
+
+    def observe(self, seconds: float, request_bytes: int, response_bytes: int, error: Optional[str]):
+        self.count += 1
+        index = 0
+        while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        if error:
+            self.errors[error] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the max for the +Inf bucket)"""
+        rank, seen = q * self.count, 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.latency_max
+
+    def as_dict(self, uptime: float) -> Dict:
+        errors = sum(self.errors.values())
+        return {
+            "count": self.count,
+            "per_second": round(self.count / uptime, 3) if uptime else 0.0,
+            "errors": dict(self.errors),
+            "error_rate": round(errors / self.count, 4) if self.count else 0.0,
+            "slow": self.slow,
+            "latency": {"mean": round(self.latency_sum / self.count, 6) if self.count else 0.0,
+                        "max": round(self.latency_max, 6), "p50": self.quantile(0.5),
+                        "p90": self.quantile(0.9), "p99": self.quantile(0.99)},
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+        }
+
+
+class RPCMetrics:
+    """Process-wide RPC call statistics, fed by the middleware of every instrumented Web3 and by raw batch requests"""
+
+    def __init__(self, slow_seconds: float = 1.0, caller_depth: int = 3):
+        """
+        Args:
+            slow_seconds: Requests slower than this are logged with the code path that made them
+            caller_depth: Repository frames kept in each caller path
+        """
+        self.slow_seconds = slow_seconds
+        self.caller_depth = caller_depth
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.local_code: Dict = {}  # Code object -> whether it belongs to this repository
+        self.labels: Dict[Tuple[str, bytes], str] = {}  # (to, selector) -> "Contract.function"
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self.lock:
+            self.started = time.time()
+            self.methods: Dict[str, Series] = {}
+            self.functions: Dict[str, Series] = {}
+            self.callers = Counter()
+            self.batches = 0
+            self.batched_requests = 0
+            self.slow_calls = deque(maxlen=100)
+
+    # Instrumenting Web3
+
+    def instrument(self, w3) -> "RPCMetrics":
+        """Add the metrics middleware to a Web3 or AsyncWeb3 and count its payload bytes, once per instance"""
+        provider = w3.provider
+        if getattr(provider, "rpc_metrics", None) is self:
+            return self
+        provider.rpc_metrics = self
+        encode, decode = provider.encode_rpc_request, provider.decode_rpc_response
+
+        def encode_rpc_request(method, params) -> bytes:
+            data = encode(method, params)
+            sizes = _payload.get()
+            if sizes is not None:
+                sizes[0] = len(data)
+            return data
+
+        def decode_rpc_response(raw: bytes):
+            sizes = _payload.get()
+            if sizes is not None:
+                sizes[1] = len(raw)
+            return decode(raw)
+
+        provider.encode_rpc_request = encode_rpc_request
+        provider.decode_rpc_response = decode_rpc_response
+        if getattr(provider, "is_async", False):
+            w3.middleware_onion.add(self.async_middleware, "rpc_metrics")
+        else:
+            w3.middleware_onion.add(self.middleware, "rpc_metrics")
+        return self
+
+    def middleware(self, make_request, w3):
+        """web3 middleware: times each request and records it"""
+        def record(method, params):
+            sizes = [0, 0]
+            token = _payload.set(sizes)
+            start = time.perf_counter()
+            try:
+                response = make_request(method, params)
+            except Exception as e:
+                self.observe(method, params, time.perf_counter() - start, sizes, error_class(e))
+                raise
+            finally:
+                _payload.reset(token)
+            self.observe(method, params, time.perf_counter() - start, sizes,
+                         error_class(response["error"]) if "error" in response else None)
+            return response
+        return record
+
+    async def async_middleware(self, make_request, async_w3):
+        """AsyncWeb3 flavour of middleware"""
+        async def record(method, params):
+            sizes = [0, 0]
+            token = _payload.set(sizes)
+            start = time.perf_counter()
+            try:
+                response = await make_request(method, params)
+            except Exception as e:
+                self.observe(method, params, time.perf_counter() - start, sizes, error_class(e))
+                raise
+            finally:
+                _payload.reset(token)
+            self.observe(method, params, time.perf_counter() - start, sizes,
+                         error_class(response["error"]) if "error" in response else None)
+            return response
+        return record
+
+    # Labels
+
+    def function_label(self, method: str, params) -> Optional[str]:
+        """"Contract.function" a request calls, None for requests that call no contract"""
+        try:
+            if method in CONTRACT_METHODS:
+                to, data = params[0].get("to"), _bytes(params[0].get("data") or params[0].get("input"))
+                to = _bytes(to) if to else b""
+            elif method == "eth_sendRawTransaction":
+                to, data = _raw_transaction_call(_bytes(params[0]))
+            else:
+                return None
+        except (IndexError, KeyError, AttributeError, TypeError, ValueError, rlp.DecodingError):
+            return None
+        if not to:
+            return "create"
+        if len(data) < 4:
+            return "transfer"
+        key = (to.hex(), data[:4])
+        label = self.labels.get(key)
+        if label is None:
+            label = self.labels[key] = self._resolve(*key)
+        return label
+
+    def _resolve(self, to: str, selector: bytes) -> str:
+        """Contract name from the registry's contract instances at that address, else any registered ABI with the selector"""
+        names = [name for (_, name, address) in list(REGISTRY.contracts) if address.lower()[2:] == to]
+        names += [name for name in REGISTRY.sources if name not in names]
+        for name in names:
+            signature = REGISTRY.selectors(name).get(selector)
+            if signature:
+                return f"{name}.{signature.split('(')[0]}"
+        return "0x" + selector.hex()
+
+    def caller(self, lines: bool = False) -> str:
+        """Innermost repository frames of the current stack (outside this module), e.g. "web3_client.py:get_player_stats < game_integration.py:chain_state" """
+        frame, sites = sys._getframe(1), []
+        while frame is not None and len(sites) < self.caller_depth:
+            code = frame.f_code
+            local = self.local_code.get(code)
+            if local is None:
+                filename = code.co_filename
+                local = self.local_code[code] = (filename.startswith(REPO_ROOT) and filename != __file__
+                                                 and "site-packages" not in filename)
+            if local and code.co_name not in PLUMBING:
+                site = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                sites.append(f"{site}:{frame.f_lineno}" if lines else site)
+            frame = frame.f_back
+        return " < ".join(sites) or "?"
+
+    # Recording
+
+    def observe(self, method: str, params, seconds: float, sizes: List[int], error: Optional[str] = None,
+                batch: int = 0, caller: Optional[str] = None):
+        """Record one request, `batch` > 0 when it went out inside a batch of that many requests"""
+        function = self.function_label(method, params)
+        caller = caller or self.caller()
+        slow = seconds > self.slow_seconds
+        with self.lock:
+            series = self.methods.get(method) or self.methods.setdefault(method, Series())
+            series.observe(seconds, sizes[0], sizes[1], error)
+            if function:
+                per_function = self.functions.get(function) or self.functions.setdefault(function, Series())
+                per_function.observe(seconds, sizes[0], sizes[1], error)
+            self.callers[caller] += 1
+            if slow:
+                series.slow += 1
+                if function:
+                    per_function.slow += 1
+        if slow and not batch:
+            self._log_slow(method, function, seconds, error)
+
+    def observe_batch(self, requests: List[Tuple[str, List]], seconds: float, request_bytes: int,
+                      response_bytes: int, replies: Optional[List[Dict]] = None, error: Optional[BaseException] = None):
+        """Record a raw JSON-RPC batch: each request waited the whole round trip and gets an even share of the bytes"""
+        if not requests:
+            return
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += len(requests)
+        share = [request_bytes // len(requests), response_bytes // len(requests)]
+        caller = self.caller()
+        for i, (method, params) in enumerate(requests):
+            if error is not None:
+                failure = error_class(error)
+            else:
+                failure = error_class(replies[i]["error"]) if "error" in replies[i] else None
+            self.observe(method, params, seconds, share, failure, batch=len(requests), caller=caller)
+        if seconds > self.slow_seconds:
+            methods = Counter(method for method, _ in requests)
+            self._log_slow(f"batch of {len(requests)} ({', '.join(f'{n}x {m}' for m, n in methods.items())})",
+                           None, seconds, error_class(error) if error is not None else None)
+
+    def _log_slow(self, method: str, function: Optional[str], seconds: float, error: Optional[str]):
+        caller = self.caller(lines=True)
+        entry = {"time": time.time(), "method": method, "function": function, "seconds": round(seconds, 4),
+                 "error": error, "caller": caller}
+        with self.lock:
+            self.slow_calls.append(entry)
+        print(f"Slow RPC call: {method}{' ' + function if function else ''} took {seconds * 1000:.0f} ms"
+              f"{' (' + error + ')' if error else ''} from {caller}")
+
+    # Export
+
+    def snapshot(self, top_callers: int = 20) -> Dict:
+        """Everything recorded, as plain data for JSON"""
+        with self.lock:
+            uptime = time.time() - self.started
+            return {
+                "uptime_seconds": round(uptime, 3),
+                "requests": sum(series.count for series in self.methods.values()),
+                "batches": self.batches,
+                "batched_requests": self.batched_requests,
+                "methods": {name: series.as_dict(uptime) for name, series in sorted(self.methods.items())},
+                "functions": {name: series.as_dict(uptime) for name, series in sorted(self.functions.items())},
+                "callers": [{"caller": caller, "count": count, "per_second": round(count / uptime, 3) if uptime else 0.0}
+                            for caller, count in self.callers.most_common(top_callers)],
+                "slow_calls": list(self.slow_calls),
+            }
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, Dict[str, str], float]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+        def histogram(label: str, table: Dict[str, Series]) -> List:
+            samples = []
+            for name, series in sorted(table.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), series.buckets):
+                    cumulative += count
+                    samples.append(("_bucket", {label: name, "le": bound}, cumulative))
+                samples.append(("_sum", {label: name}, round(series.latency_sum, 6)))
+                samples.append(("_count", {label: name}, series.count))
+            return samples
+
+        with self.lock:
+            for prefix, label, table, what in (("stc_rpc", "method", self.methods, "JSON-RPC requests by method"),
+                                                ("stc_contract", "function", self.functions,
+                                                 "Contract calls and transactions by function")):
+                metric(f"{prefix}_requests_total", "counter", what,
+                       [("", {label: name}, series.count) for name, series in sorted(table.items())])
+                metric(f"{prefix}_errors_total", "counter", f"{what} that failed, by error class",
+                       [("", {label: name, "error": error}, count) for name, series in sorted(table.items())
+                        for error, count in sorted(series.errors.items())])
+                metric(f"{prefix}_slow_total", "counter", f"{what} slower than {self.slow_seconds} s",
+                       [("", {label: name}, series.slow) for name, series in sorted(table.items())])
+                metric(f"{prefix}_latency_seconds", "histogram", f"Round-trip time of {what}", histogram(label, table))
+                metric(f"{prefix}_request_bytes_total", "counter", f"JSON request bytes of {what}",
+                       [("", {label: name}, series.request_bytes) for name, series in sorted(table.items())])
+                metric(f"{prefix}_response_bytes_total", "counter", f"JSON response bytes of {what}",
+                       [("", {label: name}, series.response_bytes) for name, series in sorted(table.items())])
+            metric("stc_rpc_batches_total", "counter", "Raw JSON-RPC batch requests", [("", {}, self.batches)])
+            metric("stc_rpc_batched_requests_total", "counter", "Requests sent inside batches",
+                   [("", {}, self.batched_requests)])
+            metric("stc_rpc_caller_requests_total", "counter", "JSON-RPC requests by calling code path",
+                   [("", {"caller": caller}, count) for caller, count in self.callers.most_common()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write the metrics to a file, JSON for *.json and Prometheus text otherwise (e.g. for node_exporter's textfile collector)"""
+        body = json.dumps(self.snapshot(), indent=2) if path.endswith(".json") else self.prometheus()
+        temp = path + ".tmp"
+        with open(temp, "w") as handle:
+            handle.write(body)
+        os.replace(temp, path)  # Scrapers never read a half-written file
+
+    def serve(self, port: int = 9465, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """GET /metrics (Prometheus text) and /metrics.json from a background thread, started once per process"""
+        if self.server is not None:
+            return self.server
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = 200
+                if self.path == "/metrics":
+                    body, content_type = metrics.prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(metrics.snapshot()).encode(), "application/json"
+                else:
+                    status, body, content_type = 404, b'{"error": "not found"}', "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="rpc-metrics", daemon=True).start()
+        print(f"RPC metrics on http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+
+METRICS = RPCMetrics()
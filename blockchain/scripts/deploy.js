@@ -58,6 +58,14 @@ async function main() {
   await setGameContractTx.wait();
   console.log("✅ Game contract address set in leaderboard");
   
+  // Authorize score relayer wallets (comma separated addresses) for relayer.py
+  const relayers = (process.env.SCORE_RELAYERS || "").split(",").map((address) => address.trim()).filter(Boolean);
+  for (const relayer of relayers) {
+    const setRelayerTx = await leaderboard.setScoreRelayer(relayer, true);
+    await setRelayerTx.wait();
+    console.log("✅ Score relayer authorized:", relayer);
+  }
+  
   // Verify contract deployment
   console.log("");
   console.log("🔍 Verifying deployment...");
@@ -0,0 +1,117 @@
+"""
+On-chain game session lifecycle for Save the Castle
+GameEconomy wants startGameSession() before purchases and endGameSession(finalScore) after the game. GameSessions
+opens the next session in the background, hands it to a new game without waiting, and on game over sends the
+endGameSession and the next startGameSession back to back, so playing again never waits for a block
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict
+
+from web3 import Web3
+
+GAME_SESSION_STARTED_TOPIC = Web3.keccak(text="GameSessionStarted(address,uint256)")
+
+
+class GameSessions:
+    """Keeps one on-chain game session open ahead of play for a wallet client"""
+
+    def __init__(self, client, confirm_timeout: float = 120.0):
+        """
+        Args:
+            client: SaveTheCastleWeb3Client with an account
+            confirm_timeout: Seconds to wait for a startGameSession receipt
+        """
+        self.client = client
+        self.confirm_timeout = confirm_timeout
+        # One worker sends every session transaction, so they always leave in nonce order
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="game-sessions")
+        self.next: Optional[Future] = None  # Session opening for the next game
+        self.current: Optional[Future] = None  # Session of the game being played
+        self.checked = False  # Looked for a session left open by an earlier run
+        self.sent = threading.Event()  # The latest startGameSession has left (or was not needed)
+        self.sent.set()
+        self.stats = {"opened": 0, "adopted": 0, "ended": 0, "failed": 0}
+
+    def _active_game_id(self) -> int:
+        return self.client.game_economy.functions.activeGameId(self.client.account.address).call()
+
+    def _open(self) -> Dict:
+        """Send startGameSession and wait until it is mined (worker thread), the future resolves to the session"""
+        try:
+            return self._start()
+        finally:
+            self.sent.set()
+
+    def _start(self) -> Dict:
+        if not self.checked:
+            self.checked = True
+            game_id = self._active_game_id()
+            if game_id:
+                self.stats["adopted"] += 1
+                return {"game_id": game_id, "start_tx": None}
+
+        tx_hash = self.client.start_game_session()
+        if tx_hash is None:
+            self.stats["failed"] += 1
+            raise RuntimeError("startGameSession could not be sent")
+        self.client.pricing.reset_session()
+        self.sent.set()
+        receipt = self.client.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=self.confirm_timeout)
+        if receipt.status != 1:
+            # Most likely a session is still open (its endGameSession failed): keep playing in that one
+            game_id = self._active_game_id()
+            if not game_id:
+                self.stats["failed"] += 1
+                raise RuntimeError(f"startGameSession reverted: {tx_hash}")
+            self.stats["adopted"] += 1
+            return {"game_id": game_id, "start_tx": tx_hash}
+
+        self.stats["opened"] += 1
+        game_id = next(int.from_bytes(bytes(log["data"])[:32], "big") for log in receipt.logs
+                       if log["topics"] and bytes(log["topics"][0]) == GAME_SESSION_STARTED_TOPIC)
+        return {"game_id": game_id, "start_tx": tx_hash}
+
+    def _end(self, session: Future, final_score: int) -> Optional[str]:
+        """Send endGameSession for a session (worker thread, so its startGameSession has been sent already)"""
+        if session.exception() is not None:
+            return None  # Never opened, nothing to end
+        tx_hash = self.client.end_game_session(final_score)
+        if tx_hash:
+            self.stats["ended"] += 1
+        return tx_hash
+
+    def prepare(self) -> Future:
+        """Start opening a session for the next game if none is open or opening"""
+        if self.current is None and (self.next is None or (self.next.done() and self.next.exception())):
+            self.sent.clear()
+            self.next = self.executor.submit(self._open)
+        return self.current or self.next
+
+    def begin(self) -> Future:
+        """Session for a new game, returned at once: transactions sent after it are mined after it whether or not it is yet"""
+        if self.current is None:
+            self.prepare()
+            self.current, self.next = self.next, None
+        return self.current
+
+    def end(self, final_score: int, play_again: bool = True) -> Future:
+        """Queue endGameSession for the current game, and the next game's startGameSession right behind it"""
+        session, self.current = self.current, None
+        if session is None:
+            ended = Future()
+            ended.set_result(None)
+            return ended
+        ended = self.executor.submit(self._end, session, final_score)
+        if play_again:
+            self.prepare()
+        return ended
+
+    def wait_until_sent(self, timeout: float = 10.0) -> bool:
+        """Block until the session's startGameSession has been sent, so a purchase sent next gets a later nonce"""
+        return self.sent.wait(timeout)
+
+    def close(self):
+        """Stop sending, an open session is picked up again by the next run"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,90 @@
+"""
+Relayer recovery against the in-process mock chain: python -m pytest blockchain/test_relayer.py
+"""
+
+import sys
+import unittest
+
+from eth_account import Account
+from web3 import Web3
+
+from mock_chain import MockChain, MockRPCServer
+import relayer
+from relayer import HARDHAT_KEYS, ScoreRelayer, sign_score_claim
+
+
+class RelayerRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockRPCServer(MockChain(84532, HARDHAT_KEYS))
+        url = self.server.start()
+        argv, sys.argv = sys.argv, ["relayer.py", "authorize", "--rpc", url, "--keys", HARDHAT_KEYS[1]]
+        try:
+            relayer.main()
+        finally:
+            sys.argv = argv
+        self.relayer = ScoreRelayer(HARDHAT_KEYS[1:2], url, batch_size=5, flush_interval=0.1, workers=1, receipt_timeout=1.0)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def claims(self, count):
+        return [sign_score_claim(HARDHAT_KEYS[3], "tester", self.relayer.min_score + i,
+                                 self.relayer.leaderboard_address, self.relayer.chain_id, i) for i in range(count)]
+
+    def relay(self, count):
+        self.relayer.start()
+        for claim in self.claims(count):
+            self.assertTrue(self.relayer.submit(claim))
+        self.relayer.stop(drain=True, timeout=30)
+        metrics = self.relayer.metrics()
+        self.assertEqual(metrics["confirmed"], count)
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertEqual(self.relayer.open_claims, 0)
+        games = self.server.chain.state["leaderboard"]["playerStats"][Account.from_key(HARDHAT_KEYS[3]).address][1]
+        self.assertEqual(games, count)  # Every claim recorded exactly once
+        return metrics
+
+    def drop_first_send(self, replace):
+        """The node accepts the first transaction and forgets it; with `replace` another one takes its nonce"""
+        eth = self.relayer.w3.eth
+        send = eth.send_raw_transaction
+        drops = [1]
+
+        def dropping_send(raw):
+            if drops:
+                drops.pop()
+                if replace:
+                    wallet = Account.from_key(HARDHAT_KEYS[1])
+                    nonce = eth.get_transaction_count(wallet.address, "pending")
+                    send(wallet.sign_transaction({"to": wallet.address, "value": 0, "gas": 21000, "gasPrice": eth.gas_price,
+                                                  "nonce": nonce, "chainId": self.relayer.chain_id}).rawTransaction)
+                return Web3.keccak(raw)
+            return send(raw)
+
+        eth.send_raw_transaction = dropping_send
+
+    def test_failed_send_is_retried(self):
+        eth = self.relayer.w3.eth
+        send = eth.send_raw_transaction
+        failures = [ConnectionError("injected send failure")]
+
+        def flaky_send(raw):
+            if failures:
+                raise failures.pop()
+            return send(raw)
+
+        eth.send_raw_transaction = flaky_send
+        self.assertEqual(self.relay(5)["rejected"], 0)
+        self.assertEqual(failures, [])
+
+    def test_forgotten_transaction_is_rebroadcast(self):
+        self.drop_first_send(replace=False)
+        self.assertEqual(self.relay(10)["dropped"], 0)
+
+    def test_lost_nonce_resends_claims(self):
+        self.drop_first_send(replace=True)
+        self.assertEqual(self.relay(10)["dropped"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,14 +4,366 @@ Handles GameEconomy and Leaderboard contract interactions
 """
 
 import json
+from collections.abc import Sequence
 from decimal import Decimal
 from typing import Optional, Dict, List, Tuple
+from eth_abi import decode
 from web3 import Web3
 from web3.contract import Contract
+from web3._utils.request import make_post_request
 from eth_account import Account
 import os
+import threading
+import time
 from datetime import datetime
 
+from abi_registry import REGISTRY
+from pricing import HEALTH_PER_PURCHASE, HealthPricing
+from block_cache import BlockCache, ACCOUNT_INFO, PLAYER_STATS
+from rpc_metrics import METRICS
+
+# Minimal ABIs for the functions we need, used when the Hardhat artifacts have not been built
+GAME_ECONOMY_ABI = [
+    {
+        "inputs": [{"name": "healthAmount", "type": "uint256"}],
+        "name": "purchaseHealthWithETH",
+        "outputs": [],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "healthAmount", "type": "uint256"}],
+        "name": "purchaseHealthWithUSDC",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "player", "type": "address"}],
+        "name": "getCurrentPricing",
+        "outputs": [{"name": "ethCost", "type": "uint256"}, {"name": "usdcCost", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "", "type": "address"}],
+        "name": "currentGamePurchases",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "baseHealthPriceETH",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "baseHealthPriceUSDC",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "priceIncreasePercentage",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "maxPriceMultiplier",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "startGameSession",
+        "outputs": [{"name": "gameId", "type": "uint256"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "finalScore", "type": "uint256"}],
+        "name": "endGameSession",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "", "type": "address"}],
+        "name": "activeGameId",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "getTotalPurchases",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "index", "type": "uint256"}],
+        "name": "getPurchase",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "player", "type": "address"},
+                    {"name": "amount", "type": "uint256"},
+                    {"name": "costInWei", "type": "uint256"},
+                    {"name": "costInUSDC", "type": "uint256"},
+                    {"name": "timestamp", "type": "uint256"},
+                    {"name": "paymentMethod", "type": "string"}
+                ],
+                "name": "",
+                "type": "tuple"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+LEADERBOARD_ABI = [
+    {
+        "inputs": [{"name": "limit", "type": "uint256"}],
+        "name": "getTopScores",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "player", "type": "address"},
+                    {"name": "playerName", "type": "string"},
+                    {"name": "score", "type": "uint256"},
+                    {"name": "timestamp", "type": "uint256"},
+                    {"name": "isPaidPlayer", "type": "bool"}
+                ],
+                "name": "",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "limit", "type": "uint256"}],
+        "name": "getDailyTopScores",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "player", "type": "address"},
+                    {"name": "playerName", "type": "string"},
+                    {"name": "score", "type": "uint256"},
+                    {"name": "timestamp", "type": "uint256"},
+                    {"name": "isPaidPlayer", "type": "bool"}
+                ],
+                "name": "",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "limit", "type": "uint256"}],
+        "name": "getWeeklyTopScores",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "player", "type": "address"},
+                    {"name": "playerName", "type": "string"},
+                    {"name": "score", "type": "uint256"},
+                    {"name": "timestamp", "type": "uint256"},
+                    {"name": "isPaidPlayer", "type": "bool"}
+                ],
+                "name": "",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "", "type": "uint256"}],
+        "name": "allTimeLeaderboard",
+        "outputs": [
+            {"name": "player", "type": "address"},
+            {"name": "playerName", "type": "string"},
+            {"name": "score", "type": "uint256"},
+            {"name": "timestamp", "type": "uint256"},
+            {"name": "isPaidPlayer", "type": "bool"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "", "type": "uint256"}],
+        "name": "dailyLeaderboard",
+        "outputs": [
+            {"name": "player", "type": "address"},
+            {"name": "playerName", "type": "string"},
+            {"name": "score", "type": "uint256"},
+            {"name": "timestamp", "type": "uint256"},
+            {"name": "isPaidPlayer", "type": "bool"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "", "type": "uint256"}],
+        "name": "weeklyLeaderboard",
+        "outputs": [
+            {"name": "player", "type": "address"},
+            {"name": "playerName", "type": "string"},
+            {"name": "score", "type": "uint256"},
+            {"name": "timestamp", "type": "uint256"},
+            {"name": "isPaidPlayer", "type": "bool"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "_player", "type": "address"}],
+        "name": "playerStats",
+        "outputs": [
+            {"name": "bestScore", "type": "uint256"},
+            {"name": "totalGames", "type": "uint256"},
+            {"name": "totalSpent", "type": "uint256"},
+            {"name": "lastKnownName", "type": "string"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+USDC_ABI = [
+    {
+        "inputs": [
+            {"name": "spender", "type": "address"},
+            {"name": "amount", "type": "uint256"}
+        ],
+        "name": "approve",
+        "outputs": [{"name": "", "type": "bool"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "account", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# Multicall3, deployed at the same address on Base, Base Sepolia and most other chains
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ],
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ],
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+
+REGISTRY.register("GameEconomy", "GameEconomy.sol/SaveTheCastleGameEconomy.json", GAME_ECONOMY_ABI)
+REGISTRY.register("Leaderboard", "Leaderboard.sol/SaveTheCastleLeaderboard.json", LEADERBOARD_ABI)
+REGISTRY.register("USDC", "MockERC20.sol/MockERC20.json", USDC_ABI)
+REGISTRY.register("Multicall3", None, MULTICALL3_ABI)
+
+
+# Leaderboard views by type: (top-N function, public array getter of one row)
+LEADERBOARD_VIEWS = {
+    "all_time": ("getTopScores", "allTimeLeaderboard"),
+    "daily": ("getDailyTopScores", "dailyLeaderboard"),
+    "weekly": ("getWeeklyTopScores", "weeklyLeaderboard"),
+}
+LEADERBOARD_ENTRY_TYPE = "(address,string,uint256,uint256,bool)"
+
+
+class LeaderboardEntry(dict):
+    """Leaderboard row dict whose "timestamp" text is only formatted when it is first read"""
+    
+    def __missing__(self, key):
+        if key != "timestamp":
+            raise KeyError(key)
+        self["timestamp"] = datetime.fromtimestamp(self["unix_time"]).strftime("%Y-%m-%d %H:%M:%S")
+        return self["timestamp"]
+
+
+def format_leaderboard(entries, first_rank: int = 1) -> List[Dict]:
+    """Convert raw leaderboard tuples to readable dicts"""
+    return [LeaderboardEntry(player=Web3.to_checksum_address(entry[0]), name=entry[1], score=entry[2],
+                             unix_time=entry[3], is_paid_player=entry[4], rank=first_rank + i)
+            for i, entry in enumerate(entries)]
+
+
+class LeaderboardPage(Sequence):
+    """Leaderboard rows kept as ABI-encoded bytes, each decoded the first time it is read"""
+    
+    def __init__(self, rows: List[bytes], first_rank: int = 1):
+        self.rows = rows
+        self.first_rank = first_rank
+        self.decoded: List[Optional[Dict]] = [None] * len(rows)
+    
+    @classmethod
+    def from_top_scores(cls, data: bytes, first_rank: int = 1) -> "LeaderboardPage":
+        """Split a getTopScores(limit) reply, a dynamic array of tuples, into its rows without decoding them"""
+        base = int.from_bytes(data[0:32], "big")
+        count = int.from_bytes(data[base:base + 32], "big")
+        heads = base + 32  # Row offsets count from the start of the row heads
+        offsets = [heads + int.from_bytes(data[heads + 32 * i:heads + 32 * (i + 1)], "big") for i in range(count)]
+        return cls([data[start:end] for start, end in zip(offsets, offsets[1:] + [len(data)])], first_rank)
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.rows)))]
+        entry = self.decoded[index]
+        if entry is None:
+            # A row on its own decodes as a one-tuple reply: an offset word, then the row
+            row = decode([LEADERBOARD_ENTRY_TYPE], (32).to_bytes(32, "big") + self.rows[index])[0]
+            entry = self.decoded[index] = format_leaderboard([row], self.first_rank + index % len(self.rows))[0]
+        return entry
+
+
+def format_player_stats(stats) -> Dict:
+    """Convert a raw playerStats tuple to a readable dict"""
+    return {
+        "best_score": stats[0],
+        "total_games": stats[1],
+        "total_spent": stats[2] / 1e6,  # Convert from USDC units
+        "last_known_name": stats[3]
+    }
+
+
 class SaveTheCastleWeb3Client:
     """Web3 client for interacting with Save the Castle smart contracts"""
     
@@ -23,183 +375,106 @@ class SaveTheCastleWeb3Client:
     GAME_ECONOMY_ADDRESS = "0x55cBEa71ad8B981B91B137116B76a4828F90C548"
     LEADERBOARD_ADDRESS = "0x59FF2595588AA2236441B0E82b2CD692e1373E58"
     USDC_ADDRESS = "0x036CbD53842c5426634e7929541eC2318f3dCF7e"  # USDC on Base Sepolia
+    MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
     
-    def __init__(self, private_key: Optional[str] = None, rpc_url: Optional[str] = None):
+    def __init__(self, private_key: Optional[str] = None, rpc_url: Optional[str] = None,
+                 chain_id: Optional[int] = None, addresses: Optional[Dict[str, str]] = None):
         """
         Initialize Web3 client
         
         Args:
             private_key: Player's private key (optional for read-only operations)
             rpc_url: Custom RPC URL (optional, defaults to Base Sepolia)
+            chain_id: Chain ID for signed transactions (optional, defaults to Base Sepolia)
+            addresses: Contract addresses by "game_economy", "leaderboard" and "usdc" (optional, e.g. a local deployment)
         """
         self.rpc_url = rpc_url or self.BASE_SEPOLIA_RPC
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
-        
-        if not self.w3.is_connected():
-            raise ConnectionError(f"Failed to connect to {self.rpc_url}")
+        self.CHAIN_ID = chain_id or self.CHAIN_ID
+        addresses = addresses or {}
+        self.GAME_ECONOMY_ADDRESS = addresses.get("game_economy", self.GAME_ECONOMY_ADDRESS)
+        self.LEADERBOARD_ADDRESS = addresses.get("leaderboard", self.LEADERBOARD_ADDRESS)
+        self.USDC_ADDRESS = addresses.get("usdc", self.USDC_ADDRESS)
+        # Clients on the same endpoint share one connection, checked once per process
+        self.w3 = REGISTRY.connect(self.rpc_url)
+        METRICS.instrument(self.w3)  # Per-method and per-function call statistics, see rpc_metrics.py
         
-        # Set up account if private key provided
+        # Set up account if private key provided. Transactions name their sender explicitly,
+        # so the shared connection's default_account is left alone
         self.account = None
         if private_key:
             self.account = Account.from_key(private_key)
-            self.w3.eth.default_account = self.account.address
+        self._nonce = None  # Next nonce to use, reserved locally once known
+        self._nonce_lock = threading.Lock()
         
         # Load contract ABIs and initialize contracts
         self._load_contracts()
+        self.pricing = HealthPricing(self)
+        self.cache = BlockCache(self)  # Balances and player stats, reused until an event says they changed
     
     def _load_contracts(self):
-        """Load contract ABIs and initialize contract instances"""
-        # Note: In production, you'd load these from files
-        # For now, we'll define minimal ABIs for the functions we need
-        
-        self.game_economy_abi = [
-            {
-                "inputs": [],
-                "name": "purchaseHealthWithETH",
-                "outputs": [],
-                "stateMutability": "payable",
-                "type": "function"
-            },
-            {
-                "inputs": [{"name": "_amount", "type": "uint256"}],
-                "name": "purchaseHealthWithUSDC",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            },
-            {
-                "inputs": [],
-                "name": "getCurrentETHPrice",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [],
-                "name": "getCurrentUSDCPrice",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [
-                    {"name": "_player", "type": "address"},
-                    {"name": "_playerName", "type": "string"},
-                    {"name": "_score", "type": "uint256"},
-                    {"name": "_healthPurchased", "type": "bool"}
-                ],
-                "name": "endGameSession",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            }
-        ]
-        
-        self.leaderboard_abi = [
-            {
-                "inputs": [],
-                "name": "getAllTimeLeaderboard",
-                "outputs": [
-                    {
-                        "components": [
-                            {"name": "player", "type": "address"},
-                            {"name": "playerName", "type": "string"},
-                            {"name": "score", "type": "uint256"},
-                            {"name": "timestamp", "type": "uint256"},
-                            {"name": "isPaidPlayer", "type": "bool"}
-                        ],
-                        "name": "",
-                        "type": "tuple[]"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [],
-                "name": "getDailyLeaderboard",
-                "outputs": [
-                    {
-                        "components": [
-                            {"name": "player", "type": "address"},
-                            {"name": "playerName", "type": "string"},
-                            {"name": "score", "type": "uint256"},
-                            {"name": "timestamp", "type": "uint256"},
-                            {"name": "isPaidPlayer", "type": "bool"}
-                        ],
-                        "name": "",
-                        "type": "tuple[]"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [{"name": "_player", "type": "address"}],
-                "name": "playerStats",
-                "outputs": [
-                    {"name": "bestScore", "type": "uint256"},
-                    {"name": "totalGames", "type": "uint256"},
-                    {"name": "totalSpent", "type": "uint256"},
-                    {"name": "lastKnownName", "type": "string"}
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
-        
-        self.usdc_abi = [
-            {
-                "inputs": [
-                    {"name": "spender", "type": "address"},
-                    {"name": "amount", "type": "uint256"}
-                ],
-                "name": "approve",
-                "outputs": [{"name": "", "type": "bool"}],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            },
-            {
-                "inputs": [{"name": "account", "type": "address"}],
-                "name": "balanceOf",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
-        
-        # Initialize contract instances
-        self.game_economy = self.w3.eth.contract(
-            address=self.GAME_ECONOMY_ADDRESS,
-            abi=self.game_economy_abi
-        )
+        """Look up contract ABIs and instances in the shared registry"""
+        self.game_economy_abi = REGISTRY.abi("GameEconomy")
+        self.leaderboard_abi = REGISTRY.abi("Leaderboard")
+        self.usdc_abi = REGISTRY.abi("USDC")
         
-        self.leaderboard = self.w3.eth.contract(
-            address=self.LEADERBOARD_ADDRESS,
-            abi=self.leaderboard_abi
-        )
-        
-        self.usdc = self.w3.eth.contract(
-            address=self.USDC_ADDRESS,
-            abi=self.usdc_abi
-        )
+        # Built on first use, then reused by every client on this connection
+        self.game_economy = REGISTRY.contract(self.w3, "GameEconomy", self.GAME_ECONOMY_ADDRESS)
+        self.leaderboard = REGISTRY.contract(self.w3, "Leaderboard", self.LEADERBOARD_ADDRESS)
+        self.usdc = REGISTRY.contract(self.w3, "USDC", self.USDC_ADDRESS)
     
     def get_health_prices(self) -> Dict[str, float]:
-        """Get current health purchase prices in ETH and USDC"""
+        """Get the player's current health prices in ETH and USDC, read from the chain at most once per TTL"""
         try:
-            eth_price_wei = self.game_economy.functions.getCurrentETHPrice().call()
-            usdc_price_units = self.game_economy.functions.getCurrentUSDCPrice().call()
-            
-            return {
-                "eth_price": self.w3.from_wei(eth_price_wei, 'ether'),
-                "usdc_price": usdc_price_units / 1e6,  # USDC has 6 decimals
-                "eth_price_wei": eth_price_wei,
-                "usdc_price_units": usdc_price_units
-            }
+            self.pricing.poll_events()  # Rate limited, a PricesUpdated event forces a re-read
+            return self.pricing.current()
         except Exception as e:
             print(f"Error getting health prices: {e}")
             return {"eth_price": 0, "usdc_price": 0, "eth_price_wei": 0, "usdc_price_units": 0}
     
+    def _next_nonce(self) -> int:
+        """Reserve the next nonce for this account, so transactions can be sent back to back without waiting"""
+        with self._nonce_lock:
+            if self._nonce is None:
+                self._nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
+            nonce = self._nonce
+            self._nonce += 1
+            return nonce
+
+    def _release_nonce(self, nonce: int):
+        """A send with this nonce failed, so the nonce may be unused. When nothing was reserved after it, the node
+        is asked again next time; otherwise later transactions are in flight and the pending count is reread now"""
+        with self._nonce_lock:
+            if self._nonce == nonce + 1:
+                self._nonce = None
+                return
+            try:
+                self._nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
+            except Exception:
+                self._nonce = None
+    
+    def _send(self, function, gas: int, value: int = 0) -> str:
+        """Build, sign and send a contract call, returns the transaction hash"""
+        gas_price = self.w3.eth.gas_price  # Before reserving a nonce, a failure here must not leave a gap
+        nonce = self._next_nonce()
+        transaction = {
+            'from': self.account.address,
+            'gas': gas,
+            'gasPrice': gas_price,
+            'nonce': nonce,
+            'chainId': self.CHAIN_ID
+        }
+        if value:
+            transaction['value'] = value
+        try:
+            transaction = function.build_transaction(transaction)
+            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
+            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception:
+            self._release_nonce(nonce)
+            raise
+        self.cache.transaction_sent(self.account.address, nonce)
+        return tx_hash.hex()
+    
     def purchase_health_with_eth(self) -> Optional[str]:
         """Purchase health with ETH"""
         if not self.account:
@@ -213,22 +488,11 @@ class SaveTheCastleWeb3Client:
             if eth_price == 0:
                 raise ValueError("Could not get ETH price")
             
-            # Build transaction
-            transaction = self.game_economy.functions.purchaseHealthWithETH().build_transaction({
-                'from': self.account.address,
-                'value': eth_price,
-                'gas': 200000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'chainId': self.CHAIN_ID
-            })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            tx_hash = self._send(self.game_economy.functions.purchaseHealthWithETH(HEALTH_PER_PURCHASE), 200000, eth_price)
+            self.pricing.record_purchase()
             
-            print(f"Health purchased with ETH! TX: {tx_hash.hex()}")
-            return tx_hash.hex()
+            print(f"Health purchased with ETH! TX: {tx_hash}")
+            return tx_hash
             
         except Exception as e:
             print(f"Error purchasing health with ETH: {e}")
@@ -252,21 +516,11 @@ class SaveTheCastleWeb3Client:
             if balance < usdc_amount:
                 raise ValueError(f"Insufficient USDC balance. Need {usdc_amount/1e6}, have {balance/1e6}")
             
-            # Build transaction
-            transaction = self.game_economy.functions.purchaseHealthWithUSDC(usdc_amount).build_transaction({
-                'from': self.account.address,
-                'gas': 250000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'chainId': self.CHAIN_ID
-            })
+            tx_hash = self._send(self.game_economy.functions.purchaseHealthWithUSDC(HEALTH_PER_PURCHASE), 250000)
+            self.pricing.record_purchase()
             
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            print(f"Health purchased with USDC! TX: {tx_hash.hex()}")
-            return tx_hash.hex()
+            print(f"Health purchased with USDC! TX: {tx_hash}")
+            return tx_hash
             
         except Exception as e:
             print(f"Error purchasing health with USDC: {e}")
@@ -282,77 +536,79 @@ class SaveTheCastleWeb3Client:
             if amount is None:
                 amount = 2**256 - 1  # Max uint256
             
-            # Build transaction
-            transaction = self.usdc.functions.approve(self.GAME_ECONOMY_ADDRESS, amount).build_transaction({
-                'from': self.account.address,
-                'gas': 100000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'chainId': self.CHAIN_ID
-            })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            tx_hash = self._send(self.usdc.functions.approve(self.GAME_ECONOMY_ADDRESS, amount), 100000)
             
-            print(f"USDC approved! TX: {tx_hash.hex()}")
-            return tx_hash.hex()
+            print(f"USDC approved! TX: {tx_hash}")
+            return tx_hash
             
         except Exception as e:
             print(f"Error approving USDC: {e}")
             return None
     
-    def submit_game_score(self, player_name: str, score: int, health_purchased: bool) -> Optional[str]:
-        """Submit game score to leaderboard"""
+    def start_game_session(self) -> Optional[str]:
+        """Open an on-chain game session, required before purchases and endGameSession"""
         if not self.account:
             raise ValueError("Account required for transactions")
         
         try:
-            # Build transaction
-            transaction = self.game_economy.functions.endGameSession(
-                self.account.address,
-                player_name,
-                score,
-                health_purchased
-            ).build_transaction({
-                'from': self.account.address,
-                'gas': 300000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'chainId': self.CHAIN_ID
-            })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            print(f"Score submitted! TX: {tx_hash.hex()}")
-            return tx_hash.hex()
-            
+            tx_hash = self._send(self.game_economy.functions.startGameSession(), 150000)
+            print(f"Game session started! TX: {tx_hash}")
+            return tx_hash
         except Exception as e:
-            print(f"Error submitting score: {e}")
+            print(f"Error starting game session: {e}")
             return None
     
-    def get_leaderboard(self, leaderboard_type: str = "all_time") -> List[Dict]:
-        """Get leaderboard data"""
+    def end_game_session(self, final_score: int) -> Optional[str]:
+        """Close the open game session, recording the final score in GameSessionEnded"""
+        if not self.account:
+            raise ValueError("Account required for transactions")
+        
         try:
-            if leaderboard_type == "daily":
-                entries = self.leaderboard.functions.getDailyLeaderboard().call()
-            else:
-                entries = self.leaderboard.functions.getAllTimeLeaderboard().call()
-            
-            # Convert to readable format
-            leaderboard = []
-            for entry in entries:
-                leaderboard.append({
-                    "player": entry[0],
-                    "name": entry[1],
-                    "score": entry[2],
-                    "timestamp": datetime.fromtimestamp(entry[3]).strftime("%Y-%m-%d %H:%M:%S"),
-                    "is_paid_player": entry[4]
-                })
+            tx_hash = self._send(self.game_economy.functions.endGameSession(final_score), 100000)
+            print(f"Game session ended! TX: {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            print(f"Error ending game session: {e}")
+            return None
+    
+    def submit_game_score(self, player_name: str, score: int, health_purchased: bool) -> Optional[str]:
+        """
+        Submit game score by ending the open game session
+        
+        The leaderboard itself only accepts scores from the game contract or a score relayer
+        (see relayer.py), so player_name and health_purchased are not sent on-chain here
+        """
+        if not self.account:
+            raise ValueError("Account required for transactions")
+        
+        tx_hash = self.end_game_session(score)
+        if tx_hash:
+            print(f"Score submitted! TX: {tx_hash}")
+        return tx_hash
+    
+    def get_leaderboard(self, leaderboard_type: str = "all_time", limit: int = 100, offset: int = 0) -> Sequence[Dict]:
+        """
+        Get a page of leaderboard rows, decoded as they are read
+        
+        Args:
+            leaderboard_type: "all_time", "daily" or "weekly"
+            limit: Most rows to fetch (the contract keeps at most maxLeaderboardSize, 100 by default)
+            offset: Rows to skip from the top, for paging
+        """
+        try:
+            top_scores, row_getter = LEADERBOARD_VIEWS.get(leaderboard_type, LEADERBOARD_VIEWS["all_time"])
+            if offset == 0:
+                data = self.w3.eth.call({"to": self.LEADERBOARD_ADDRESS,
+                                         "data": REGISTRY.codec("Leaderboard", top_scores).encode(limit)})
+                return LeaderboardPage.from_top_scores(bytes(data))
             
-            return leaderboard
+            # Later pages read only their own rows from the public array, in one batch request
+            getter = REGISTRY.codec("Leaderboard", row_getter)
+            rows = self._batch_call([(self.LEADERBOARD_ADDRESS, getter.encode(index))
+                                     for index in range(offset, offset + limit)])
+            if None in rows:
+                rows = rows[:rows.index(None)]  # Past the end of the array
+            return LeaderboardPage(rows, offset + 1)
             
         except Exception as e:
             print(f"Error getting leaderboard: {e}")
@@ -366,31 +622,98 @@ class SaveTheCastleWeb3Client:
         address = player_address or self.account.address
         
         try:
-            stats = self.leaderboard.functions.playerStats(address).call()
-            return {
-                "best_score": stats[0],
-                "total_games": stats[1],
-                "total_spent": stats[2] / 1e6,  # Convert from USDC units
-                "last_known_name": stats[3]
-            }
+            return self.cache.get(PLAYER_STATS, address, lambda: self._read_player_stats(address))
         except Exception as e:
             print(f"Error getting player stats: {e}")
             return {"best_score": 0, "total_games": 0, "total_spent": 0, "last_known_name": ""}
     
+    def _read_player_stats(self, address: str) -> Dict:
+        player_stats = REGISTRY.codec("Leaderboard", "playerStats")
+        reply = self._batch_call([(self.LEADERBOARD_ADDRESS, player_stats.encode(address))])[0]
+        if reply is None:
+            raise ValueError("playerStats call failed")
+        return format_player_stats(player_stats.decode(reply))
+    
+    def _batch_rpc(self, requests: List[Tuple[str, List]]) -> List[Dict]:
+        """Send many JSON-RPC requests in one HTTP request, returns each reply ({"result": ...} or {"error": ...}) in order"""
+        payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+                   for i, (method, params) in enumerate(requests)]
+        data = json.dumps(payload).encode()
+        # Raw batches skip the web3 middleware, so they report to the metrics themselves
+        start = time.perf_counter()
+        try:
+            raw = make_post_request(self.w3.provider.endpoint_uri, data, **dict(self.w3.provider.get_request_kwargs()))
+        except Exception as e:
+            METRICS.observe_batch(requests, time.perf_counter() - start, len(data), 0, error=e)
+            raise
+        replies = json.loads(raw)
+        if not isinstance(replies, list):
+            raise ValueError(f"RPC endpoint does not support batch requests: {replies}")
+        ordered: List[Dict] = [{"error": {"message": "no reply"}}] * len(requests)
+        for reply in replies:
+            ordered[reply["id"]] = reply
+        METRICS.observe_batch(requests, time.perf_counter() - start, len(data), len(raw), ordered)
+        return ordered
+    
+    def _batch_call(self, calls: List[Tuple[str, bytes]]) -> List[Optional[bytes]]:
+        """Send many eth_calls as one JSON-RPC batch request, None for each call that failed"""
+        replies = self._batch_rpc([("eth_call", [{"to": to, "data": "0x" + data.hex()}, "latest"]) for to, data in calls])
+        return [bytes.fromhex(reply["result"][2:]) if reply.get("result") is not None else None for reply in replies]
+    
+    def _multicall(self, calls: List[Tuple[str, bytes]]) -> List[Optional[bytes]]:
+        """Run many calls inside one eth_call through Multicall3.aggregate3, None for each call that reverted"""
+        aggregate3 = REGISTRY.codec("Multicall3", "aggregate3")
+        raw = self.w3.eth.call({"to": self.MULTICALL3_ADDRESS,
+                                "data": aggregate3.encode([(to, True, data) for to, data in calls])})
+        return [bytes(data) if success else None for success, data in aggregate3.decode(raw)[0]]
+    
+    def get_many_player_stats(self, addresses: List[str], method: str = "batch", chunk: int = 100) -> List[Dict]:
+        """
+        Player statistics for many addresses in one round trip per `chunk` addresses
+        
+        Args:
+            addresses: Players to fetch
+            method: "batch" sends a JSON-RPC batch of eth_calls, "multicall" one eth_call through Multicall3
+            chunk: Most addresses per request, public endpoints cap batch sizes
+        """
+        player_stats = REGISTRY.codec("Leaderboard", "playerStats")
+        call = self._multicall if method == "multicall" else self._batch_call
+        results = []
+        for start in range(0, len(addresses), chunk):
+            part = addresses[start:start + chunk]
+            try:
+                replies = call([(self.LEADERBOARD_ADDRESS, player_stats.encode(address)) for address in part])
+            except Exception as e:
+                print(f"Error getting player stats in bulk: {e}")
+                replies = [None] * len(part)
+            for reply in replies:
+                if reply is None:
+                    results.append({"best_score": 0, "total_games": 0, "total_spent": 0, "last_known_name": ""})
+                else:
+                    results.append(format_player_stats(player_stats.decode(reply)))
+        return results
+    
+    def _read_account_info(self) -> Dict:
+        """ETH and USDC balances in one batch request"""
+        address = self.account.address
+        balance_of = REGISTRY.codec("USDC", "balanceOf").encode(address)
+        replies = self._batch_rpc([("eth_getBalance", [address, "latest"]),
+                                   ("eth_call", [{"to": self.USDC_ADDRESS, "data": "0x" + balance_of.hex()}, "latest"])])
+        if any("result" not in reply for reply in replies):
+            raise ValueError(f"Balance read failed: {replies}")
+        return {
+            "address": address,
+            "eth_balance": self.w3.from_wei(int(replies[0]["result"], 16), 'ether'),
+            "usdc_balance": int(replies[1]["result"], 16) / 1e6
+        }
+    
     def get_account_info(self) -> Dict:
         """Get current account information"""
         if not self.account:
             return {"address": None, "eth_balance": 0, "usdc_balance": 0}
         
         try:
-            eth_balance = self.w3.eth.get_balance(self.account.address)
-            usdc_balance = self.usdc.functions.balanceOf(self.account.address).call()
-            
-            return {
-                "address": self.account.address,
-                "eth_balance": self.w3.from_wei(eth_balance, 'ether'),
-                "usdc_balance": usdc_balance / 1e6
-            }
+            return self.cache.get(ACCOUNT_INFO, self.account.address, self._read_account_info)
         except Exception as e:
             print(f"Error getting account info: {e}")
             return {"address": self.account.address, "eth_balance": 0, "usdc_balance": 0}
@@ -24,3 +24,41 @@ Sounds = {'hit': os.path.join(os.getcwd(), 'resources/audio/m_okay.wav'),
 
 
 
+PROFILE = False #Collect frame timings from the first frame; F3 toggles the overlay at any time
+
+PROFILE_WINDOW = 300 #Frames kept for the rolling statistics
+
+PROFILE_EXPORT = '' #Path ending in .csv or .json, written when a game ends
+
+RENDER_SCALE = 1.0 #Internal resolution as a fraction of SCREENSIZE, e.g. 0.5 draws at 512x384
+
+RENDER_SCALE_ADAPTIVE = False #Step the internal resolution down (and back up) to stay within the FPS frame budget
+
+RENDER_SCALE_HARDWARE = False #Let SDL scale a fixed RENDER_SCALE up with pygame.SCALED instead of transform.scale
+
+RENDER_SMOOTH = False #smoothscale instead of scale, softer but slower
+
+QUALITY_GOVERNOR = False #Shed optional work (mask collisions, voices, HUD refresh, arrow rotations) when frames run over budget
+
+AUDIO_CACHE = os.path.join(os.getcwd(), '.cache/audio') #Decoded effect buffers, so beltslap.mp3 is decoded once; '' disables
+
+#Game balance. World and the bot environments start from these; tools/sweep.py varies them
+RULES = {'spawn_interval': 100, #Frames between spawns at the start
+    'interval_step': 2, #The interval shrinks by this much per point of ramp
+    'ramp': 2, #Ramp gained per spawn
+    'ramp_cap': 20,
+    'monster_speed': 7,
+    'bullet_speed': 10,
+    'damage': (4, 8), #Health lost per monster reaching the castle, inclusive range
+    'health': 200,
+    'pierce': 0} #1: an arrow kills every monster it overlaps in a frame (the original Main.py), 0: only the first (lib.World only)
+
+WAVES_FILE = '' #JSON list of wave definitions (see lib/Waves.py) replacing the classic pacing from RULES
+WAVES_SEED = None #Fixed seed for the WAVES_FILE lanes, None draws a new one per run
+
+NET_PORT = 0 #Serve the game to spectators and a second archer on this local TCP port (lib/Net.py), 0 disables
+NET_RATE = 20 #Snapshots per second sent to each client
+
+ARCHIVE_DIR = '' #Record every game of Main_Blockchain.py (inputs, entity counts, frame times) into this lib/Archive.py directory, '' disables
+
+RPC_METRICS_PORT = 0 #Serve blockchain RPC call counts and latencies on http://127.0.0.1:<port>/metrics (and /metrics.json), 0 disables
@@ -0,0 +1,287 @@
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+#Append-only archive of every game played: inputs, per-tick entity counts and frame times as fixed-size records
+#in one memory-mapped file, plus a fixed-size index entry per game, so game n is found by offset and its records
+#are one contiguous slice. Writing needs no NumPy; Archive (the reader) maps the records into NumPy without copying.
+#Files in the archive directory:
+#  records.bin  64-byte header (magic, record size, committed record count), then RECORD_SIZE-byte records
+#  games.bin    GAME_SIZE-byte entries, entry n is game n, written after all of its records
+#  players.txt  one player name per line, games refer to them by line number
+#  setups.jsonl rules, wave file and screen size of the games, one line per distinct setup
+
+MAGIC = b'STCARCH1'
+HEADER = struct.Struct('<8sIIQ') #magic, record size, unused, committed records
+HEADER_SIZE = 64
+
+TICK, SHOT = 0, 1 #Record kinds; a frame's shots come before its tick
+MOVES = (None, 'up', 'down', 'left', 'right') #Same order as lib.Env.MOVES
+PRECISE = 1 #Tick flag: the frame used pixel-mask collisions (the quality governor may switch to rects)
+COMPLETED, WON, ARCHERS = 1, 2, 4 #Game flags: played to the end (not quit), survived, had network archers
+
+#game, frame, kind, move, flags, pad, aim x/y (the shot target for SHOT), player x/y, health, monsters, bullets, kills, frame ms
+RECORD = struct.Struct('<IIBBBxhhhhhHHHf')
+RECORD_FIELDS = [('game', '<u4'), ('frame', '<u4'), ('kind', 'u1'), ('move', 'u1'), ('flags', 'u1'), ('pad', 'u1'),
+                 ('aim_x', '<i2'), ('aim_y', '<i2'), ('player_x', '<i2'), ('player_y', '<i2'), ('health', '<i2'),
+                 ('monsters', '<u2'), ('bullets', '<u2'), ('kills', '<u2'), ('frame_ms', '<f4')]
+RECORD_SIZE = RECORD.size
+
+#game, player, setup, flags, world seed, start time, frames, score, kills, record count, first record
+GAME = struct.Struct('<IIIIQdIIIIQ')
+GAME_FIELDS = [('game', '<u4'), ('player', '<u4'), ('setup', '<u4'), ('flags', '<u4'), ('seed', '<u8'),
+               ('started', '<f8'), ('frames', '<u4'), ('score', '<u4'), ('kills', '<u4'), ('records', '<u4'),
+               ('first_record', '<u8')]
+GAME_SIZE = GAME.size
+
+
+def _short(value):
+    return max(-32768, min(32767, int(value)))
+
+
+def _read_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as handle:
+        return [line.rstrip('\n') for line in handle if line.strip()]
+
+
+class ArchiveWriter(object):
+    #Called from the render thread, which only appends tuples; records are packed and written in batches
+    #by a background thread. A game becomes visible to readers when its index entry is written at end_game
+    def __init__(self, path, batch=512, grow=65536):
+        self.path = path
+        self.batch = batch #Records handed to the writer thread at a time
+        self.grow = grow #Records the file grows by when full
+        os.makedirs(path, exist_ok=True)
+        self.players = _read_lines(os.path.join(path, 'players.txt'))
+        self.player_ids = {name: i for i, name in enumerate(self.players)}
+        self.setups = _read_lines(os.path.join(path, 'setups.jsonl'))
+        self.setup_ids = {setup: i for i, setup in enumerate(self.setups)}
+        self.games = self._recover()
+        self.game = None #Index entry values of the game being recorded
+        self.pending = []
+        self.last_tick = 0.0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='archive-writer', daemon=True)
+        self.thread.start()
+
+    def _recover(self):
+        #Drop anything written after the last complete game, e.g. by a run that crashed mid-game
+        games_path = os.path.join(self.path, 'games.bin')
+        size = os.path.getsize(games_path) if os.path.exists(games_path) else 0
+        games = size//GAME_SIZE
+        self.count = 0
+        if games:
+            with open(games_path, 'rb') as handle:
+                handle.seek((games-1)*GAME_SIZE)
+                last = GAME.unpack(handle.read(GAME_SIZE))
+            self.count = last[10]+last[9]
+        with open(games_path, 'ab') as handle:
+            handle.truncate(games*GAME_SIZE)
+        self.games_file = open(games_path, 'ab')
+
+        records_path = os.path.join(self.path, 'records.bin')
+        self.records_file = open(records_path, 'a+b')
+        self.capacity = max(0, (os.path.getsize(records_path)-HEADER_SIZE)//RECORD_SIZE)
+        if self.capacity < self.count+1:
+            self.capacity = self.count+self.grow
+            self.records_file.truncate(HEADER_SIZE+self.capacity*RECORD_SIZE)
+        self.map = mmap.mmap(self.records_file.fileno(), HEADER_SIZE+self.capacity*RECORD_SIZE)
+        self._commit()
+        return games
+
+    def _commit(self):
+        HEADER.pack_into(self.map, 0, MAGIC, RECORD_SIZE, 0, self.count)
+
+    def _intern(self, value, values, ids, filename):
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+            with open(os.path.join(self.path, filename), 'a') as handle:
+                handle.write(value+'\n')
+        return ids[value]
+
+    # Render thread
+
+    def begin_game(self, world, player, seed, waves_file=''):
+        #Call after world.reset(); seed is what the world's rng was seeded with, so the game can be replayed
+        if self.game is not None:
+            self.end_game(0, completed=False)
+        setup = json.dumps({'rules': world.rules, 'waves_file': waves_file if world.fixed_schedule else '',
+                            'waves_seed': world.schedule.seed if world.fixed_schedule else None,
+                            'screensize': list(world.screensize)}, sort_keys=True)
+        self.game = {'game': self.games, 'player': self._intern(player or 'offline', self.players, self.player_ids, 'players.txt'),
+                     'setup': self._intern(setup, self.setups, self.setup_ids, 'setups.jsonl'),
+                     'flags': 0, 'seed': seed, 'started': time.time(), 'records': 0}
+        self.last_tick = time.perf_counter()
+
+    def shot(self, world, target):
+        if self.game is None:
+            return
+        player = world.player.rect
+        self._append((self.game['game'], world.frame, SHOT, 0, 0, _short(target[0]), _short(target[1]),
+                      player.left, player.top, _short(world.healthvalue), 0, 0, 0, 0.0))
+
+    def tick(self, world, move, aim):
+        #Once per frame after the world was updated and drawn, with the move applied and the aim point drawn
+        if self.game is None:
+            return
+        now = time.perf_counter()
+        player = world.player.rect
+        self._append((self.game['game'], world.frame, TICK, MOVES.index(move), PRECISE if world.precise_collisions else 0,
+                      _short(aim[0]), _short(aim[1]), player.left, player.top, _short(world.healthvalue),
+                      len(world.group_monster), len(world.group_bullet), world.kills & 0xffff, (now-self.last_tick)*1000))
+        self.last_tick = now
+        if world.archers:
+            self.game['flags'] |= ARCHERS
+
+    def _append(self, record):
+        self.pending.append(record)
+        self.game['records'] += 1
+        if len(self.pending) >= self.batch:
+            self.queue.put(self.pending)
+            self.pending = []
+
+    def end_game(self, score, world=None, completed=True, won=False):
+        if self.game is None:
+            return
+        game, self.game = self.game, None
+        game['flags'] |= (COMPLETED if completed else 0) | (WON if won else 0)
+        game['frames'] = world.frame if world else 0
+        game['kills'] = world.kills if world else 0
+        game['score'] = score
+        self.queue.put(self.pending)
+        self.pending = []
+        self.queue.put(game)
+        self.games += 1
+
+    def flush(self):
+        #Blocks until everything handed over so far is on disk
+        if self.pending:
+            self.queue.put(self.pending)
+            self.pending = []
+        self.queue.join()
+
+    def close(self):
+        if self.game is not None:
+            self.end_game(0, completed=False)
+        self.queue.put(None)
+        self.thread.join()
+
+    # Writer thread
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    self._close_files()
+                    return
+                if isinstance(item, dict):
+                    self._write_game(item)
+                elif item:
+                    self._write_records(item)
+            except (OSError, ValueError) as e:
+                print('Archive write failed: %s' % e)
+            finally:
+                self.queue.task_done()
+
+    def _write_records(self, records):
+        if self.count+len(records) > self.capacity:
+            self.capacity = self.count+len(records)+self.grow
+            self.map.close()
+            self.records_file.truncate(HEADER_SIZE+self.capacity*RECORD_SIZE)
+            self.map = mmap.mmap(self.records_file.fileno(), HEADER_SIZE+self.capacity*RECORD_SIZE)
+        offset = HEADER_SIZE+self.count*RECORD_SIZE
+        pack_into = RECORD.pack_into
+        for record in records:
+            pack_into(self.map, offset, *record)
+            offset += RECORD_SIZE
+        self.count += len(records)
+        self._commit()
+
+    def _write_game(self, game):
+        game['first_record'] = self.count-game['records']
+        self.map.flush()
+        self.games_file.write(GAME.pack(*(game[name] for name, _ in GAME_FIELDS)))
+        self.games_file.flush()
+
+    def _close_files(self):
+        self.map.flush()
+        self.map.close()
+        self.records_file.truncate(HEADER_SIZE+self.count*RECORD_SIZE)
+        self.records_file.close()
+        self.games_file.close()
+
+
+class Archive(object):
+    #Read side: the index is a small structured array, records a zero-copy np.memmap of every committed game
+    def __init__(self, path):
+        import numpy as np #Only analysis needs NumPy, the game writes without it
+        self.np = np
+        self.path = path
+        self.record_dtype = np.dtype(RECORD_FIELDS)
+        self.game_dtype = np.dtype(GAME_FIELDS)
+        self.refresh()
+
+    def refresh(self):
+        #Picks up games finished since the archive was opened
+        np = self.np
+        self.players = _read_lines(os.path.join(self.path, 'players.txt'))
+        self.setups = [json.loads(line) for line in _read_lines(os.path.join(self.path, 'setups.jsonl'))]
+        games_path = os.path.join(self.path, 'games.bin')
+        size = os.path.getsize(games_path) if os.path.exists(games_path) else 0
+        self.games = np.fromfile(games_path, dtype=self.game_dtype, count=size//GAME_SIZE) if size else np.zeros(0, self.game_dtype)
+        count = int(self.games['first_record'][-1]+self.games['records'][-1]) if len(self.games) else 0
+        self.records = np.memmap(os.path.join(self.path, 'records.bin'), dtype=self.record_dtype, mode='r',
+                                 offset=HEADER_SIZE, shape=(count,)) if count else np.zeros(0, self.record_dtype)
+
+    def __len__(self):
+        return len(self.games)
+
+    def game(self, game_id):
+        #Index entry and records (a view, nothing is read until used) of one game
+        entry = self.games[game_id]
+        first = int(entry['first_record'])
+        return entry, self.records[first:first+int(entry['records'])]
+
+    def ticks(self, game_id):
+        records = self.game(game_id)[1]
+        return records[records['kind'] == TICK]
+
+    def player(self, game_id):
+        return self.players[self.games[game_id]['player']]
+
+    def setup(self, game_id):
+        return self.setups[self.games[game_id]['setup']]
+
+    def find(self, player=None, since=None, until=None, min_score=None, completed=None):
+        #Ids of the games matching every filter given; since/until are Unix times
+        np = self.np
+        games = self.games
+        start, stop = 0, len(games)
+        #Games are appended in start order, so a date range is two binary searches
+        if since is not None:
+            start = int(np.searchsorted(games['started'], since, 'left'))
+        if until is not None:
+            stop = int(np.searchsorted(games['started'], until, 'right'))
+        selected = games[start:stop]
+        mask = np.ones(len(selected), dtype=bool)
+        if player is not None:
+            mask &= (selected['player'] == self.players.index(player)) if player in self.players else False
+        if min_score is not None:
+            mask &= selected['score'] >= min_score
+        if completed is not None:
+            mask &= ((selected['flags'] & COMPLETED) != 0) == completed
+        return selected['game'][mask]
+
+    def top(self, count=10, player=None):
+        #Best games by score, highest first
+        ids = self.find(player=player)
+        order = self.np.argsort(self.games['score'][ids], kind='stable')[::-1][:count]
+        return ids[order]
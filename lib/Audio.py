@@ -0,0 +1,101 @@
+import hashlib
+import os
+import time
+
+import pygame
+
+
+class SoundManager(object):
+    #Plays effects inside a fixed channel budget: per-effect voice caps, rate limits and priority stealing
+    effects = { #name: (max voices, min seconds between plays, priority)
+        'shoot': (3, 0.04, 1),
+        'enemy': (3, 0.03, 2),
+        'hit': (2, 0.05, 3),
+    }
+    default_effect = (2, 0.05, 1)
+    _decoded = {} #(path, mixer format) -> Sound, shared by every manager in the process
+
+    def __init__(self, sounds, channels=8, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.sounds = {}
+        self.last = {}
+        self.playing = {} #channel index -> (name, priority, start time)
+        self.stats = {'played': 0, 'limited': 0, 'stolen': 0, 'dropped': 0}
+        self.channels = []
+        if not pygame.mixer.get_init():
+            return #No audio device, play() does nothing
+        for name, path in sounds.items():
+            if name != 'backmusic':
+                self.sounds[name] = self.load(path)
+        self.set_voices(channels)
+
+    def load(self, path):
+        #Decode once per process, and once per file/mixer format on disk when cache_dir is set
+        key = (path, pygame.mixer.get_init())
+        sound = SoundManager._decoded.get(key)
+        if sound is not None:
+            return sound
+        cached = None
+        if self.cache_dir:
+            digest = hashlib.sha1(repr((path, os.path.getmtime(path), key[1])).encode()).hexdigest()[:16]
+            cached = os.path.join(self.cache_dir, os.path.basename(path)+'.'+digest+'.pcm')
+        if cached and os.path.exists(cached):
+            with open(cached, 'rb') as handle:
+                sound = pygame.mixer.Sound(buffer=handle.read())
+        else:
+            sound = pygame.mixer.Sound(path)
+            if cached:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(cached, 'wb') as handle:
+                    handle.write(sound.get_raw())
+        SoundManager._decoded[key] = sound
+        return sound
+
+    def set_voices(self, count):
+        if not pygame.mixer.get_init():
+            return
+        pygame.mixer.set_num_channels(count)
+        self.channels = [pygame.mixer.Channel(i) for i in range(count)]
+        for index in list(self.playing):
+            if index >= count:
+                del self.playing[index]
+
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            return None
+        max_voices, interval, priority = self.effects.get(name, self.default_effect)
+        now = time.perf_counter()
+        if now - self.last.get(name, -interval) < interval:
+            self.stats['limited'] += 1
+            return None
+
+        voices = []
+        free = None
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                self.playing.pop(index, None)
+                if free is None:
+                    free = index
+            elif index in self.playing and self.playing[index][0] == name:
+                voices.append(index)
+
+        if len(voices) >= max_voices:
+            #Restart the oldest voice of this effect rather than stack another one
+            free = min(voices, key=lambda index: self.playing[index][2])
+            self.stats['stolen'] += 1
+        elif free is None:
+            #Steal the oldest voice with a lower (or equal) priority, or give up
+            candidates = [index for index, owner in self.playing.items() if owner[1] <= priority]
+            if not candidates:
+                self.stats['dropped'] += 1
+                return None
+            free = min(candidates, key=lambda index: (self.playing[index][1], self.playing[index][2]))
+            self.stats['stolen'] += 1
+
+        channel = self.channels[free]
+        channel.play(sound)
+        self.playing[free] = (name, priority, now)
+        self.last[name] = now
+        self.stats['played'] += 1
+        return channel
@@ -0,0 +1,236 @@
+import random
+
+import numpy as np
+import pygame
+
+import config
+from .World import World
+
+#Not re-exported from lib: NumPy is only needed by the bot/training tools, not by the game.
+#Observation layout shared by both environments (positions scaled to 0..1, -1 marks an empty slot):
+#player x, player y, health/starting health, elapsed fraction, then OBSERVED_MONSTERS (x, y) pairs closest to
+#the castle first, then OBSERVED_BULLETS (x, y) pairs in the same order.
+OBSERVED_MONSTERS = 8
+OBSERVED_BULLETS = 8
+OBSERVATION_SIZE = 4 + 2*OBSERVED_MONSTERS + 2*OBSERVED_BULLETS
+
+#Action: (move, fire, aim_x, aim_y); move indexes MOVES, fire is 0/1, aim is a point in game coordinates
+MOVES = (None, 'up', 'down', 'left', 'right')
+ACTION_SIZE = 4
+
+KILL_REWARD = 1.0
+DAMAGE_PENALTY = 0.1 #Per health point lost
+
+
+def load_images():
+    images = {}
+    for i, j in config.spritepics.items():
+        images[i] = pygame.image.load(j)
+    return images
+
+
+def _slots(points, count):
+    #Nearest-to-the-castle first, padded with -1
+    out = np.full(2*count, -1.0, dtype=np.float32)
+    points = sorted(points)[:count]
+    for i, (x, y) in enumerate(points):
+        out[2*i] = x/config.SCREENSIZE[0]
+        out[2*i+1] = y/config.SCREENSIZE[1]
+    return out
+
+
+class CastleEnv(object):
+    #One game of the real rules (lib.World, pixel-mask collisions) behind reset(seed)/step(action).
+    #Keyword arguments override config.RULES like they do for World, a WaveSchedule fixes the spawns
+    def __init__(self, imagesdict=None, duration=90*config.FPS, schedule=None, **rules):
+        self.imagesdict = imagesdict or load_images()
+        self.schedule = schedule
+        self.rules = dict(config.RULES, **rules)
+        self.duration = duration
+        self.world = None
+
+    def reset(self, seed=None):
+        self.world = World(self.imagesdict, config.SCREENSIZE, rng=random.Random(seed), schedule=self.schedule, **self.rules)
+        return self.observe()
+
+    def step(self, action):
+        move, fire, aim_x, aim_y = action
+        world = self.world
+        health, kills = world.healthvalue, world.kills
+
+        if fire:
+            world.shoot((aim_x, aim_y)) #From where the last frame's aim left the bow, like run_game_loop
+        if MOVES[int(move)]:
+            world.move(MOVES[int(move)])
+        world.update()
+        world.collide()
+        world.player.aim((aim_x, aim_y)) #What drawing the frame does in the game
+
+        reward = KILL_REWARD*(world.kills-kills) - DAMAGE_PENALTY*(health-world.healthvalue)
+        done = world.healthvalue <= 0 or world.frame >= self.duration
+        return self.observe(), reward, done, {'kills': world.kills, 'health': world.healthvalue, 'frame': world.frame}
+
+    def observe(self):
+        world = self.world
+        head = np.array([world.player.rect.left/config.SCREENSIZE[0], world.player.rect.top/config.SCREENSIZE[1],
+                         world.healthvalue/self.rules['health'], world.frame/self.duration], dtype=np.float32)
+        monsters = _slots([enemy.rect.topleft for enemy in world.group_monster], OBSERVED_MONSTERS)
+        bullets = _slots([shot.rect.topleft for shot in world.group_bullet], OBSERVED_BULLETS)
+        return np.concatenate([head, monsters, bullets])
+
+
+def _rotated_size(size, degrees):
+    #Bounding box pygame.transform.rotate gives a size[0] x size[1] image
+    radians = np.radians(degrees)
+    cos, sin = np.abs(np.cos(radians)), np.abs(np.sin(radians))
+    return size[0]*cos + size[1]*sin, size[0]*sin + size[1]*cos
+
+
+class VectorCastleEnv(object):
+    #num_envs independent games stepped in lockstep on NumPy arrays. Same rules as World but
+    #with float positions and rect collisions (World's precise_collisions=False), so scores are
+    #close to, not identical with, CastleEnv. Finished games reset themselves inside step().
+    #A shot is dropped while all max_bullets slots are in flight, a spawn while all max_monsters are.
+    def __init__(self, num_envs, max_monsters=16, max_bullets=32, duration=90*config.FPS, imagesdict=None, **rules):
+        images = imagesdict or load_images()
+        self.man_size = images['man'].get_size()
+        self.arrow_size = images['arrow'].get_size()
+        self.monster_size = images['monster'].get_size()
+        self.num_envs = num_envs
+        self.rules = dict(config.RULES, **rules)
+        self.duration = duration
+        self.rng = np.random.default_rng()
+
+        n, m, b = num_envs, max_monsters, max_bullets
+        self.player = np.zeros((n, 2))
+        self.rotated = np.zeros((n, 2))
+        self.health = np.zeros(n, dtype=np.int64)
+        self.timer = np.zeros(n, dtype=np.int64)
+        self.timeless = np.zeros(n, dtype=np.int64)
+        self.frame = np.zeros(n, dtype=np.int64)
+        self.kills = np.zeros(n, dtype=np.int64)
+        self.monsters = np.zeros((n, m, 2))
+        self.monster_alive = np.zeros((n, m), dtype=bool)
+        self.bullets = np.zeros((n, b, 2))
+        self.bullet_velocity = np.zeros((n, b, 2))
+        self.bullet_size = np.zeros((n, b, 2))
+        self.bullet_alive = np.zeros((n, b), dtype=bool)
+
+    def reset(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self._reset(np.ones(self.num_envs, dtype=bool))
+        return self.observe()
+
+    def _reset(self, mask):
+        self.player[mask] = (50, 50)
+        self.rotated[mask] = (50, 50)
+        self.health[mask] = self.rules['health']
+        self.timer[mask] = self.rules['spawn_interval']
+        self.timeless[mask] = 0
+        self.frame[mask] = 0
+        self.kills[mask] = 0
+        self.bullet_alive[mask] = False
+        self.monster_alive[mask] = False
+        self.monsters[mask, 0] = (640, 100)
+        self.monster_alive[mask, 0] = True
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.float64)
+        move, fire, aim = actions[:, 0].astype(np.int64), actions[:, 1] > 0, actions[:, 2:4]
+        rows = np.arange(self.num_envs)
+        rules = self.rules
+        width, height = config.SCREENSIZE
+        kills_before, health_before = self.kills.copy(), self.health.copy()
+
+        #Shoot from where the archer was turned (Man.aim), then turn towards the new aim point
+        angle = np.arctan2(aim[:, 1]-(self.rotated[:, 1]+32), aim[:, 0]-(self.rotated[:, 0]+26))
+        slot = np.argmin(self.bullet_alive, axis=1)
+        firing = fire & ~self.bullet_alive[rows, slot]
+        shooters, slot = rows[firing], slot[firing]
+        self.bullets[shooters, slot] = self.rotated[firing] + (20, 26)
+        self.bullet_velocity[shooters, slot, 0] = np.cos(angle[firing])*rules['bullet_speed']
+        self.bullet_velocity[shooters, slot, 1] = np.sin(angle[firing])*rules['bullet_speed']
+        self.bullet_size[shooters, slot] = np.stack(_rotated_size(self.arrow_size, 360-angle[firing]*57.29), axis=1)
+        self.bullet_alive[shooters, slot] = True
+
+        aimangle = np.arctan2(aim[:, 1]-(self.player[:, 1]+32), aim[:, 0]-(self.player[:, 0]+10))
+        turned_w, turned_h = _rotated_size(self.man_size, 360-aimangle*70)
+        self.rotated[:, 0] = self.player[:, 0] - turned_w/2
+        self.rotated[:, 1] = self.player[:, 1] - turned_h/2
+
+        self.player[move == 1, 1] = np.maximum(self.player[move == 1, 1]-3, 0)
+        self.player[move == 2, 1] = np.minimum(self.player[move == 2, 1]+3, height)
+        self.player[move == 3, 0] = np.maximum(self.player[move == 3, 0]-3, 0)
+        self.player[move == 4, 0] = np.minimum(self.player[move == 4, 0]+3, width)
+
+        #Bullets
+        self.bullets += self.bullet_velocity
+        bx, by = self.bullets[..., 0], self.bullets[..., 1]
+        bw, bh = self.bullet_size[..., 0], self.bullet_size[..., 1]
+        self.bullet_alive &= ~((bx+bw < 0) | (bx > width) | (by > height) | (by+bh < 0))
+
+        #Spawns
+        due = rows[self.timer == 0]
+        if len(due):
+            free = np.argmin(self.monster_alive[due], axis=1)
+            room = ~self.monster_alive[due, free]
+            spawned, free = due[room], free[room]
+            self.monsters[spawned, free, 0] = 800
+            self.monsters[spawned, free, 1] = self.rng.integers(50, 601, size=len(spawned))
+            self.monster_alive[spawned, free] = True
+            self.timer[due] = rules['spawn_interval'] - self.timeless[due]*rules['interval_step']
+            self.timeless[due] = np.minimum(self.timeless[due]+rules['ramp'], rules['ramp_cap'])
+        self.timer -= 1
+
+        #Monsters walk left and hurt the castle when they reach it
+        self.monsters[..., 0] -= rules['monster_speed']*self.monster_alive
+        arrived = self.monster_alive & (self.monsters[..., 0] < 80)
+        if arrived.any():
+            hurt, _ = np.nonzero(arrived)
+            np.subtract.at(self.health, hurt, self.rng.integers(rules['damage'][0], rules['damage'][1]+1, size=len(hurt)))
+            self.monster_alive &= ~arrived
+
+        #Collisions: each bullet takes the first monster it overlaps, each monster falls to one bullet
+        mw, mh = self.monster_size
+        mx, my = self.monsters[:, None, :, 0], self.monsters[:, None, :, 1]
+        overlap = ((bx[..., None] < mx+mw) & (bx[..., None]+bw[..., None] > mx)
+                   & (by[..., None] < my+mh) & (by[..., None]+bh[..., None] > my)
+                   & self.bullet_alive[..., None] & self.monster_alive[:, None, :])
+        hit = overlap.any(axis=2)
+        if hit.any():
+            env, bullet = np.nonzero(hit)
+            monster = overlap[env, bullet].argmax(axis=1)
+            claim = np.full(self.monster_alive.shape, self.bullets.shape[1])
+            np.minimum.at(claim, (env, monster), bullet)
+            won = claim[env, monster] == bullet
+            env, bullet, monster = env[won], bullet[won], monster[won]
+            self.bullet_alive[env, bullet] = False
+            self.monster_alive[env, monster] = False
+            np.add.at(self.kills, env, 1)
+
+        self.frame += 1
+        reward = KILL_REWARD*(self.kills-kills_before) - DAMAGE_PENALTY*(health_before-self.health)
+        done = (self.health <= 0) | (self.frame >= self.duration)
+        info = {'kills': self.kills.copy(), 'health': self.health.copy(), 'frame': self.frame.copy()}
+        if done.any():
+            self._reset(done)
+        return self.observe(), reward, done, info
+
+    def observe(self):
+        n = self.num_envs
+        obs = np.empty((n, OBSERVATION_SIZE), dtype=np.float32)
+        obs[:, 0] = self.player[:, 0]/config.SCREENSIZE[0]
+        obs[:, 1] = self.player[:, 1]/config.SCREENSIZE[1]
+        obs[:, 2] = self.health/self.rules['health']
+        obs[:, 3] = self.frame/self.duration
+        start = 4
+        for points, alive, count in ((self.monsters, self.monster_alive, OBSERVED_MONSTERS),
+                                     (self.bullets, self.bullet_alive, OBSERVED_BULLETS)):
+            x = np.where(alive, points[..., 0], np.inf)
+            order = np.argsort(x, axis=1)[:, :count]
+            picked = np.take_along_axis(points, order[..., None], axis=1)
+            present = np.take_along_axis(alive, order, axis=1)
+            scaled = picked/np.array(config.SCREENSIZE, dtype=np.float64)
+            obs[:, start:start+2*count] = np.where(present[..., None], scaled, -1.0).reshape(n, 2*count)
+            start += 2*count
+        return obs
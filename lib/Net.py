@@ -0,0 +1,364 @@
+import math
+import selectors
+import socket
+import struct
+import time
+
+import pygame
+
+import config
+from .Sprites import Bullet
+from .World import draw_background
+
+#Local multiplayer/spectating over TCP. The game process is the authority: GameServer reads
+#archer input and streams snapshots, GameClient rebuilds and interpolates them.
+#Every message is a 4 byte length followed by the body.
+#Client -> server: b'S' (spectate) or b'A' (play an archer) once, then archers send INPUT.
+#Server -> client: b'K' keyframe or b'D' delta against the previous snapshot this client got:
+#  HEADER, players x PLAYER, COUNTS, new/changed x FULL, moved x MOVED, gone x GONE
+#Positions are quantized to whole pixels (int16), arrow angles to 256 steps, and a move is
+#sent as an int8 offset when it fits, which covers monsters and arrows at 10+ snapshots/sec.
+LENGTH = struct.Struct('<I')
+HEADER = struct.Struct('<cIhB') #type, frame, health, players
+PLAYER = struct.Struct('<hhhh') #x, y, aim x, aim y
+COUNTS = struct.Struct('<HHH') #full, moved, gone
+FULL = struct.Struct('<IBhhB') #serial, kind, x, y, angle
+MOVED = struct.Struct('<Ibb') #serial, dx, dy
+GONE = struct.Struct('<I')
+INPUT = struct.Struct('<cbBhh') #b'I', move, clicks, aim x, aim y
+
+KINDS = sorted(config.spritepics) #Image names, a kind is an index into this
+MOVES = (None, 'up', 'down', 'left', 'right')
+
+
+def _short(value):
+    return max(-32768, min(32767, int(value)))
+
+
+def capture(world):
+    #serial -> (kind, x, y, angle) of every monster and arrow, quantized
+    entities = {}
+    for enemy in world.group_monster:
+        entities[enemy.serial] = (KINDS.index(enemy.kind), _short(enemy.rect.left), _short(enemy.rect.top), 0)
+    arrow = KINDS.index('arrow')
+    for shot in world.group_bullet:
+        entities[shot.serial] = (arrow, _short(shot.rect.left), _short(shot.rect.top), int(round(shot.angle/(2*math.pi)*256)) & 255)
+    return entities
+
+
+def encode(frame, health, players, entities, base=None):
+    #Keyframe when base is None, otherwise only what changed since base
+    parts = [HEADER.pack(b'K' if base is None else b'D', frame, _short(health), len(players))]
+    for player in players:
+        parts.append(PLAYER.pack(*map(_short, player)))
+    full, moved, gone = [], [], []
+    if base is None:
+        full = [FULL.pack(serial, *record) for serial, record in entities.items()]
+    else:
+        for serial, record in entities.items():
+            before = base.get(serial)
+            if before == record:
+                continue
+            if before is not None and before[0] == record[0] and before[3] == record[3]:
+                dx, dy = record[1]-before[1], record[2]-before[2]
+                if -128 <= dx < 128 and -128 <= dy < 128:
+                    moved.append(MOVED.pack(serial, dx, dy))
+                    continue
+            full.append(FULL.pack(serial, *record))
+        gone = [GONE.pack(serial) for serial in base if serial not in entities]
+    parts.append(COUNTS.pack(len(full), len(moved), len(gone)))
+    body = b''.join(parts + full + moved + gone)
+    return LENGTH.pack(len(body)) + body
+
+
+def decode(body, entities):
+    #Applies one snapshot to entities (a dict, changed in place), returns (frame, health, players)
+    kind, frame, health, count = HEADER.unpack_from(body)
+    offset = HEADER.size
+    players = []
+    for _ in range(count):
+        players.append(PLAYER.unpack_from(body, offset))
+        offset += PLAYER.size
+    full, moved, gone = COUNTS.unpack_from(body, offset)
+    offset += COUNTS.size
+    if kind == b'K':
+        entities.clear()
+    for _ in range(full):
+        serial, *record = FULL.unpack_from(body, offset)
+        entities[serial] = tuple(record)
+        offset += FULL.size
+    for _ in range(moved):
+        serial, dx, dy = MOVED.unpack_from(body, offset)
+        record = entities[serial]
+        entities[serial] = (record[0], record[1]+dx, record[2]+dy, record[3])
+        offset += MOVED.size
+    for _ in range(gone):
+        entities.pop(GONE.unpack_from(body, offset)[0], None)
+        offset += GONE.size
+    return frame, health, players
+
+
+def _messages(inbox, max_size=None):
+    #Complete messages at the front of inbox (a bytearray, consumed); ValueError on a message over max_size bytes
+    messages = []
+    while len(inbox) >= LENGTH.size:
+        size = LENGTH.unpack_from(inbox)[0]
+        if max_size is not None and size > max_size:
+            raise ValueError('message of %d bytes' % size)
+        if len(inbox) < LENGTH.size + size:
+            break
+        messages.append(bytes(inbox[LENGTH.size:LENGTH.size+size]))
+        del inbox[:LENGTH.size+size]
+    return messages
+
+
+class _Peer(object):
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.role = None #'spectator' or 'archer' after the hello
+        self.archer = None
+        self.move = 0
+        self.base = None #Entities of the last snapshot queued for this peer, None until a keyframe
+
+
+class GameServer(object):
+    #Serves one World. Call poll() before world.update() (applies archer input) and broadcast()
+    #after world.collide(). Snapshots go out `rate` times a second. A delta is encoded once per
+    #tick and shared by every peer that got the previous one; a peer whose unsent backlog is over
+    #max_backlog bytes skips ticks and is resynced with a keyframe, so a slow spectator costs
+    #bounded memory and bandwidth. A peer that sends a message over max_message bytes or a malformed
+    #one is dropped, and at most max_clicks shots are taken from one input message.
+    def __init__(self, world, port=None, host='127.0.0.1', rate=20, max_backlog=65536, local=True, fps=config.FPS,
+                 max_message=64, max_clicks=4):
+        self.world = world
+        self.interval = max(1, fps//rate)
+        self.max_backlog = max_backlog
+        self.max_message = max_message
+        self.max_clicks = max_clicks
+        self.local = local #False: nobody plays world.player here, the first remote archer takes it
+        self.selector = selectors.DefaultSelector()
+        self.listener = socket.create_server((host, config.NET_PORT if port is None else port))
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.peers = []
+        self.previous = None #Entities of the last broadcast
+        self.stats = {'snapshots': 0, 'keyframes': 0, 'deltas': 0, 'skipped': 0, 'bytes': 0}
+
+    def poll(self):
+        for key, _ in self.selector.select(0):
+            if key.fileobj is self.listener:
+                sock, _ = self.listener.accept()
+                sock.setblocking(False)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                peer = _Peer(sock)
+                self.peers.append(peer)
+                self.selector.register(sock, selectors.EVENT_READ, peer)
+                continue
+            peer = key.data
+            try:
+                data = peer.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                data = b''
+            if not data:
+                self.drop(peer)
+                continue
+            peer.inbox += data
+            try:
+                for message in _messages(peer.inbox, self.max_message):
+                    self.receive(peer, message)
+            except (ValueError, struct.error):
+                self.drop(peer)
+
+        world = self.world
+        for peer in self.peers:
+            if peer.archer is not None and peer.archer is not world.player and peer.archer not in world.archers:
+                self.claim(peer) #world.reset() made a new player
+            if peer.archer is not None and MOVES[peer.move]:
+                world.move(MOVES[peer.move], peer.archer)
+
+    def receive(self, peer, message):
+        if peer.role is None:
+            peer.role = 'archer' if message[:1] == b'A' else 'spectator'
+            if peer.role == 'archer':
+                self.claim(peer)
+            return
+        if message[:1] == b'I' and peer.archer is not None:
+            _, move, clicks, aim_x, aim_y = INPUT.unpack(message) #struct.error on a wrong length, the peer is dropped
+            peer.move = move if 0 <= move < len(MOVES) else 0
+            peer.archer.aim((aim_x, aim_y))
+            for _ in range(min(clicks, self.max_clicks)):
+                self.world.shoot((aim_x, aim_y), peer.archer)
+
+    def claim(self, peer):
+        #world.player when nobody plays it locally, otherwise an extra archer
+        world = self.world
+        taken = [other.archer for other in self.peers if other is not peer]
+        if not self.local and world.player not in taken:
+            peer.archer = world.player
+        else:
+            peer.archer = world.add_archer()
+
+    def drop(self, peer):
+        self.selector.unregister(peer.sock)
+        peer.sock.close()
+        self.peers.remove(peer)
+        if peer.archer is not None:
+            self.world.remove_archer(peer.archer)
+
+    def players(self):
+        world = self.world
+        return [(man.rect.left, man.rect.top) + tuple(man.aim_point) for man in [world.player] + world.archers]
+
+    def broadcast(self):
+        if self.world.frame % self.interval == 0 and self.peers:
+            self.snapshot()
+        self.flush()
+
+    def snapshot(self):
+        world = self.world
+        entities = capture(world)
+        players = self.players()
+        encoded = {}
+        for peer in self.peers:
+            if peer.role is None:
+                continue
+            if len(peer.outbox) > self.max_backlog:
+                peer.base = None
+                self.stats['skipped'] += 1
+                continue
+            base = peer.base if peer.base is self.previous else None
+            key = 'D' if base is not None else 'K'
+            if key not in encoded:
+                encoded[key] = encode(world.frame, world.healthvalue, players, entities, base)
+                self.stats['deltas' if base is not None else 'keyframes'] += 1
+            peer.outbox += encoded[key]
+            peer.base = entities
+        self.previous = entities
+        self.stats['snapshots'] += 1
+
+    def flush(self):
+        for peer in list(self.peers):
+            if not peer.outbox:
+                continue
+            try:
+                sent = peer.sock.send(peer.outbox)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                self.drop(peer)
+                continue
+            del peer.outbox[:sent]
+            self.stats['bytes'] += sent
+
+    def close(self):
+        for peer in list(self.peers):
+            self.drop(peer)
+        self.selector.unregister(self.listener)
+        self.listener.close()
+        self.selector.close()
+
+
+class GameClient(object):
+    #Spectator or archer. poll() every frame, then view() for what to draw: snapshots are shown
+    #`delay` snapshot intervals late and interpolated, so motion stays smooth between them
+    def __init__(self, host='127.0.0.1', port=None, archer=False, rate=20, delay=2, fps=config.FPS):
+        self.sock = socket.create_connection((host, config.NET_PORT if port is None else port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        self.fps = fps
+        self.delay = delay*max(1, fps//rate) #In frames
+        self.inbox = bytearray()
+        self.entities = {}
+        self.snapshots = [] #(frame, health, players, entities), oldest first, last three kept
+        self.received = None #(frame, perf_counter) of the newest snapshot
+        self.connected = True
+        self.bytes = 0
+        self._health_bar = None
+        self.send(b'A' if archer else b'S')
+
+    def send(self, body):
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(LENGTH.pack(len(body)) + body)
+        except OSError:
+            self.connected = False
+        self.sock.setblocking(False)
+
+    def send_input(self, move, clicks, aim):
+        self.send(INPUT.pack(b'I', move, min(clicks, 255), _short(aim[0]), _short(aim[1])))
+
+    def poll(self):
+        while self.connected:
+            try:
+                data = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                data = b''
+            if not data:
+                self.connected = False
+                break
+            self.bytes += len(data)
+            self.inbox += data
+        for message in _messages(self.inbox):
+            frame, health, players = decode(message, self.entities)
+            self.snapshots.append((frame, health, players, dict(self.entities)))
+            del self.snapshots[:-3]
+            self.received = (frame, time.perf_counter())
+
+    def view(self, now=None):
+        #(health, players, {serial: (kind, x, y, angle)}) at the interpolated frame, None before the first snapshot
+        if not self.snapshots:
+            return None
+        now = time.perf_counter() if now is None else now
+        frame = self.received[0] + (now-self.received[1])*self.fps - self.delay
+        older = newer = self.snapshots[-1]
+        for snapshot in reversed(self.snapshots):
+            older = snapshot
+            if snapshot[0] <= frame:
+                break
+            newer = snapshot
+        if older is newer or newer[0] == older[0]:
+            return older[1], older[2], older[3]
+        t = min(1.0, max(0.0, (frame-older[0])/(newer[0]-older[0])))
+        entities = {}
+        for serial, record in newer[3].items():
+            before = older[3].get(serial)
+            if before is None:
+                entities[serial] = record
+            else:
+                entities[serial] = (record[0], before[1]+(record[1]-before[1])*t, before[2]+(record[2]-before[2])*t, record[3])
+        players = [tuple(a+(b-a)*t for a, b in zip(older[2][i], after)) if i < len(older[2]) else after
+                   for i, after in enumerate(newer[2])]
+        return newer[1], players, entities
+
+    def draw(self, screen, imagesdict, screensize=config.SCREENSIZE):
+        view = self.view()
+        draw_background(screen, imagesdict, screensize)
+        if view is None:
+            return
+        health, players, entities = view
+        for kind, x, y, angle in entities.values():
+            image = imagesdict[KINDS[kind]]
+            if KINDS[kind] == 'arrow':
+                image = Bullet.rotated(image, 360 - angle*2*math.pi/256*57.29)[0]
+            screen.blit(image, (x, y))
+        man = imagesdict['man']
+        for x, y, aim_x, aim_y in players:
+            turned = pygame.transform.rotate(man, 360 - math.atan2(aim_y-(y+32), aim_x-(x+10))*70)
+            screen.blit(turned, (x-turned.get_width()/2, y-turned.get_height()/2))
+        if self._health_bar is None or self._health_bar[0] != health:
+            bar = imagesdict['healthbar'].copy()
+            for i in range(max(0, min(health, 200))):
+                bar.blit(imagesdict['health'], (i, 0))
+            self._health_bar = (health, bar)
+        screen.blit(self._health_bar[1], (400, 10))
+
+    def close(self):
+        self.connected = False
+        self.sock.close()
@@ -0,0 +1,115 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered)-1, int(fraction*len(ordered)))]
+
+
+class FrameProfiler(object):
+    #Splits each frame into named sections: call mark(name) when a section ends
+    def __init__(self, enabled=False, window=300):
+        self.enabled = enabled
+        self.visible = False
+        self.history = deque(maxlen=window) #One {section: ms} dict per frame, 'frame' is the total
+        self._current = {}
+        self._start = self._last = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+        if self.visible:
+            self.enabled = True
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._start = self._last = time.perf_counter()
+        self._current = {}
+
+    def mark(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._current[name] = self._current.get(name, 0.0) + (now-self._last)*1000
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled or not self._start:
+            return
+        self._current['frame'] = (time.perf_counter()-self._start)*1000
+        self.history.append(self._current)
+        self._start = 0.0
+
+    def sections(self):
+        names = []
+        for frame in self.history:
+            for name in frame:
+                if name != 'frame' and name not in names:
+                    names.append(name)
+        return names
+
+    def samples(self, name):
+        return [frame.get(name, 0.0) for frame in self.history]
+
+    def histogram(self, name, bins=10):
+        values = self.samples(name)
+        if not values:
+            return []
+        low, high = min(values), max(values)
+        width = (high-low)/bins or 1.0
+        counts = [0]*bins
+        for value in values:
+            counts[min(bins-1, int((value-low)/width))] += 1
+        return [(low+i*width, counts[i]) for i in range(bins)]
+
+    def summary(self):
+        frames = self.samples('frame')
+        mean = sum(frames)/len(frames) if frames else 0.0
+        sections = {}
+        for name in self.sections():
+            values = self.samples(name)
+            sections[name] = {'mean': sum(values)/len(values), 'p50': percentile(values, 0.5), 'p99': percentile(values, 0.99)}
+        return {'frames': len(frames), 'fps': 1000/mean if mean else 0.0,
+                'p50': percentile(frames, 0.5), 'p99': percentile(frames, 0.99), 'sections': sections}
+
+    def top_sections(self, count=5):
+        sections = self.summary()['sections']
+        return sorted(sections.items(), key=lambda item: item[1]['mean'], reverse=True)[:count]
+
+    def draw(self, screen, font):
+        if not self.visible:
+            return
+        summary = self.summary()
+        lines = ['FPS %.0f  p50 %.1fms  p99 %.1fms' % (summary['fps'], summary['p50'], summary['p99'])]
+        for name, stats in self.top_sections():
+            lines.append('%-14s %5.2fms' % (name, stats['mean']))
+        panel = pygame.Surface((300, 20*len(lines)+10))
+        panel.set_alpha(180)
+        screen.blit(panel, (screen.get_width()-310, 40))
+        for i, line in enumerate(lines):
+            screen.blit(font.render(line, True, (255, 255, 0)), (screen.get_width()-300, 45+20*i))
+
+    def export_csv(self, path):
+        names = ['frame'] + self.sections()
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(names)
+            for frame in self.history:
+                writer.writerow(['%.4f' % frame.get(name, 0.0) for name in names])
+
+    def export_json(self, path):
+        with open(path, 'w') as handle:
+            json.dump({'summary': self.summary(), 'frames': list(self.history)}, handle, indent=2)
+
+    def export(self, path):
+        if path.endswith('.csv'):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
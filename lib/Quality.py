@@ -0,0 +1,79 @@
+import pygame
+
+from .Sprites import Bullet
+
+
+class FrameBudget(object):
+    #Smoothed frame time against the FPS budget; step() returns 1 to shed work, -1 to restore it, else 0
+    def __init__(self, fps, degrade_after=1.0, restore_after=3.0, headroom=0.6):
+        self.budget = 1000.0/fps
+        self.degrade_frames = int(fps*degrade_after)
+        self.restore_frames = int(fps*restore_after)
+        self.headroom = headroom
+        self.average = 0.0
+        self.over = self.under = 0
+
+    def step(self, frame_ms):
+        self.average = self.average*0.9 + frame_ms*0.1
+        if self.average > self.budget:
+            self.over, self.under = self.over+1, 0
+        elif self.average < self.budget*self.headroom:
+            self.over, self.under = 0, self.under+1
+        else:
+            self.over = self.under = 0
+        if self.over >= self.degrade_frames:
+            return 1
+        if self.under >= self.restore_frames:
+            return -1
+        return 0
+
+    def settle(self):
+        #Give the new setting time to show its effect before judging it
+        self.over = self.under = 0
+        self.average = self.budget*0.8
+
+
+class QualityGovernor(object):
+    #Level 0 is full quality, every level above it gives up a little more optional work
+    levels = (
+        {'precise_collisions': True, 'voices': 8, 'hud_interval': 1, 'rotation_step': 1},
+        {'precise_collisions': True, 'voices': 8, 'hud_interval': 2, 'rotation_step': 2},
+        {'precise_collisions': False, 'voices': 6, 'hud_interval': 4, 'rotation_step': 5},
+        {'precise_collisions': False, 'voices': 4, 'hud_interval': 10, 'rotation_step': 10},
+    )
+
+    def __init__(self, fps, world=None, enabled=True, audio=None):
+        self.budget = FrameBudget(fps)
+        self.world = world
+        self.audio = audio
+        self.enabled = enabled
+        self.level = 0
+        self.apply()
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def update(self, frame_ms):
+        if not self.enabled:
+            return
+        level = self.level + self.budget.step(frame_ms)
+        if level != self.level and 0 <= level < len(self.levels):
+            self.set_level(level)
+
+    def set_level(self, level):
+        print(f"Quality level {self.level} -> {level} (frame time {self.budget.average:.1f}ms, budget {self.budget.budget:.1f}ms): {self.levels[level]}")
+        self.level = level
+        self.budget.settle()
+        self.apply()
+
+    def apply(self):
+        settings = self.settings
+        Bullet.rotation_step = settings['rotation_step']
+        if self.world is not None:
+            self.world.precise_collisions = settings['precise_collisions']
+            self.world.hud_interval = settings['hud_interval']
+        if self.audio is not None:
+            self.audio.set_voices(settings['voices'])
+        elif pygame.mixer.get_init():
+            pygame.mixer.set_num_channels(settings['voices'])
@@ -0,0 +1,142 @@
+import time
+from collections import OrderedDict
+
+import pygame
+
+from .Quality import FrameBudget
+
+
+class ScaledCanvas(object):
+    #Takes blits in game coordinates and draws them, scaled down, onto a smaller internal surface
+    def __init__(self, size, scale, smooth=False, cache_size=512):
+        self.size = size
+        self.smooth = smooth
+        self.cache_size = cache_size
+        self._scaled = OrderedDict() #id(surface) -> (surface, scaled copy), least recently used first
+        self.set_scale(scale)
+
+    def set_scale(self, scale):
+        self.scale = scale
+        self.internal = pygame.Surface((max(1, int(self.size[0]*scale)), max(1, int(self.size[1]*scale))))
+        self._scaled.clear()
+
+    def get_size(self):
+        return self.size
+
+    def get_width(self):
+        return self.size[0]
+
+    def get_height(self):
+        return self.size[1]
+
+    def get_rect(self, **kwargs):
+        rect = pygame.Rect((0, 0), self.size)
+        for name, value in kwargs.items():
+            setattr(rect, name, value)
+        return rect
+
+    def fill(self, color, rect=None, special_flags=0):
+        if rect is not None:
+            rect = self._rect(rect)
+        return self.internal.fill(color, rect, special_flags)
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        if self.scale == 1:
+            return self.internal.blit(source, dest, area, special_flags)
+        if area is not None:
+            area = self._rect(area)
+        return self.internal.blit(self._shrink(source), self._point(dest), area, special_flags)
+
+    def blits(self, blit_sequence, doreturn=1):
+        rects = [self.blit(*item) for item in blit_sequence]
+        return rects if doreturn else None
+
+    def _point(self, dest):
+        if isinstance(dest, pygame.Rect):
+            dest = dest.topleft
+        return (int(dest[0]*self.scale), int(dest[1]*self.scale))
+
+    def _rect(self, rect):
+        rect = pygame.Rect(rect)
+        return pygame.Rect(int(rect.x*self.scale), int(rect.y*self.scale),
+                           max(1, int(rect.w*self.scale)), max(1, int(rect.h*self.scale)))
+
+    def _shrink(self, source):
+        cached = self._scaled.get(id(source))
+        if cached is not None and cached[0] is source:
+            self._scaled.move_to_end(id(source))
+            return cached[1]
+        size = (max(1, int(source.get_width()*self.scale)), max(1, int(source.get_height()*self.scale)))
+        if self.smooth and source.get_bitsize() >= 24:
+            scaled = pygame.transform.smoothscale(source, size)
+        else:
+            scaled = pygame.transform.scale(source, size)
+        self._scaled[id(source)] = (source, scaled)
+        if len(self._scaled) > self.cache_size:
+            self._scaled.popitem(last=False)
+        return scaled
+
+
+class RenderTarget(object):
+    #Owns the window; draws either straight to it or through a ScaledCanvas that present() scales up
+    levels = (1.0, 0.75, 0.5)
+
+    def __init__(self, screensize, scale=1.0, adaptive=False, hardware=False, smooth=False, fps=100):
+        self.screensize = screensize
+        self.adaptive = adaptive
+        self.hardware = hardware and not adaptive #pygame.SCALED fixes the logical size when the window opens
+        self.smooth = smooth
+        self.budget = FrameBudget(fps)
+        self.frame_ms = 0.0 #Work time of the last frame, begin_frame() to the end of present()
+        self._start = 0.0
+
+        if self.hardware and scale < 1:
+            #SDL scales the small window surface up on the GPU, mouse positions arrive in its units
+            size = (int(screensize[0]*scale), int(screensize[1]*scale))
+            self.window = pygame.display.set_mode(size, pygame.SCALED)
+            self.canvas = ScaledCanvas(screensize, scale, smooth)
+            self.canvas.internal = self.window
+        else:
+            self.window = pygame.display.set_mode(screensize)
+            self.canvas = ScaledCanvas(screensize, scale, smooth) if adaptive or scale < 1 else None
+        self.surface = self.canvas or self.window
+
+    @property
+    def scale(self):
+        return self.canvas.scale if self.canvas else 1.0
+
+    def mouse_pos(self):
+        pos = pygame.mouse.get_pos()
+        if self.hardware and self.canvas:
+            return (int(pos[0]/self.canvas.scale), int(pos[1]/self.canvas.scale))
+        return pos
+
+    def begin_frame(self):
+        self._start = time.perf_counter()
+
+    def present(self):
+        if self.canvas and not self.hardware:
+            if self.canvas.scale == 1:
+                self.window.blit(self.canvas.internal, (0, 0))
+            elif self.smooth:
+                pygame.transform.smoothscale(self.canvas.internal, self.screensize, self.window)
+            else:
+                pygame.transform.scale(self.canvas.internal, self.screensize, self.window)
+        pygame.display.flip()
+        if self._start: #Only frames that began with begin_frame(), menus present without it
+            self.frame_ms = (time.perf_counter()-self._start)*1000
+            self._start = 0.0
+            if self.adaptive:
+                self.adapt(self.frame_ms)
+
+    def adapt(self, frame_ms):
+        #Drop a level after a second over budget, go back up after three seconds with plenty of headroom
+        level = self.levels.index(self.scale) if self.scale in self.levels else 0
+        level += self.budget.step(frame_ms)
+        if 0 <= level < len(self.levels) and self.levels[level] != self.scale:
+            self.set_scale(self.levels[level])
+
+    def set_scale(self, scale):
+        print(f"Render scale {self.scale:.2f} -> {scale:.2f} (frame time {self.budget.average:.1f}ms, budget {self.budget.budget:.1f}ms)")
+        self.canvas.set_scale(scale)
+        self.budget.settle()
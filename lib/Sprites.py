@@ -5,23 +5,80 @@ import math
 
 
 
-class Man(pygame.sprite.Sprite):
+class SlotSprite(pygame.sprite.Sprite):
+    #pygame.sprite.Sprite keeps its groups in a set per sprite (216 bytes even when empty) and has no __slots__.
+    #Here the groups are a tuple, () or one group for the game's sprites, and subclasses list their attributes
+    #in __slots__, so the __dict__ every Sprite subclass still has stays empty and is never allocated
+    __slots__ = ('_groups',)
+
+    def __init__(self, *groups):
+        self._groups = ()
+        if groups:
+            self.add(*groups)
+
+    def add(self, *groups):
+        for group in groups:
+            if hasattr(group, '_spritegroup'):
+                if group not in self._groups:
+                    group.add_internal(self)
+                    self.add_internal(group)
+            else:
+                self.add(*group)
+
+    def remove(self, *groups):
+        for group in groups:
+            if hasattr(group, '_spritegroup'):
+                if group in self._groups:
+                    group.remove_internal(self)
+                    self.remove_internal(group)
+            else:
+                self.remove(*group)
+
+    def add_internal(self, group):
+        self._groups += (group,)
+
+    def remove_internal(self, group):
+        self._groups = tuple(other for other in self._groups if other is not group)
+
+    def kill(self):
+        for group in self._groups:
+            group.remove_internal(self)
+        self._groups = ()
+
+    def groups(self):
+        return list(self._groups)
+
+    def alive(self):
+        return bool(self._groups)
+
+    def __repr__(self):
+        return '<%s Sprite(in %d groups)>' % (self.__class__.__name__, len(self._groups))
+
+
+class Man(SlotSprite):
+    __slots__ = ('image', 'rect', 'speed', 'rotated_position', 'aim_point')
+
     def __init__(self, image, position, **kwargs): #Kwargs to call all arguments
-        pygame.sprite.Sprite.__init__(self)
+        SlotSprite.__init__(self)
         self.image = image
         self.rect = self.image.get_rect()
         self.rect.left, self.rect.top = position
         self.speed = 3
         self.rotated_position = position
+        self.aim_point = position
 
-    
-
-    def draw(self, screen, mouse_pos):
+    def aim(self, mouse_pos):
+        #Turns towards mouse_pos and returns the rotated image; shots leave from rotated_position
         aimangle = math.atan2(mouse_pos[1]-(self.rect.top+32), mouse_pos[0]-(self.rect.left+10))
         image_rotate = pygame.transform.rotate(self.image, 360-aimangle*70)
         position = (self.rect.left-image_rotate.get_rect().width/2, self.rect.top-image_rotate.get_rect().height/2)
         self.rotated_position = position
-        screen.blit(image_rotate, position)
+        self.aim_point = mouse_pos
+        return image_rotate
+
+    def draw(self, screen, mouse_pos):
+        image_rotate = self.aim(mouse_pos)
+        screen.blit(image_rotate, self.rotated_position)
 
     def move(self, screensize, direction):
         if direction == 'left':#Using pygame library functions define movement for mainplayer
@@ -32,44 +89,123 @@ class Man(pygame.sprite.Sprite):
             self.rect.top = max(self.rect.top-self.speed, 0)
         elif direction == 'down':
             self.rect.top = min(self.rect.top+self.speed, screensize[1])
-        
-        
-        
-    
-   
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, image, position, **kwargs):     
-        pygame.sprite.Sprite.__init__(self)
+
+
+class Bullet(SlotSprite):
+    #Flies in a straight line: the velocity is worked out once per shot (and whenever speed is set), the position
+    #is kept in floats so no subpixel motion is lost, and rect is only its rounded copy for drawing and collisions
+    __slots__ = ('image', 'rect', 'mask', 'angle', 'x', 'y', 'width', 'height', 'vx', 'vy', '_speed',
+                 'pooled', 'serial')
+    rotation_step = 1 #Degrees per cached rotation, coarser steps mean fewer surfaces
+    _rotations = {}
+
+    def __init__(self, image, position, **kwargs):
+        SlotSprite.__init__(self)
+        self._speed = 10
+        self.reset(image, position)
+
+    def reset(self, image, position):
         self.angle = position[0]
-        self.image = pygame.transform.rotate(image, 360 - position[0]*57.29)
+        self.image, self.mask = Bullet.rotated(image, 360 - position[0]*57.29)
         self.rect = self.image.get_rect()
-        self.mask = pygame.mask.from_surface(self.image)
-        self.rect.left, self.rect.top = position[1:]
-        self.speed = 10
-    
+        self.width, self.height = self.rect.size
+        self.x, self.y = position[1:]
+        self.rect.topleft = (self.x, self.y)
+        self.speed = self._speed
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @speed.setter
+    def speed(self, value):
+        self._speed = value
+        self.vx = math.cos(self.angle)*value
+        self.vy = math.sin(self.angle)*value
+
+    @classmethod
+    def rotated(cls, image, degrees):
+        #Rotated arrow and its mask are shared by every bullet fired at the same (rounded) angle
+        step = cls.rotation_step
+        key = (id(image), step, int(round(degrees/step)) % int(round(360/step)))
+        cached = cls._rotations.get(key)
+        if cached is None or cached[0] is not image:
+            surface = pygame.transform.rotate(image, key[2]*step)
+            cached = (image, surface, pygame.mask.from_surface(surface))
+            cls._rotations[key] = cached
+        return cached[1], cached[2]
+
     def update(self, screensize):
-        spd_xdir = math.cos(self.angle)*self.speed
-        spd_ydir = math.sin(self.angle)*self.speed
-        self.rect.left= self.rect.left + spd_xdir
-        self.rect.top = self.rect.top + spd_ydir
-        if self.rect.right < 0 or self.rect.left > screensize[0] or self.rect.top > screensize[1] or self. rect.bottom < 0:
-            return True
-        return False
-        
-class Monster(pygame.sprite.Sprite):
+        x = self.x = self.x + self.vx
+        y = self.y = self.y + self.vy
+        self.rect.topleft = (x, y)
+        return x+self.width < 0 or x > screensize[0] or y > screensize[1] or y+self.height < 0
+
+
+class Monster(SlotSprite):
+    #Walks left at a constant speed, x is kept in a float like Bullet's position
+    __slots__ = ('image', 'rect', 'mask', 'x', 'speed', 'kind', 'pooled', 'serial')
+    _masks = {}
+
     def __init__(self, image, position, **kwargs):
-        pygame.sprite.Sprite.__init__(self)
+        SlotSprite.__init__(self)
+        self.speed = 7
+        self.reset(image, position)
+
+    def reset(self, image, position):
         self.image = image
         self.rect = self.image.get_rect()
-        self.mask = pygame.mask.from_surface(self.image)
+        cached = Monster._masks.get(id(image))
+        if cached is None or cached[0] is not image:
+            cached = (image, pygame.mask.from_surface(image))
+            Monster._masks[id(image)] = cached
+        self.mask = cached[1]
+        self.x = position[0]
         self.rect.left, self.rect.top = position
-        self.speed = 7
-        
+
     def update(self):
-        self.rect.left =self.rect.left - self.speed
-        if self.rect.left < 80:
-            return True
-        return False
+        x = self.x = self.x - self.speed
+        self.rect.left = x
+        return x < 80
+
+
+class SpritePool(object):
+    #Recycles dead sprites instead of allocating a new one per shot/spawn
+    def __init__(self, sprite_class, maxsize=None):
+        self.sprite_class = sprite_class
+        self.maxsize = maxsize
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.in_use = 0
+        self.peak = 0
+
+    def acquire(self, image, position):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(image, position)
+            self.reused += 1
+        else:
+            sprite = self.sprite_class(image, position)
+            self.created += 1
+        sprite.pooled = False
+        self.in_use += 1
+        if self.in_use > self.peak:
+            self.peak = self.in_use
+        return sprite
+
+    def release(self, sprite):
+        if getattr(sprite, 'pooled', True):
+            return #Already released (or never came from a pool)
+        sprite.kill()
+        sprite.pooled = True
+        self.in_use -= 1
+        if self.maxsize is None or len(self.free) < self.maxsize:
+            self.free.append(sprite)
+
+    def stats(self):
+        return {'in_use': self.in_use, 'free': len(self.free), 'peak': self.peak,
+                'created': self.created, 'reused': self.reused}
         
         
         
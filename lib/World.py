@@ -0,0 +1,169 @@
+import math
+import random
+
+import pygame
+
+import config
+from .Sprites import Man, Bullet, Monster, SpritePool
+from .Waves import WaveSchedule, classic_waves
+
+
+def draw_background(screen, imagesdict, screensize):
+    screen.fill(10)
+    grass = imagesdict['grass']
+    for x in range(screensize[0]//grass.get_width()+1):
+        for y in range(screensize[1]//grass.get_height()+1):
+            screen.blit(grass, (x*100, y*100))
+    for i in range(10): screen.blit(imagesdict['castle'], (0, 105*i))
+    for j in range(8): screen.blit(imagesdict['tree'], (920, 105*j))
+
+
+class World(object):
+    #Sprites and rules of one game, without the window, sounds or clock
+    def __init__(self, imagesdict, screensize, rng=random, schedule=None, **rules):
+        self.imagesdict = imagesdict
+        self.screensize = screensize
+        self.rng = rng
+        self.rules = dict(config.RULES, **rules) #Keyword arguments override single balance values
+        self.fixed_schedule = schedule #Replayed by every game, otherwise each game compiles the classic waves
+        self.precise_collisions = True #Pixel masks, rects when frame time is short
+        self.hud_interval = 1 #Frames between HUD (health bar, countdown) redraws
+        self._health_bar = None
+        self.bullet_pool = SpritePool(Bullet)
+        self.monster_pool = SpritePool(Monster)
+        self.group_bullet = pygame.sprite.Group()
+        self.group_monster = pygame.sprite.Group()
+        self.archers = [] #Extra players, e.g. a second archer joining over lib.Net; they stay across games
+        self.reset()
+
+    def reset(self, healthvalue=None):
+        for shot in self.group_bullet.sprites():
+            self.bullet_pool.release(shot)
+        for enemy in self.group_monster.sprites():
+            self.monster_pool.release(enemy)
+        self.player = Man(image=self.imagesdict.get('man'), position=(50, 50))
+        self.serial = 0 #Id of the last sprite spawned or shot, unique within a game
+        self.schedule = self.fixed_schedule or WaveSchedule(classic_waves(self.rules), self.rng.getrandbits(32))
+        self.wave_cursor = 0
+        self.healthvalue = self.rules['health'] if healthvalue is None else healthvalue
+        self.frame = 0
+        self.kills = 0
+        self._health_bar = None
+        self.spawn((640, 100))
+
+    def snapshot(self):
+        #The game state as plain picklable data, restore() carries on from it exactly (network archers aside).
+        #Sprites are listed in group order, which decides which monster a bullet hits first
+        player = self.player
+        return {'frame': self.frame, 'healthvalue': self.healthvalue, 'kills': self.kills, 'serial': self.serial,
+                'wave_cursor': self.wave_cursor, 'schedule_seed': self.schedule.seed, 'rng': self.rng.getstate(),
+                'precise_collisions': self.precise_collisions,
+                'player': (player.rect.left, player.rect.top, player.rotated_position, player.aim_point),
+                'bullets': [(shot.angle, shot.x, shot.y, shot.speed, shot.serial) for shot in self.group_bullet],
+                'monsters': [(enemy.kind, enemy.x, enemy.rect.top, enemy.speed, enemy.serial) for enemy in self.group_monster]}
+
+    def restore(self, state):
+        self.reset(state['healthvalue'])
+        self.monster_pool.release(self.group_monster.sprites()[0]) #The opening monster, the snapshot has its own
+        if not self.fixed_schedule:
+            self.schedule = WaveSchedule(classic_waves(self.rules), state['schedule_seed'])
+        self.rng.setstate(state['rng'])
+        self.frame, self.kills, self.serial = state['frame'], state['kills'], state['serial']
+        self.wave_cursor = state['wave_cursor']
+        self.precise_collisions = state['precise_collisions']
+        left, top, self.player.rotated_position, self.player.aim_point = state['player']
+        self.player.rect.topleft = (left, top)
+        for angle, left, top, speed, serial in state['bullets']:
+            shot = self.bullet_pool.acquire(self.imagesdict.get('arrow'), (angle, left, top))
+            shot.speed, shot.serial = speed, serial
+            self.group_bullet.add(shot)
+        for kind, left, top, speed, serial in state['monsters']:
+            enemy = self.monster_pool.acquire(self.imagesdict.get(kind), (left, top))
+            enemy.speed, enemy.kind, enemy.serial = speed, kind, serial
+            self.group_monster.add(enemy)
+
+    def spawn(self, position, kind='monster', speed=None):
+        enemy = self.monster_pool.acquire(self.imagesdict.get(kind), position)
+        enemy.speed = self.rules['monster_speed'] if speed is None else speed
+        enemy.kind = kind
+        self.serial += 1
+        enemy.serial = self.serial
+        self.group_monster.add(enemy)
+        return enemy
+
+    def add_archer(self, position=(50, 400)):
+        archer = Man(image=self.imagesdict.get('man'), position=position)
+        self.archers.append(archer)
+        return archer
+
+    def remove_archer(self, archer):
+        if archer in self.archers:
+            self.archers.remove(archer)
+
+    def shoot(self, target, archer=None):
+        origin = (archer or self.player).rotated_position
+        shootangle = math.atan2(target[1]-(origin[1]+32), target[0]-(origin[0]+26))
+        shot = self.bullet_pool.acquire(self.imagesdict.get('arrow'), (shootangle, origin[0]+20, origin[1]+26))
+        shot.speed = self.rules['bullet_speed']
+        self.serial += 1
+        shot.serial = self.serial
+        self.group_bullet.add(shot)
+        return shot
+
+    def move(self, direction, archer=None):
+        (archer or self.player).move(self.screensize, direction)
+
+    def update(self):
+        #Moves bullets and monsters and spawns new ones, returns the names of the sounds to play
+        sounds = []
+        for shot in self.group_bullet.sprites():
+            if shot.update(self.screensize):
+                self.bullet_pool.release(shot)
+
+        schedule = self.schedule
+        due = schedule.advance(self.wave_cursor, self.frame)
+        for index in range(self.wave_cursor, due):
+            self.spawn((800, schedule.lanes[index]), schedule.types[schedule.kinds[index]], schedule.speeds[index])
+        self.wave_cursor = due
+
+        for enemy in self.group_monster.sprites():
+            if enemy.update():
+                sounds.append('hit')
+                self.healthvalue -= self.rng.randint(*self.rules['damage'])
+                self.monster_pool.release(enemy)
+        self.frame += 1
+        return sounds
+
+    def collide(self):
+        sounds = []
+        collided = pygame.sprite.collide_mask if self.precise_collisions else pygame.sprite.collide_rect
+        pierce = self.rules['pierce']
+        for shot in self.group_bullet.sprites():
+            for enemy in self.group_monster.sprites():
+                if collided(shot, enemy):
+                    sounds.append('enemy')
+                    self.bullet_pool.release(shot)
+                    self.monster_pool.release(enemy)
+                    self.kills += 1
+                    if not pierce:
+                        break
+        return sounds
+
+    def draw_background(self, screen):
+        draw_background(screen, self.imagesdict, self.screensize)
+
+    def draw(self, screen, mouse_pos):
+        self.group_bullet.draw(screen)
+        self.group_monster.draw(screen)
+        self.player.draw(screen, mouse_pos)
+        for archer in self.archers:
+            archer.draw(screen, archer.aim_point)
+
+    def draw_health(self, screen):
+        #The bar is composed once per change instead of 200 blits a frame
+        if self._health_bar is None or (self._health_bar[0] != self.healthvalue and self.frame % self.hud_interval == 0):
+            bar = self.imagesdict.get('healthbar').copy()
+            for i in range(min(self.healthvalue, 200)):
+                bar.blit(self.imagesdict.get('health'), (i, 0))
+            self._health_bar = (self.healthvalue, bar)
+        screen.blit(self._health_bar[1], (400, 10))
@@ -1 +1,9 @@
-from .Sprites import  Monster, Bullet, Man
+from .Sprites import  Monster, Bullet, Man, SpritePool
+from .Audio import SoundManager
+from .Profiler import FrameProfiler
+from .Quality import FrameBudget, QualityGovernor
+from .Render import RenderTarget, ScaledCanvas
+from .Waves import WaveSchedule, classic_waves, load_waves
+from .World import World
+from .Archive import Archive, ArchiveWriter
+from .Net import GameServer, GameClient
@@ -0,0 +1,4 @@
+"""
+Offline tools for Save the Castle: balance sweeps, a game server and client, and other jobs
+that run the game outside Main.py. Usage (from the repository root): python -m tools.<name> --help
+"""
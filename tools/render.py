@@ -0,0 +1,239 @@
+"""
+Replay renderer: python -m tools.render ARCHIVE GAME (--out frames/ | --video clip.mp4 | --raw -)
+Draws a game recorded by lib/Archive.py headlessly at full resolution with the game's own sprites and assets.
+The game is first simulated without drawing, taking a World.snapshot() at the start of every time segment,
+then the segments are drawn in parallel on a process pool, each picking up from its snapshot
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Must happen before pygame opens a display, pool workers inherit it
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import config
+from lib import Archive, World
+from lib.Archive import ARCHERS, MOVES, PRECISE, SHOT
+from lib.Waves import WaveSchedule, load_waves
+
+IMAGE_FORMATS = ("png", "jpg", "bmp", "tga")
+GAME_MS = 90000  # Length of a game, for the countdown
+
+_images: Dict[str, pygame.Surface] = {}
+_font: Optional[pygame.font.Font] = None
+
+
+def load_assets():
+    """config.spritepics loaded once per process and converted for fast blits (their collision masks are unchanged)"""
+    global _font
+    if not _images:
+        pygame.init()
+        pygame.display.set_mode((1, 1))  # convert() needs a display, the dummy driver provides one
+        for name, path in config.spritepics.items():
+            image = pygame.image.load(path)
+            _images[name] = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+        _font = pygame.font.Font(None, 32)
+    return _images
+
+
+def build_world(setup: Dict, seed: int) -> World:
+    """A World set up like the recorded one, before its first frame"""
+    schedule = WaveSchedule(load_waves(setup["waves_file"]), setup["waves_seed"]) if setup["waves_file"] else None
+    rules = {name: tuple(value) if isinstance(value, list) else value for name, value in setup["rules"].items()}
+    return World(load_assets(), tuple(setup["screensize"]), rng=random.Random(seed), schedule=schedule, **rules)
+
+
+def frame_starts(records: np.ndarray) -> np.ndarray:
+    """Index of the first record of every frame: a frame is its shots followed by its tick"""
+    ticks = np.flatnonzero(records["kind"] != SHOT)
+    return np.concatenate([[0], ticks[:-1] + 1]).astype(np.int64) if len(ticks) else np.zeros(0, np.int64)
+
+
+def step(world: World, frame: np.ndarray):
+    """Play one frame's recorded input, like run_game_loop does, without drawing"""
+    for record in frame[:-1]:
+        world.shoot((int(record["aim_x"]), int(record["aim_y"])))
+    tick = frame[-1]
+    move = MOVES[tick["move"]]
+    if move:
+        world.move(move)
+    world.precise_collisions = bool(tick["flags"] & PRECISE)
+    world.update()
+    world.collide()
+    # Health bought mid-game is not an archived event, the tick (recorded after collide) carries the result
+    world.healthvalue = int(tick["health"])
+
+
+def plan(setup: Dict, seed: int, records: np.ndarray, first: int, last: int, segment: int) -> List[Tuple[int, int, Dict]]:
+    """Simulate frames [0, last) without drawing, returns (first frame, end frame, snapshot) of each segment from `first`"""
+    world = build_world(setup, seed)
+    starts = frame_starts(records)
+    bounds = list(starts) + [len(records)]
+    segments = []
+    for index in range(last):
+        if index >= first and (index - first) % segment == 0:
+            segments.append((index, min(index + segment, last), world.snapshot()))
+        tick = records[bounds[index + 1] - 1]
+        step(world, records[bounds[index]:bounds[index + 1]])
+        world.player.aim((int(tick["aim_x"]), int(tick["aim_y"])))  # What drawing would have done
+    return segments
+
+
+def render_segment(task: Dict) -> Tuple[int, Optional[str]]:
+    """Pool task: draw one segment from its snapshot into image files, an ffmpeg segment or a raw RGB file"""
+    world = build_world(task["setup"], task["seed"])
+    world.restore(task["state"])
+    screen = pygame.Surface(world.screensize)
+    background = pygame.Surface(world.screensize)
+    world.draw_background(background)  # Static, drawn once instead of every frame
+    records, every, out = task["records"], task["every"], task["out"]
+    starts = frame_starts(records)
+    bounds = list(starts) + [len(records)]
+
+    sink, encoder = None, None
+    if task["mode"] == "video":
+        encoder = subprocess.Popen([task["ffmpeg"], "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                                    "-s", f"{world.screensize[0]}x{world.screensize[1]}", "-r", str(task["fps"]),
+                                    "-i", "-", "-c:v", "libx264", "-pix_fmt", "yuv420p", out], stdin=subprocess.PIPE)
+        sink = encoder.stdin
+    elif task["mode"] == "raw":
+        sink = open(out, "wb")
+
+    drawn = 0
+    try:
+        for index in range(len(starts)):
+            frame = records[bounds[index]:bounds[index + 1]]
+            tick = frame[-1]
+            aim = (int(tick["aim_x"]), int(tick["aim_y"]))
+            screen.blit(background, (0, 0))
+            remaining = max(0, GAME_MS - world.frame * 1000 // config.FPS)
+            countdown = _font.render(f"{remaining // 60000}:{(remaining // 1000 % 60):02d}", True, (0, 0, 0))
+            screen.blit(countdown, countdown.get_rect(topright=(700, 5)))
+            step(world, frame)
+            world.draw(screen, aim)
+            world.draw_health(screen)
+            if (task["first_frame"] + index) % every:
+                continue
+            if sink is None:
+                pygame.image.save(screen, out % (task["first_output"] + drawn))
+            else:
+                sink.write(pygame.image.tobytes(screen, "RGB"))
+            drawn += 1
+    finally:
+        if sink is not None:
+            sink.close()
+        if encoder is not None and encoder.wait():
+            raise RuntimeError(f"ffmpeg failed on {out}")
+    return drawn, out if task["mode"] != "images" else None
+
+
+def render(archive_path: str, game: int, mode: str, out: str, image_format: str = "png", start: float = 0.0,
+           end: Optional[float] = None, every: int = 1, segment_seconds: float = 5.0, workers: Optional[int] = None) -> Dict:
+    """Render frames [start, end) seconds of an archived game, returns frame and timing counts"""
+    archive = Archive(archive_path)
+    entry, records = archive.game(game)
+    if entry["flags"] & ARCHERS:
+        print(f"Game {game} had network archers, whose input is not archived: the replay will differ")
+    setup, seed = archive.setup(game), int(entry["seed"])
+    records = np.array(records)  # One copy out of the map, segments are pickled to the workers
+    frames = len(frame_starts(records))
+    first = min(frames, int(start * config.FPS))
+    last = frames if end is None else min(frames, int(end * config.FPS))
+    segment = max(1, int(segment_seconds * config.FPS))
+    fps = config.FPS / every
+
+    began = time.perf_counter()
+    segments = plan(setup, seed, records, first, last, segment)
+    planned = time.perf_counter()
+
+    ffmpeg = shutil.which("ffmpeg") if mode == "video" else None
+    if mode == "video" and not ffmpeg:
+        raise RuntimeError("--video needs ffmpeg on PATH, or use --raw - | ffmpeg ...")
+    temp = tempfile.mkdtemp(prefix="render-") if mode != "images" else None
+    if mode == "images":
+        os.makedirs(out, exist_ok=True)
+
+    starts = list(frame_starts(records)) + [len(records)]
+    tasks = []
+    for first_frame, end_frame, state in segments:
+        # Output numbering continues across segments, counting only the frames kept by `every`
+        first_output = (first_frame - first + every - 1) // every
+        path = (os.path.join(out, f"frame_%06d.{image_format}") if mode == "images" else
+                os.path.join(temp, f"segment_{len(tasks):05d}." + ("mp4" if mode == "video" else "rgb")))
+        tasks.append({"setup": setup, "seed": seed, "state": state, "records": records[starts[first_frame]:starts[end_frame]],
+                      "first_frame": first_frame - first, "first_output": first_output, "every": every, "mode": mode,
+                      "out": path, "fps": fps, "ffmpeg": ffmpeg})
+
+    drawn = 0
+    try:
+        with ProcessPoolExecutor(workers, initializer=load_assets) as pool:
+            if mode == "raw":
+                # Segments come back in order, each is streamed out as soon as it and those before it are done
+                stream = sys.stdout.buffer if out == "-" else open(out, "wb")
+                try:
+                    for count, path in pool.map(render_segment, tasks):
+                        with open(path, "rb") as handle:
+                            shutil.copyfileobj(handle, stream, 1 << 20)
+                        os.remove(path)
+                        drawn += count
+                finally:
+                    if stream is not sys.stdout.buffer:
+                        stream.close()
+            else:
+                results = list(pool.map(render_segment, tasks))
+                drawn = sum(count for count, _ in results)
+                if mode == "video":
+                    listing = os.path.join(temp, "segments.txt")
+                    with open(listing, "w") as handle:
+                        handle.writelines(f"file '{path}'\n" for _, path in results)
+                    subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", listing,
+                                    "-c", "copy", out], check=True)
+    finally:
+        if temp:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    elapsed = time.perf_counter() - began
+    return {"frames": drawn, "segments": len(segments), "fps": fps, "seconds": elapsed,
+            "plan_seconds": planned - began, "game_seconds": (last - first) / config.FPS,
+            "realtime": (last - first) / config.FPS / elapsed if elapsed else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.render", description="Render an archived game to images or video")
+    parser.add_argument("archive", help="Archive directory (config.ARCHIVE_DIR)")
+    parser.add_argument("game", type=int, help="Game id, see lib.Archive.find/top")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--out", help="Directory for an image sequence frame_000000.<format>")
+    output.add_argument("--video", help="Video file, encoded by one ffmpeg per segment and joined without re-encoding")
+    output.add_argument("--raw", help="Raw rgb24 frames to this file, '-' for stdout (pipe into ffmpeg -f rawvideo)")
+    parser.add_argument("--format", choices=IMAGE_FORMATS, default="png", help="Image format for --out, bmp and tga skip compression and save far faster")
+    parser.add_argument("--start", type=float, default=0.0, help="First second of the game to render")
+    parser.add_argument("--end", type=float, default=None, help="Stop at this second (default: the end of the game)")
+    parser.add_argument("--every", type=int, default=1, help=f"Keep every n-th frame, 2 turns the game's {config.FPS} fps into {config.FPS // 2}")
+    parser.add_argument("--segment-seconds", type=float, default=5.0, help="Game time per pool task")
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    mode, out = (("images", args.out) if args.out else ("video", args.video) if args.video else ("raw", args.raw))
+    stats = render(args.archive, args.game, mode, out, args.format, args.start, args.end, max(1, args.every),
+                   args.segment_seconds, args.workers)
+    print(f"{stats['frames']} frames ({stats['game_seconds']:.1f}s of play at {stats['fps']:g} fps) in {stats['seconds']:.1f}s"
+          f" over {stats['segments']} segments, {stats['realtime']:.1f}x real time (planning {stats['plan_seconds']:.1f}s)",
+          file=sys.stderr if out == "-" else sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
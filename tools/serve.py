@@ -0,0 +1,65 @@
+"""
+Headless game server: python -m tools.serve [--port 7777] [--rate 20]
+Runs the authoritative game loop at config.FPS for spectators and remote archers
+(python -m tools.watch); the first archer to join plays the main archer
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Must happen before pygame opens a display or the mixer, no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import config
+from lib import World
+from lib.Env import load_images
+from lib.Net import GameServer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.serve", description="Serve a Save the Castle game over local TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=config.NET_PORT or 7777)
+    parser.add_argument("--rate", type=int, default=config.NET_RATE, help="Snapshots per second")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--games", type=int, default=0, help="Stop after this many games (default: run until interrupted)")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    world = World(load_images(), config.SCREENSIZE, rng=random.Random(args.seed))
+    server = GameServer(world, args.port, args.host, args.rate, local=False)
+    print(f"Serving on {server.address[0]}:{server.address[1]}, {args.rate} snapshots/s")
+
+    games = 0
+    frame_time = 1.0 / config.FPS
+    next_frame = time.perf_counter()
+    try:
+        while True:
+            server.poll()
+            world.update()
+            world.collide()
+            server.broadcast()
+            if world.healthvalue <= 0 or world.frame >= 90 * config.FPS:
+                games += 1
+                print(f"Game {games}: {'lost' if world.healthvalue <= 0 else 'won'} at {world.frame / config.FPS:.1f}s, "
+                      f"{world.kills} kills, {len(server.peers)} clients, {server.stats['bytes'] // 1024}KB sent")
+                if args.games and games >= args.games:
+                    break
+                world.reset()
+            next_frame += frame_time
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
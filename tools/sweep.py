@@ -0,0 +1,223 @@
+"""
+Difficulty sweep: python -m tools.sweep --set monster_speed=5,7,9 --set damage=4-8,6-10 --games 2000
+Plays many headless games for every combination of balance values (config.RULES) across a process
+pool, writes one row per game (Parquet when pyarrow is installed, CSV otherwise) and prints the
+survival time and score distribution of each combination
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+import config
+
+# Must happen before pygame opens a display or the mixer, pool workers inherit it
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BATCH = 512  # Games per pool task, one VectorCastleEnv of this size
+SCORE_MS = 100  # Main_Blockchain scores one point per 100ms survived
+
+
+def parse_values(name: str, text: str) -> List:
+    """'5,7,9' -> [5, 7, 9]; ranges such as damage take 'lo-hi' pairs: '4-8,6-10' -> [(4, 8), (6, 10)]"""
+    if name not in config.RULES:
+        raise ValueError(f"unknown rule {name!r}, expected one of {', '.join(sorted(config.RULES))}")
+    values = []
+    for item in text.split(","):
+        if isinstance(config.RULES[name], tuple):
+            low, high = item.split("-")
+            values.append((int(low), int(high)))
+        else:
+            values.append(int(item))
+    return values
+
+
+def grid(spec: Dict[str, List]) -> List[Dict]:
+    """Every combination of the swept values, each a full rules dict"""
+    names = sorted(spec)
+    return [dict(config.RULES, **dict(zip(names, values))) for values in itertools.product(*(spec[name] for name in names))]
+
+
+def idle_policy(obs, rng):
+    """Never moves or shoots: how long the castle holds out on its own"""
+    return np.zeros((len(obs), 4))
+
+
+def random_policy(obs, rng):
+    """Random moves, shoots one frame in ten anywhere in the right half of the field"""
+    count = len(obs)
+    return np.stack([rng.integers(0, 5, size=count), rng.random(count) < 0.1,
+                     rng.uniform(500, 1000, size=count), rng.uniform(0, 700, size=count)], axis=1)
+
+
+def scripted_policy(obs, rng):
+    """Stands still and shoots one frame in ten at the monster closest to the castle"""
+    count = len(obs)
+    present = obs[:, 4] >= 0
+    aim_x = np.where(present, obs[:, 4] * config.SCREENSIZE[0], 800) + 20
+    aim_y = np.where(present, obs[:, 5] * config.SCREENSIZE[1], 300) + 20
+    return np.stack([np.zeros(count), present & (rng.random(count) < 0.1), aim_x, aim_y], axis=1)
+
+
+POLICIES = {"idle": idle_policy, "random": random_policy, "scripted": scripted_policy}
+
+
+def play_batch(task) -> Dict[str, np.ndarray]:
+    """Pool worker: play `games` games of one rules dict, returns per-game frames, kills and health"""
+    rules, games, policy, seed, duration, exact = task
+    # Imported here so the parent process never needs pygame or the images
+    from lib.Env import CastleEnv, VectorCastleEnv
+    policy = POLICIES[policy]
+    rng = np.random.default_rng(seed)
+    frames, kills, health = np.zeros(games, dtype=np.int64), np.zeros(games, dtype=np.int64), np.zeros(games, dtype=np.int64)
+
+    if exact:
+        # The real World rules (pixel masks, integer rects), one game at a time
+        env = CastleEnv(duration=duration, **rules)
+        for game in range(games):
+            obs, done = env.reset(seed + game), False
+            while not done:
+                obs, _, done, info = env.step(policy(obs[None], rng)[0])
+            frames[game], kills[game], health[game] = info["frame"], info["kills"], info["health"]
+    else:
+        env = VectorCastleEnv(games, duration=duration, **rules)
+        obs = env.reset(seed)
+        finished = np.zeros(games, dtype=bool)
+        while not finished.all():
+            obs, _, done, info = env.step(policy(obs, rng))
+            first = done & ~finished  # Finished games restart inside step(), keep their first result only
+            frames[first], kills[first], health[first] = info["frame"][first], info["kills"][first], info["health"][first]
+            finished |= done
+    return {"frames": frames, "kills": kills, "health": health}
+
+
+def rows_for(point: int, rules: Dict, result: Dict[str, np.ndarray], first_game: int, policy: str) -> List[Dict]:
+    """Flatten one batch into table rows, ranges such as damage become _min/_max columns"""
+    columns = {"point": point, "policy": policy}
+    for name, value in rules.items():
+        if isinstance(value, tuple):
+            columns[name + "_min"], columns[name + "_max"] = value
+        else:
+            columns[name] = value
+    rows = []
+    for i, (frames, kills, health) in enumerate(zip(result["frames"], result["kills"], result["health"])):
+        rows.append(dict(columns, game=first_game + i, frames=int(frames), seconds=frames / config.FPS,
+                         score=int(frames * 1000 // config.FPS // SCORE_MS), kills=int(kills),
+                         health=int(health), survived=bool(health > 0)))
+    return rows
+
+
+def summarize(rows: List[Dict]) -> Dict:
+    """Survival and score distribution of one combination"""
+    seconds = np.array([row["seconds"] for row in rows])
+    score = np.array([row["score"] for row in rows])
+    kills = np.array([row["kills"] for row in rows])
+    return {
+        "games": len(rows),
+        "survived": float(np.mean([row["survived"] for row in rows])),
+        "seconds_p10": float(np.percentile(seconds, 10)),
+        "seconds_p50": float(np.percentile(seconds, 50)),
+        "seconds_p90": float(np.percentile(seconds, 90)),
+        "score_mean": float(score.mean()),
+        "score_p50": float(np.percentile(score, 50)),
+        "kills_mean": float(kills.mean()),
+    }
+
+
+def write_rows(path: str, rows: List[Dict]) -> str:
+    """Parquet when the path asks for it and pyarrow is installed, CSV otherwise; returns the path written"""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            path = path[:-len(".parquet")] + ".csv"
+            print(f"pyarrow is not installed, writing {path} instead")
+        else:
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), path)
+            return path
+    with open(path, "w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def sweep(spec: Dict[str, List], games: int, policy: str = "scripted", seed: int = 0,
+          duration: int = 90 * config.FPS, workers: int = None, exact: bool = False) -> List[Dict]:
+    """Play `games` games per combination, split into BATCH sized tasks across a process pool"""
+    if games < 1:
+        raise ValueError("games must be at least 1")
+    if "pierce" in spec and not exact:
+        # VectorCastleEnv always stops an arrow at its first monster
+        raise ValueError("pierce is only played by --exact games")
+    points = grid(spec)
+    tasks, where = [], []
+    for point, rules in enumerate(points):
+        for first in range(0, games, BATCH):
+            count = min(BATCH, games - first)
+            tasks.append((rules, count, policy, seed + point * 1000003 + first, duration, exact))
+            where.append((point, first))
+
+    rows = []
+    with ProcessPoolExecutor(workers) as pool:
+        for (point, first), result in zip(where, pool.map(play_batch, tasks)):
+            rows.extend(rows_for(point, points[point], result, first, policy))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.sweep", description="Balance sweep over config.RULES")
+    parser.add_argument("--set", action="append", default=[], metavar="RULE=V1,V2",
+                        help=f"Values to sweep for one rule, repeatable; rules: {', '.join(sorted(config.RULES))}")
+    parser.add_argument("--games", type=int, default=1000, help="Games per combination")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="scripted")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=int, default=90, help="Game length, the player wins by lasting this long")
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: one per CPU)")
+    parser.add_argument("--exact", action="store_true", help="Play lib.World with pixel-mask collisions instead of the NumPy approximation (much slower)")
+    parser.add_argument("--out", default="sweep.parquet", help="Per-game table, .parquet or .csv")
+    args = parser.parse_args(argv)
+
+    spec = {}
+    for item in args.set:
+        name, _, values = item.partition("=")
+        try:
+            spec[name] = parse_values(name, values)
+        except ValueError as error:
+            parser.error(f"--set {item}: {error}")
+
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    if "pierce" in spec and not args.exact:
+        parser.error("--set pierce needs --exact, the NumPy games always stop an arrow at its first monster")
+
+    start = time.perf_counter()
+    rows = sweep(spec, args.games, args.policy, args.seed, args.seconds * config.FPS, args.workers, args.exact)
+    elapsed = time.perf_counter() - start
+    path = write_rows(args.out, rows)
+    print(f"{len(rows)} games in {elapsed:.1f}s -> {path}")
+
+    by_point = {}
+    for row in rows:
+        by_point.setdefault(row["point"], []).append(row)
+    for point, point_rows in sorted(by_point.items()):
+        row = point_rows[0]
+        swept = ", ".join(f"{name}={row[name]}" if name in row else f"{name}={row[name + '_min']}-{row[name + '_max']}"
+                          for name in sorted(spec)) or "defaults"
+        stats = summarize(point_rows)
+        print(f"{swept:<40} survived {stats['survived']:6.1%}  seconds p10/p50/p90 {stats['seconds_p10']:5.1f}/{stats['seconds_p50']:5.1f}/{stats['seconds_p90']:5.1f}"
+              f"  score mean {stats['score_mean']:7.1f}  kills {stats['kills_mean']:5.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Game client: python -m tools.watch [host:port] [--archer]
+Spectates a served game (Main.py with config.NET_PORT, or python -m tools.serve),
+or joins it as an archer with the usual WASD and mouse controls
+"""
+
+import argparse
+import sys
+
+import pygame
+
+import config
+from lib.Env import load_images
+from lib.Net import GameClient
+
+KEYS = ((pygame.K_w, 1), (pygame.K_s, 2), (pygame.K_a, 3), (pygame.K_d, 4))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.watch", description="Watch or join a served Save the Castle game")
+    parser.add_argument("address", nargs="?", default=f"127.0.0.1:{config.NET_PORT or 7777}")
+    parser.add_argument("--archer", action="store_true", help="Play an archer instead of spectating")
+    parser.add_argument("--rate", type=int, default=config.NET_RATE, help="Snapshot rate of the server, sets the interpolation delay")
+    args = parser.parse_args(argv)
+    host, sep, port = args.address.rpartition(":")
+    if not sep:  # Bare host, no ":port"
+        host, port = args.address, config.NET_PORT or 7777
+
+    pygame.init()
+    screen = pygame.display.set_mode(config.SCREENSIZE)
+    pygame.display.set_caption("Save the Castle - " + ("archer" if args.archer else "spectator"))
+    imagesdict = load_images()
+    client = GameClient(host or "127.0.0.1", int(port), args.archer, args.rate)
+    clock = pygame.time.Clock()
+
+    while client.connected:
+        clicks = 0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                client.close()
+                break
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                clicks += 1
+        if not client.connected:
+            break
+        if args.archer:
+            pressed = pygame.key.get_pressed()
+            move = next((index for key, index in KEYS if pressed[key]), 0)
+            client.send_input(move, clicks, pygame.mouse.get_pos())
+        client.poll()
+        client.draw(screen, imagesdict)
+        pygame.display.flip()
+        clock.tick(config.FPS)
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())